@@ -0,0 +1,181 @@
+import sys
+import os
+import json
+import time
+import argparse
+import platform
+import datetime
+import statistics
+import subprocess
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src import data, logic, viz, synth, run_expectancy
+
+ROOT = Path(__file__).resolve().parent.parent
+BENCH_DIR = Path('.bench')
+DEFAULT_SCALES = [1, 10, 100]
+
+# Standalone scripts, run as subprocesses from a directory holding yakyuu.db
+SCRIPTS = ['trigger_analysis.py', 'onbase_analysis.py']
+
+def _timed(func, repeat):
+    """
+    Calls func repeat times. Returns (timing dict, result of the last call).
+    """
+    runs = []
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        runs.append(time.perf_counter() - start)
+    timing = {'min_s': round(min(runs), 6), 'median_s': round(statistics.median(runs), 6), 'runs_s': [round(r, 6) for r in runs]}
+    if isinstance(result, pd.DataFrame):
+        timing['rows'] = len(result)
+    return timing, result
+
+def scale_db(scale, seed, bench_dir=BENCH_DIR, regenerate=False):
+    """
+    Synthetic DB for `scale` NPB seasons at <bench_dir>/<scale>x-seed<seed>/yakyuu.db.
+    Generated once and reused. Returns (path, generation seconds or None if reused).
+    """
+    db_path = Path(bench_dir) / f'{scale}x-seed{seed}' / 'yakyuu.db'
+    if db_path.exists() and not regenerate:
+        return db_path, None
+    db_path.parent.mkdir(parents=True, exist_ok=True)
+    print(f"  Generating {scale} season(s) -> {db_path}")
+    start = time.perf_counter()
+    synth.generate_db(db_path, seasons=scale, seed=seed)
+    return db_path, round(time.perf_counter() - start, 3)
+
+def bench_scale(db_path, repeat=3):
+    """
+    Times the pipeline stages and the standalone scripts against one DB (query cache off).
+    Returns {benchmark name: timing dict}.
+    """
+    results = {}
+
+    def record(name, func):
+        print(f"    {name}")
+        results[name], result = _timed(func, repeat)
+        return result
+
+    data.configure_cache(enabled=False)
+    conn = data.get_db_connection(db_path)
+    try:
+        record('data.load_events', lambda: data.load_events(conn))
+        events = record('data.load_grandslam_events', lambda: data.load_grandslam_events(conn))
+        games = record('data.load_games', lambda: data.load_games(conn, columns=data.GAME_COLUMNS))
+        record('data.load_teams', lambda: data.load_teams(conn))
+        record('run_expectancy.load_run_expectancy', lambda: run_expectancy.load_run_expectancy(conn, games))
+    finally:
+        conn.close()
+
+    gs_df = record('logic.process_grandslams', lambda: logic.process_grandslams(events, games))
+    high_df = record('logic.extract_high_scoring_innings', lambda: logic.extract_high_scoring_innings(games))
+    final_df = record('logic.merge_and_tag', lambda: logic.merge_and_tag(gs_df, high_df))
+    summaries = viz.generate_summary(final_df)
+    out_path = Path(db_path).parent / 'dashboard_data.json'
+    record('viz.export_json', lambda: viz.export_json(final_df, summaries, out_path))
+
+    env = dict(os.environ, PYTHONPATH=str(ROOT))
+    for script in SCRIPTS:
+        record(script, lambda: subprocess.run([sys.executable, str(ROOT / script)], cwd=Path(db_path).parent,
+                                              env=env, check=True, stdout=subprocess.DEVNULL))
+    return results
+
+def _table_counts(db_path):
+    conn = data.get_db_connection(db_path)
+    try:
+        return {t: conn.execute(f'SELECT COUNT(*) FROM "{t}"').fetchone()[0] for t in ('games', 'event')}
+    finally:
+        conn.close()
+
+def environment():
+    return {
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'pandas': pd.__version__,
+        'numpy': np.__version__,
+        'cpu_count': os.cpu_count(),
+    }
+
+def compare(results, baseline, tolerance=0.2):
+    """
+    Median-time ratios against a previous results file (matched by scale and benchmark name).
+    Returns a DataFrame; 'regression' is True where new/old exceeds 1 + tolerance.
+    """
+    old = {(s['scale'], name): t['median_s'] for s in baseline['scales'] for name, t in s['benchmarks'].items()}
+    rows = []
+    for s in results['scales']:
+        for name, t in s['benchmarks'].items():
+            before = old.get((s['scale'], name))
+            if before:
+                rows.append({'scale': s['scale'], 'benchmark': name, 'baseline_s': before,
+                             'median_s': t['median_s'], 'ratio': round(t['median_s'] / before, 3)})
+    df = pd.DataFrame(rows, columns=['scale', 'benchmark', 'baseline_s', 'median_s', 'ratio'])
+    df['regression'] = df['ratio'] > 1 + tolerance
+    return df
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmarks on synthetic yakyuu.db at several scales")
+    parser.add_argument('--scales', type=str, default=','.join(map(str, DEFAULT_SCALES)), help='Comma-separated scales in NPB seasons (858 games each)')
+    parser.add_argument('--seed', type=int, default=0, help='Seed of the synthetic DBs')
+    parser.add_argument('--repeat', type=int, default=3, help='Timed runs per benchmark (min and median are reported)')
+    parser.add_argument('--bench-dir', type=str, default=str(BENCH_DIR), help='Where synthetic DBs are generated and reused')
+    parser.add_argument('--regenerate', action='store_true', help='Regenerate the synthetic DBs even if present')
+    parser.add_argument('--out', type=str, default=str(BENCH_DIR / 'results.json'), help='Results JSON path')
+    parser.add_argument('--baseline', type=str, default=None, help='Previous results JSON to compare against')
+    parser.add_argument('--tolerance', type=float, default=0.2, help='Slowdown ratio above 1 + tolerance counts as a regression')
+    args = parser.parse_args()
+
+    try:
+        scales = [int(s) for s in args.scales.split(',') if s.strip()]
+    except ValueError:
+        parser.error(f"--scales must be comma-separated integers: {args.scales}")
+
+    results = {
+        'created': datetime.datetime.now().isoformat(timespec='seconds'),
+        'environment': environment(),
+        'config': {'scales': scales, 'seed': args.seed, 'repeat': args.repeat},
+        'scales': [],
+    }
+    for scale in scales:
+        print(f"Scale {scale}x:")
+        db_path, generate_s = scale_db(scale, args.seed, args.bench_dir, args.regenerate)
+        counts = _table_counts(db_path)
+        results['scales'].append({
+            'scale': scale,
+            'games': counts['games'],
+            'events': counts['event'],
+            'db_bytes': db_path.stat().st_size,
+            'generate_s': generate_s,
+            'benchmarks': bench_scale(db_path, args.repeat),
+        })
+
+    out_path = Path(args.out)
+    out_path.parent.mkdir(parents=True, exist_ok=True)
+    with open(out_path, 'w', encoding='utf-8') as f:
+        json.dump(results, f, indent=2)
+    print(f"Wrote {out_path}")
+
+    for s in results['scales']:
+        print(f"\n{s['scale']}x ({s['games']} games / {s['events']} events), median seconds:")
+        for name, t in s['benchmarks'].items():
+            print(f"  {name:<36} {t['median_s']:>10.4f}")
+
+    if args.baseline:
+        with open(args.baseline, encoding='utf-8') as f:
+            diff = compare(results, json.load(f), args.tolerance)
+        print(f"\nAgainst {args.baseline}:")
+        print(diff.to_string(index=False))
+        if diff['regression'].any():
+            print(f"Regressions (> {1 + args.tolerance:.2f}x): {int(diff['regression'].sum())}")
+            sys.exit(1)
+
+if __name__ == "__main__":
+    main()
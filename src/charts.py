@@ -0,0 +1,102 @@
+import re
+import json
+import hashlib
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+from src import viz
+
+# Render state of the last run: chart name -> output path and input hash
+CHARTS_DIR = 'charts'
+MANIFEST_FILE = 'manifest.json'
+
+# Part of every hash: bump when the rendering code changes so all charts are redrawn
+CHART_VERSION = 2
+
+def _slug(value):
+    return re.sub(r'\W+', '_', str(value)).strip('_').lower() or 'unknown'
+
+def _split(df, column):
+    """
+    (GS values, non-GS values) of column as sorted float arrays, NaN dropped.
+    Sorted so the hash doesn't depend on row order (e.g. season partitions with --jobs).
+    """
+    valid = df.dropna(subset=[column])
+    is_gs = valid['is_grandslam'].astype(bool).to_numpy()
+    values = valid[column].to_numpy(dtype=float)
+    return np.sort(values[is_gs]), np.sort(values[~is_gs])
+
+def _spec(name, path, kind, title, df, column):
+    gs, non_gs = _split(df, column)
+    h = hashlib.sha256(f"{CHART_VERSION}|{kind}|{title}|{len(gs)}|{len(non_gs)}".encode('utf-8'))
+    h.update(gs.tobytes())
+    h.update(non_gs.tobytes())
+    return {'name': name, 'path': path, 'kind': kind, 'title': title, 'gs': gs, 'non_gs': non_gs,
+            'hash': h.hexdigest()}
+
+def chart_specs(events_df, sweep=None, mode='eq'):
+    """
+    Charts of the big-inning events (needs the 'stage' column, see viz.add_summary_columns):
+    the overall post_run_rate boxplot, one per stage and one per team, plus the distribution of
+    runs after the inning for each threshold in sweep ({threshold: events of that threshold}).
+    Paths are relative to the output directory.
+    """
+    specs = [_spec('overall', 'comparison_runs_after.png', 'box', None, events_df, 'post_run_rate')]
+    for stage, g in events_df.groupby('stage', sort=True):
+        specs.append(_spec(f'stage:{stage}', f'{CHARTS_DIR}/stage_{_slug(stage)}.png', 'box',
+                           f'Post-Inning Run Rate: {stage}', g, 'post_run_rate'))
+    for team, g in events_df.groupby('team', sort=True):
+        specs.append(_spec(f'team:{team}', f'{CHARTS_DIR}/team_{_slug(team)}.png', 'box',
+                           f'Post-Inning Run Rate: {team}', g, 'post_run_rate'))
+    op = '==' if mode == 'eq' else '>='
+    for t, g in sorted((sweep or {}).items()):
+        specs.append(_spec(f'threshold:{mode}{t}', f'{CHARTS_DIR}/threshold_{mode}{t}.png', 'dist',
+                           f'Runs After Big Inning (runs {op} {t})', g, 'post_inning_runs_1to9'))
+    return specs
+
+def _render(kind, gs, non_gs, output_path, title):
+    if kind == 'box':
+        viz.plot_boxplot(gs, non_gs, output_path, title=title)
+    else:
+        viz.plot_distribution(gs, non_gs, output_path, title, xlabel='Runs after the big inning (innings 1-9)')
+    return output_path
+
+def load_manifest(out_dir):
+    path = Path(out_dir) / CHARTS_DIR / MANIFEST_FILE
+    if not path.exists():
+        return {}
+    with open(path, encoding='utf-8') as f:
+        return json.load(f)
+
+def render_charts(specs, out_dir, jobs=1, force=False):
+    """
+    Renders the charts whose input hash differs from the last render (or whose file is missing),
+    in a process pool when jobs > 1. Charts of the previous render that are no longer in specs
+    are deleted. Returns the names of the charts rendered.
+    """
+    out_dir = Path(out_dir)
+    (out_dir / CHARTS_DIR).mkdir(parents=True, exist_ok=True)
+    previous = load_manifest(out_dir)
+
+    pending = [s for s in specs
+               if force or previous.get(s['name'], {}).get('hash') != s['hash'] or not (out_dir / s['path']).exists()]
+    args = [(s['kind'], s['gs'], s['non_gs'], out_dir / s['path'], s['title']) for s in pending]
+    if jobs > 1 and len(args) > 1:
+        workers = min(jobs, len(args))
+        # Import matplotlib once here; forked workers inherit it instead of importing it each
+        viz._pyplot()
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            list(executor.map(_render, *zip(*args), chunksize=-(-len(args) // workers)))
+    else:
+        for a in args:
+            _render(*a)
+
+    current = {s['name']: {'path': s['path'], 'hash': s['hash']} for s in specs}
+    current_paths = {entry['path'] for entry in current.values()}
+    for entry in previous.values():
+        if entry['path'] not in current_paths:
+            (out_dir / entry['path']).unlink(missing_ok=True)
+    with open(out_dir / CHARTS_DIR / MANIFEST_FILE, 'w', encoding='utf-8') as f:
+        json.dump(current, f, ensure_ascii=False, indent=2)
+    return [s['name'] for s in pending]
@@ -2,96 +2,381 @@
 import sys
 import os
 import argparse
+import importlib.util
 from pathlib import Path
 
+import pandas as pd
+
 # Add src to path to allow running as script if needed, though -m is preferred
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-from src import data, logic, viz, report
+from src import data, logic, viz, charts, incremental, significance, run_expectancy, leaderboards, federation, outputs, pipeline, predicates, profiling
+
+# Selectable with --stages. load and process (event CSVs, watermark) always run;
+# the other stages need the summary, so selecting them selects it too.
+CLI_STAGES = ['load', 'process', 'summary', 'significance', 'export', 'expectancy', 'leaderboards', 'plot', 'report']
+REQUIRED_STAGES = ['load', 'process']
+STAGE_DEPENDENCIES = {'significance': ['summary'], 'expectancy': ['summary'], 'leaderboards': ['summary'], 'plot': ['summary'], 'export': ['summary'], 'report': ['summary']}
+
+def resolve_stages(names, skip=()):
+    """
+    Stages to run: the required ones, the given names (all stages if None) and their dependencies, minus skip.
+    Raises ValueError for unknown names.
+    """
+    names = CLI_STAGES if names is None else names
+    unknown = [n for n in list(names) + list(skip) if n not in CLI_STAGES]
+    if unknown:
+        raise ValueError(f"Unknown stage(s): {', '.join(unknown)} (choose from {', '.join(CLI_STAGES)})")
+    selected = set(REQUIRED_STAGES) | {n for n in names if n not in skip}
+    for n in list(selected):
+        selected.update(STAGE_DEPENDENCIES.get(n, []))
+    return [n for n in CLI_STAGES if n in selected]
 
 def main():
     parser = argparse.ArgumentParser(description="Yakyuu Grand Slam Hypothesis Verifier")
-    parser.add_argument('--db', type=str, default='yakyuu.db', help='Path to SQLite DB')
+    parser.add_argument('--db', type=str, nargs='+', default=['yakyuu.db'],
+                        help='Path(s) or glob(s) of SQLite DBs; several DBs are loaded concurrently and analysed together')
     parser.add_argument('--out', type=str, default='out', help='Output directory')
+    parser.add_argument('--no-cache', action='store_true', help='Always read from SQLite, bypassing the query cache')
+    parser.add_argument('--rebuild-cache', action='store_true', help='Re-read from SQLite and overwrite the query cache')
+    parser.add_argument('--cache-dir', type=str, default=str(data.CACHE_DIR), help='Query cache directory')
+    parser.add_argument('--incremental', action='store_true', help='Process only games newer than the watermark stored in --out and append to its outputs')
+    parser.add_argument('--thresholds', type=str, default=None, help='Comma-separated big-inning thresholds to sweep, e.g. 3,4,5,6 (written to <out>/thresholds/)')
+    parser.add_argument('--mode', choices=['eq', 'ge'], default='eq', help='Threshold comparison for --thresholds: eq (runs == N) or ge (runs >= N)')
+    parser.add_argument('--resamples', type=int, default=10000, help='Bootstrap/permutation replicates for the GS vs non-GS tests (0 to skip)')
+    parser.add_argument('--seed', type=int, default=42, help='Random seed for the resampling tests')
+    parser.add_argument('--jobs', type=int, default=1, help='Worker processes: >1 processes seasons in parallel and parallelizes the resampling tests and chart rendering')
+    parser.add_argument('--export-shards', action='store_true', help='Also export minified, precompressed dashboard shards with a manifest to <out>/dashboard/')
+    parser.add_argument('--stages', type=str, default=None,
+                        help=f"Comma-separated stages to run ({', '.join(CLI_STAGES)}; default all). load and process always run")
+    parser.add_argument('--skip-plot', action='store_true', help='Do not render charts (skips importing matplotlib)')
+    parser.add_argument('--redraw-charts', action='store_true', help='Render every chart even if its input data is unchanged')
+    parser.add_argument('--export-normalized', action='store_true',
+                        help='Also export <out>/dashboard_normalized.json: one line score per game, events referencing games by index')
+    parser.add_argument('--parquet', action='store_true', help='Also write a .parquet file next to every CSV output (needs pyarrow)')
+    parser.add_argument('--triggers', type=str, default=None,
+                        help=f"Comma-separated trigger events to compare through the post-inning stats ({', '.join(predicates.TRIGGERS)})")
+    parser.add_argument('--profile', action='store_true', help='Record wall/CPU time, memory and rows per stage to <out>/profile_trace.json')
+    parser.add_argument('--profile-memory', action='store_true', help='With --profile: trace Python allocations for a per-stage peak (slower)')
+    parser.add_argument('--chrome-trace', action='store_true', help='With --profile: also write <out>/profile_trace.chrome.json (chrome://tracing, Perfetto)')
+    parser.add_argument('--cprofile', choices=profiling.STAGES, default=None, metavar='STAGE',
+                        help=f"Run one stage under cProfile, dumped to <out>/profile/<STAGE>.prof ({', '.join(profiling.STAGES)})")
     args = parser.parse_args()
     
+    thresholds = []
+    if args.thresholds:
+        try:
+            thresholds = [int(t) for t in args.thresholds.split(',') if t.strip()]
+        except ValueError:
+            parser.error(f"--thresholds must be comma-separated integers: {args.thresholds}")
+        if args.incremental:
+            parser.error("--thresholds cannot be combined with --incremental")
+    
+    triggers = [t.strip() for t in args.triggers.split(',') if t.strip()] if args.triggers else []
+    unknown = [t for t in triggers if t not in predicates.TRIGGERS]
+    if unknown:
+        parser.error(f"Unknown trigger(s): {', '.join(unknown)} (choose from {', '.join(predicates.TRIGGERS)})")
+    if triggers and args.incremental:
+        parser.error("--triggers cannot be combined with --incremental")
+    
+    try:
+        stages = resolve_stages(args.stages.split(',') if args.stages else None, skip=['plot'] if args.skip_plot else [])
+    except ValueError as e:
+        parser.error(str(e))
+    # Stored summary aggregates must advance together with the watermark
+    if args.incremental and 'summary' not in stages:
+        parser.error("--incremental needs the summary stage")
+    
+    try:
+        db_paths = federation.expand_db_paths(args.db)
+    except FileNotFoundError as e:
+        parser.error(str(e))
+    federated = len(db_paths) > 1
+    if federated and args.incremental:
+        parser.error("--incremental works with a single --db")
+    db_path = db_paths[0]
+    
+    if args.parquet and importlib.util.find_spec('pyarrow') is None:
+        parser.error("--parquet needs the pyarrow package")
+    
+    data.configure_cache(enabled=not args.no_cache, rebuild=args.rebuild_cache, cache_dir=args.cache_dir)
+    
     out_dir = Path(args.out)
     out_dir.mkdir(exist_ok=True)
     
-    print(f"Connecting to DB: {args.db}")
-    try:
-        conn = data.get_db_connection(args.db)
-    except Exception as e:
-        print(f"Error: {e}")
-        return
-
-    # 1. Load Data
-    print("Loading events...")
-    events_raw = data.load_events(conn)
-    print(f"  Loaded {len(events_raw)} candidate events.")
+    profile = args.profile or args.profile_memory or args.chrome_trace or args.cprofile is not None
+    profiling.configure(enabled=profile, memory=args.profile_memory, cprofile_stage=args.cprofile,
+                        cprofile_dir=out_dir / 'profile')
     
-    print("Loading games...")
-    games_raw = data.load_games(conn)
-    print(f"  Loaded {len(games_raw)} games.")
+    watermark = None
+    if federated:
+        # One thread per DB; rows tagged with the dataset, colliding game_ids prefixed
+        srcs = federation.sources(db_paths)
+        print(f"Loading {len(srcs)} databases concurrently: {', '.join(s['dataset'] for s in srcs)}")
+        result = federation.run_federated(srcs, triggers=triggers)
+        team_map = result['team_map']
+        if result['collisions']:
+            print(f"  {len(result['collisions'])} game_ids found in several DBs were prefixed with '<dataset>{federation.GAME_ID_SEP}'.")
+    else:
+        print(f"Connecting to DB: {db_path}")
+        try:
+            conn = data.get_db_connection(db_path)
+        except Exception as e:
+            print(f"Error: {e}")
+            return
+
+        # Incremental mode: restrict every query to games after the stored watermark
+        watermark = incremental.load_watermark(out_dir, db_path) if args.incremental else None
+        games_where, games_params = None, ()
+        if watermark:
+            print(f"Incremental run: games after {watermark['date']} / {watermark['game_id']}")
+            games_where, games_params = incremental.new_games_filter(watermark)
+        elif args.incremental:
+            print("No usable watermark found, running a full build.")
+
+        # Load Teams for Name Mapping (shared by every partition)
+        print("Loading teams...")
+        teams_df = data.load_teams(conn)
+        # Create a mapping dictionary for faster/easier mapping
+        team_map = dict(zip(teams_df['team_id'], teams_df['team_name']))
     
-    # ... (previous code)
+        if watermark and conn.execute(f"SELECT COUNT(*) FROM games WHERE {games_where}", games_params).fetchone()[0] == 0:
+            conn.close()
+            print("No new games since the last run. Nothing to do.")
+            return
     
-    # 2b. Load Teams for Name Mapping
-    print("Loading teams...")
-    teams_df = data.load_teams(conn)
-    # Create a mapping dictionary for faster/easier mapping
-    team_map = dict(zip(teams_df['team_id'], teams_df['team_name']))
+        if args.jobs > 1:
+            season_expr = data.season_expr(conn)
+            seasons = data.load_seasons(conn, where=games_where, params=games_params)
     
-    conn.close()
+        conn.close()
     
-    # 2. Process Grand Slams
-    print("Processing Grand Slam events...")
-    gs_df = logic.process_grandslams(events_raw, games_raw)
+        # 1-4. Load -> Grand Slams -> 4 runs innings -> Merge/Tag
+        # (one partition in-process, or one per season in a process pool with --jobs)
+        cache = {'enabled': not args.no_cache, 'rebuild': args.rebuild_cache, 'cache_dir': args.cache_dir}
+        if args.jobs > 1:
+            print(f"Processing {len(seasons)} seasons with {args.jobs} workers...")
+            result = pipeline.run_by_season(db_path, team_map, seasons, args.jobs, games_where, games_params,
+                                            cache=cache, season_expr=season_expr, triggers=triggers)
+        else:
+            print("Loading and processing games...")
+            result = pipeline.run_partition(db_path, team_map, games_where, games_params, triggers=triggers)
+    games_raw, gs_df, innings_df, final_df = result['games'], result['gs'], result['innings'], result['final']
+    print(f"  Loaded {len(result['events'])} candidate events.")
+    print(f"  Loaded {len(games_raw)} games.")
     print(f"  Identified {len(gs_df)} valid Grand Slam events (<= 9th inning).")
+    print(f"  Found {len(final_df)} innings with 4 runs.")
     
-    # Map team names
-    gs_df['team'] = gs_df['team'].map(team_map).fillna(gs_df['team'])
-    gs_df['home_team'] = gs_df['home_team_id'].map(team_map).fillna(gs_df['home_team_id'])
-    gs_df['away_team'] = gs_df['away_team_id'].map(team_map).fillna(gs_df['away_team_id'])
+    # Outputs are written in background threads (atomically) while the analysis continues
+    writer = outputs.OutputWriter(parquet=args.parquet)
     
-    gs_df.to_csv(out_dir / 'grandslam_events.csv', index=False, encoding='utf-8-sig')
+    # 3b. Threshold Sweep (optional)
+    sweep_frames = {}
+    if thresholds:
+        with profiling.stage('sweep') as st:
+            sweep_dir = out_dir / 'thresholds'
+            sweep_dir.mkdir(exist_ok=True)
+            op = '==' if args.mode == 'eq' else '>='
+            sweep_overall = []
+            for t in thresholds:
+                t_df = logic.select_high_scoring_innings(innings_df, games_raw, threshold=t, mode=args.mode)
+                print(f"  Sweep: {len(t_df)} innings with runs {op} {t}.")
+                pipeline.map_team_names(t_df, team_map)
+                t_df = logic.merge_and_tag(gs_df, t_df)
+                
+                prefix = f"{args.mode}{t}"
+                writer.csv(t_df, sweep_dir / f'{prefix}_inning_events.csv')
+                t_overall, t_stage = viz.generate_summary(t_df)
+                writer.csv(t_overall, sweep_dir / f'{prefix}_summary_overall.csv', index=True)
+                writer.csv(t_stage, sweep_dir / f'{prefix}_summary_stage.csv', index=True)
+                sweep_overall.append(t_overall)
+                sweep_frames[t] = t_df
+            
+            # All thresholds side by side
+            writer.csv(pd.concat(sweep_overall, keys=thresholds, names=['threshold']),
+                       sweep_dir / f'{args.mode}_summary_thresholds.csv', index=True)
+            st['rows'] = sum(len(o) for o in sweep_overall)
     
-    # 3. Process High Scoring Innings (Comparison Group)
-    print("Extracting 4 runs innings...")
-    high_df = logic.extract_high_scoring_innings(games_raw, threshold=4)
-    print(f"  Found {len(high_df)} innings with 4 runs.")
+    # 3c. Trigger events (predicate-defined, optional)
+    if triggers:
+        triggers_df = result['triggers']
+        for name, count in triggers_df['trigger'].value_counts().reindex(triggers, fill_value=0).items():
+            print(f"  Trigger {name}: {count} events (<= 9th inning).")
+        writer.csv(triggers_df, out_dir / 'trigger_events.csv')
+        writer.csv(viz.trigger_summary(triggers_df), out_dir / 'summary_triggers.csv', index=True)
     
-    # Map team names
-    high_df['team'] = high_df['team'].map(team_map).fillna(high_df['team'])
-    high_df['home_team'] = high_df['home_team_id'].map(team_map).fillna(high_df['home_team_id'])
-    high_df['away_team'] = high_df['away_team_id'].map(team_map).fillna(high_df['away_team_id'])
+    # Write event outputs
+    with profiling.stage('write_events') as st:
+        if watermark:
+            incremental.append_csv(gs_df, out_dir / 'grandslam_events.csv')
+        else:
+            writer.csv(gs_df, out_dir / 'grandslam_events.csv')
+        
+        if watermark:
+            incremental.append_csv(final_df, out_dir / 'fourplus_inning_events.csv')
+        else:
+            writer.csv(final_df, out_dir / 'fourplus_inning_events.csv')
+        st['rows'] = len(gs_df) + len(final_df)
     
-    # 4. Integrate
-    print("Merging and tagging...")
-    final_df = logic.merge_and_tag(gs_df, high_df)
-    final_df.to_csv(out_dir / 'fourplus_inning_events.csv', index=False, encoding='utf-8-sig')
+    if 'summary' not in stages:
+        # Keep <out> usable for a later --incremental run
+        incremental.save_summary_state(viz.summary_state(final_df), out_dir)
+        save_watermark(out_dir, games_raw, db_path, watermark, federated)
+        flush_outputs(writer)
+        if profile:
+            write_profile(args, out_dir)
+        print(f"Done! Ran stages: {', '.join(stages)}.")
+        return
     
     # 5. Analysis
     print("Generating summaries...")
-    overall, stage = viz.generate_summary(final_df)
+    with profiling.stage('summary') as st:
+        if watermark:
+            # Plot/export still need every event: read back the appended output
+            final_df = incremental.read_events_csv(out_dir / 'fourplus_inning_events.csv', final_df)
+            # Update stored partial aggregates with the rows it doesn't hold yet
+            state = incremental.update_summary_state(out_dir, final_df)
+            overall, stage = viz.summary_from_state(state)
+            # Row order of a full run (logic.build_innings_table): visitor then home, by inning, then by game
+            final_df = final_df.sort_values(['side', 'inning_no'], ascending=[False, True], kind='stable', ignore_index=True)
+            viz.add_summary_columns(final_df)
+        else:
+            overall, stage = viz.generate_summary(final_df)
+            incremental.save_summary_state(viz.summary_state(final_df), out_dir)
+        save_watermark(out_dir, games_raw, db_path, watermark, federated)
+        
+        # Save summaries
+        writer.csv(overall, out_dir / 'summary_overall.csv', index=True)
+        writer.csv(stage, out_dir / 'summary_stage.csv', index=True)
+        st['rows'] = len(final_df)
+    
+    # 5b. Significance (bootstrap CI / permutation p-value of GS - non-GS)
+    tests = None
+    if args.resamples > 0 and 'significance' in stages:
+        print(f"Running resampling tests ({args.resamples} replicates)...")
+        with profiling.stage('significance') as st:
+            tests = significance.resampling_tests(final_df, n_resamples=args.resamples, seed=args.seed, jobs=args.jobs)
+            writer.csv(tests, out_dir / 'summary_significance.csv', index=True)
+            st['rows'] = len(tests)
     
-    # Save summaries
-    overall.to_csv(out_dir / 'summary_overall.csv', encoding='utf-8-sig')
-    stage.to_csv(out_dir / 'summary_stage.csv', encoding='utf-8-sig')
+    # 6. Dashboard Data (queued as soon as its inputs are ready; serialized in the writer threads)
+    if 'export' in stages:
+        print("Exporting dashboard data...")
+        with profiling.stage('export') as st:
+            # Shared by the export jobs below, which only read it
+            events = final_df.copy()
+            summaries = (overall, stage)
+            # Each job is timed as 'export' again when it runs on its writer thread
+            writer.submit(out_dir / 'dashboard_data.json', profiling.timed(
+                lambda tmp: viz.export_json(events, summaries, tmp, significance=tests), 'export'))
+            writer.submit(out_dir / 'dashboard_cube.json', profiling.timed(lambda tmp: viz.export_cube(events, tmp), 'export'))
+            if args.export_normalized:
+                writer.submit(out_dir / 'dashboard_normalized.json', profiling.timed(
+                    lambda tmp: viz.export_json_normalized(events, summaries, tmp, significance=tests), 'export'))
+            if args.export_shards:
+                manifest = viz.export_json_shards(final_df, (overall, stage), out_dir / 'dashboard', significance=tests)
+                print(f"  Wrote {len(manifest['events'])} event shards + stats to {out_dir / 'dashboard'}")
+            st['rows'] = len(final_df)
     
-    # 6. Localization/Plotting
-    print("Plotting comparison...")
-    viz.plot_comparison(final_df, out_dir / 'comparison_runs_after.png')
+    # 7. Run expectancy (RE24) baseline: post-inning runs above what a fresh inning is worth
+    expectancy = None
+    if 'expectancy' in stages:
+        print("Building run expectancy (RE24) matrix...")
+        with profiling.stage('expectancy') as st:
+            if federated:
+                re_df = federation.load_run_expectancy(srcs)
+            else:
+                conn = data.get_db_connection(db_path)
+                try:
+                    # Always over every game: incremental runs only loaded the new ones
+                    re_df = run_expectancy.load_run_expectancy(conn, games_df=None if watermark else games_raw)
+                finally:
+                    conn.close()
+            writer.csv(re_df, out_dir / 'run_expectancy.csv')
+            above = run_expectancy.add_runs_above_expectancy(final_df.copy(), re_df)
+            expectancy = run_expectancy.summary_above_expectancy(above)
+            writer.csv(expectancy, out_dir / 'summary_run_expectancy.csv', index=True)
+            st['rows'] = len(re_df)
     
-    # 7. Dashboard Data
-    print("Exporting dashboard data...")
-    viz.export_json(final_df, (overall, stage), out_dir / 'dashboard_data.json')
+    # 8. Batter / team leaderboards (aggregated in SQL)
+    if 'leaderboards' in stages:
+        print("Building leaderboards...")
+        with profiling.stage('leaderboards') as st:
+            # Incremental runs only hold the new GS events: use the appended output
+            all_gs = incremental.read_events_csv(out_dir / 'grandslam_events.csv', gs_df) if watermark else gs_df
+            if federated:
+                batters, teams = federation.federated_leaderboards(srcs, all_gs, final_df)
+            else:
+                conn = data.get_db_connection(db_path)
+                try:
+                    batters, teams = leaderboards.leaderboards(conn, all_gs, final_df)
+                finally:
+                    conn.close()
+            writer.csv(batters, out_dir / 'leaderboard_batters.csv')
+            writer.csv(teams, out_dir / 'leaderboard_teams.csv')
+            writer.submit(out_dir / 'dashboard_leaderboards.json', lambda tmp: leaderboards.export_leaderboards(batters, teams, tmp))
+            print(f"  {len(batters)} batters, {len(teams)} teams.")
+            st['rows'] = len(batters) + len(teams)
     
-    # 8. Report
-    print("Generating report...")
-    report.generate_markdown_report(overall, stage, out_dir / 'report.md')
+    # 9. Localization/Plotting
+    if 'plot' in stages:
+        print("Plotting charts...")
+        with profiling.stage('plot') as st:
+            specs = charts.chart_specs(final_df, sweep_frames, mode=args.mode)
+            rendered = charts.render_charts(specs, out_dir, jobs=args.jobs, force=args.redraw_charts)
+            print(f"  Rendered {len(rendered)} of {len(specs)} charts ({len(specs) - len(rendered)} unchanged).")
+            st['rows'] = len(rendered)
+    
+    # 10. Report
+    if 'report' in stages:
+        print("Generating report...")
+        with profiling.stage('report'):
+            from src import report
+            writer.submit(out_dir / 'report.md', profiling.timed(
+                lambda tmp: report.generate_markdown_report(overall, stage, tmp, expectancy=expectancy), 'report'))
+    
+    flush_outputs(writer)
+    if profile:
+        write_profile(args, out_dir)
     
     print("Done! Check output in 'out/' directory.")
 
+def flush_outputs(writer):
+    """
+    Waits for the queued output files (raises the first write error).
+    """
+    with profiling.stage('write_outputs') as st:
+        st['rows'] = len(writer.close())
+
+def save_watermark(out_dir, games_df, db_path, previous, federated):
+    """
+    Stores the incremental watermark; a federated run clears it instead (--incremental needs a single DB).
+    """
+    if federated:
+        incremental.clear_watermark(out_dir)
+    else:
+        incremental.save_watermark(out_dir, games_df, db_path, previous=previous)
+
+def write_profile(args, out_dir):
+    """
+    Writes the stage trace (and the Chrome trace with --chrome-trace) and prints per-stage totals.
+    """
+    recs = profiling.records()
+    metadata = {'argv': sys.argv[1:], 'db': args.db, 'jobs': args.jobs, 'memory_traced': args.profile_memory}
+    profiling.write_trace(out_dir / 'profile_trace.json', recs, metadata)
+    print(f"Profile: {out_dir / 'profile_trace.json'}")
+    if args.chrome_trace:
+        profiling.write_chrome_trace(out_dir / 'profile_trace.chrome.json', recs)
+        print(f"Chrome trace: {out_dir / 'profile_trace.chrome.json'}")
+    if args.cprofile:
+        print(f"cProfile dumps: {out_dir / 'profile'}")
+    
+    print(f"  {'stage':<20} {'runs':>4} {'wall_s':>9} {'cpu_s':>9} {'rows':>9} {'peak_mb':>8} {'rss_mb':>8}")
+    for name, t in profiling.stage_totals(recs).items():
+        rows = '' if t['rows'] is None else t['rows']
+        peak = '' if t['peak_mb'] is None else t['peak_mb']
+        rss = '' if t['max_rss_mb'] is None else t['max_rss_mb']
+        print(f"  {name:<20} {t['runs']:>4} {t['wall_s']:>9.3f} {t['cpu_s']:>9.3f} {rows:>9} {peak:>8} {rss:>8}")
+
 if __name__ == "__main__":
     main()
@@ -1,15 +1,218 @@
-
 import sqlite3
+import numpy as np
 import pandas as pd
 import os
+import json
+import hashlib
+import time
 from pathlib import Path
 
+from src import predicates
+
 DB_PATH = Path('yakyuu.db')
+CACHE_DIR = Path('.cache')
+
+# Query result cache (see configure_cache / read_sql). Off unless the caller enables it.
+_cache = {'enabled': False, 'rebuild': False, 'dir': CACHE_DIR}
+
+# Columns logic.py actually uses (projection for the loaders below)
+EVENT_COLUMNS = ['game_id', 'inning', 'team', 'on_base', 'batter_player_id']
+GAME_COLUMNS = (
+    ['game_id', 'date', 'ballpark', 'home_team_id', 'away_team_id']
+    + [f'visitor_inn{i}' for i in range(1, 10)]
+    + [f'home_inn{i}' for i in range(1, 10)]
+)
+
+# Compact in-memory schema applied by the loaders (see compact_dtypes):
+# inning scores as nullable int8, low-cardinality strings dictionary-encoded as categoricals
+INNING_SCORE_COLUMNS = [f'visitor_inn{i}' for i in range(1, 10)] + [f'home_inn{i}' for i in range(1, 10)]
+CATEGORY_COLUMNS = ['inning', 'team', 'on_base', 'home_team_id', 'away_team_id', 'ballpark']
 
-def get_db_connection(db_path=DB_PATH):
+# Read-side pragmas for analytics: memory-mapped reads and a 64 MiB page cache.
+# temp_store stays at its default, so a large sort can spill to disk instead of RAM.
+READ_PRAGMAS = {'mmap_size': 256 * 2 ** 20, 'cache_size': -64 * 1024}
+
+# Overrides while streaming (iter_query_by_game): each page is read once, so mapping or caching it
+# only adds to RSS (SQLite's default 2 MiB page cache)
+STREAM_PRAGMAS = {'mmap_size': 0, 'cache_size': -2000}
+
+# Indexes created by prepare_db for the loaders' access patterns: name -> (table, columns).
+# idx_event_hr_rbi covers the trigger/GS loads (filters + projected columns, no table lookups);
+# idx_event_game serves per-game scans (iter_events, game_id IN (...), last event of a game).
+# Columns missing from a snapshot are skipped; an index with none of its columns is not created.
+DB_INDEXES = {
+    'idx_event_hr_rbi': ('event', ['hr', 'rbi', 'on_base', 'inning', 'game_id', 'team', 'batter_player_id']),
+    'idx_event_game': ('event', ['game_id', 'team', 'inning']),
+    'idx_games_game_id': ('games', ['game_id']),
+    'idx_games_season': ('games', ['season']),
+    'idx_games_date': ('games', ['date', 'game_id']),
+}
+
+# Loaders return rows in table order whichever index the planner picks. The unary '+' keeps
+# ORDER BY rowid from steering SQLite to a full table scan: it seeks the index and sorts the result.
+TABLE_ORDER = '+rowid'
+
+def get_db_connection(db_path=DB_PATH, read_only=True):
+    """
+    Opens the DB with READ_PRAGMAS applied. read_only=True (default) opens it in URI mode=ro,
+    so the pipeline can never modify the source data.
+    """
     if not os.path.exists(db_path):
         raise FileNotFoundError(f"Database file not found at: {db_path}")
-    return sqlite3.connect(db_path)
+    if read_only:
+        conn = sqlite3.connect(f"{Path(db_path).resolve().as_uri()}?mode=ro", uri=True)
+    else:
+        conn = sqlite3.connect(db_path)
+    for name, value in READ_PRAGMAS.items():
+        conn.execute(f"PRAGMA {name} = {value}")
+    return conn
+
+def prepare_db(db_path=DB_PATH, indexes=DB_INDEXES):
+    """
+    Creates the DB_INDEXES (if not present) and refreshes planner statistics.
+    Opens the DB writable. Returns {index name: seconds taken, or None if skipped}.
+    """
+    conn = get_db_connection(db_path, read_only=False)
+    timings = {}
+    try:
+        columns = {}
+        for name, (table, cols) in indexes.items():
+            if table not in columns:
+                columns[table] = set(table_columns(conn, table))
+            cols = [c for c in cols if c in columns[table]]
+            if not cols:
+                timings[name] = None
+                continue
+            start = time.perf_counter()
+            col_sql = ', '.join(f'"{c}"' for c in cols)
+            conn.execute(f'CREATE INDEX IF NOT EXISTS "{name}" ON "{table}" ({col_sql})')
+            timings[name] = round(time.perf_counter() - start, 3)
+        conn.execute("ANALYZE")
+        conn.commit()
+    finally:
+        conn.close()
+    return timings
+
+def configure_cache(enabled=True, rebuild=False, cache_dir=CACHE_DIR):
+    """
+    Enables/disables the on-disk query cache used by all loaders.
+    rebuild=True ignores existing entries and rewrites them from SQLite.
+    """
+    _cache.update(enabled=enabled, rebuild=rebuild, dir=Path(cache_dir))
+
+def db_fingerprint(conn):
+    """
+    Cache key for the DB behind conn: file path, size, mtime and a hash of the schema.
+    Returns None for in-memory databases.
+    """
+    path = conn.execute("PRAGMA database_list").fetchone()[2]
+    if not path:
+        return None
+    st = os.stat(path)
+    schema = "\n".join(sql for (sql,) in conn.execute(
+        "SELECT sql FROM sqlite_master WHERE sql IS NOT NULL ORDER BY type, name"))
+    return {
+        'path': os.path.abspath(path),
+        'size': st.st_size,
+        'mtime_ns': st.st_mtime_ns,
+        'schema': hashlib.sha256(schema.encode('utf-8')).hexdigest(),
+    }
+
+def _write_frame(df, base):
+    """
+    Writes df as Parquet when pyarrow is available, otherwise as a pickle. Returns the file written.
+    """
+    try:
+        path = base.with_suffix('.parquet')
+        df.to_parquet(path, index=False)
+        return path
+    except Exception:
+        # No pyarrow, or a column Parquet can't represent (e.g. mixed object types)
+        path.unlink(missing_ok=True)
+        path = base.with_suffix('.pkl')
+        df.to_pickle(path)
+        return path
+
+def _read_frame(path):
+    if path.suffix == '.parquet':
+        return pd.read_parquet(path)
+    return pd.read_pickle(path)
+
+def read_sql(conn, query, params=()):
+    """
+    pd.read_sql_query with the on-disk columnar cache in front of it.
+    Entries are keyed by DB path + query + params and invalidated when db_fingerprint changes.
+    """
+    fingerprint = db_fingerprint(conn) if _cache['enabled'] else None
+    if fingerprint is None:
+        return pd.read_sql_query(query, conn, params=params)
+
+    cache_dir = _cache['dir']
+    name = hashlib.sha1(json.dumps([fingerprint['path'], query, list(params)]).encode('utf-8')).hexdigest()[:16]
+    meta_path = cache_dir / f"{name}.json"
+
+    if not _cache['rebuild'] and meta_path.exists():
+        with open(meta_path, encoding='utf-8') as f:
+            meta = json.load(f)
+        data_path = cache_dir / meta['file']
+        if meta['db'] == fingerprint and data_path.exists():
+            return _read_frame(data_path)
+
+    df = pd.read_sql_query(query, conn, params=params)
+    cache_dir.mkdir(parents=True, exist_ok=True)
+    data_path = _write_frame(df, cache_dir / name)
+    # Metadata last: an interrupted write leaves no valid entry behind
+    with open(meta_path, 'w', encoding='utf-8') as f:
+        json.dump({'db': fingerprint, 'query': query, 'file': data_path.name}, f, indent=2)
+    return df
+
+def compact_dtypes(df):
+    """
+    Narrows loaded columns in place: inning scores -> Int8 (NULL -> <NA>),
+    CATEGORY_COLUMNS -> category. Columns not present are skipped.
+    """
+    for col in INNING_SCORE_COLUMNS:
+        if col in df.columns:
+            df[col] = df[col].astype('Int8')
+    for col in CATEGORY_COLUMNS:
+        if col in df.columns and not isinstance(df[col].dtype, pd.CategoricalDtype):
+            df[col] = df[col].astype('category')
+    return df
+
+def table_columns(conn, table):
+    """
+    Returns the column names of a table.
+    """
+    return [row[1] for row in conn.execute(f'PRAGMA table_info("{table}")')]
+
+def select(conn, table, columns=None, where=None, params=(), order_by=None):
+    """
+    Generic projected/filtered SELECT.
+    columns=None selects everything; requested columns missing from the table are skipped
+    (e.g. 'ballpark' on older snapshots).
+    """
+    if columns is None:
+        col_sql = '*'
+    else:
+        existing = set(table_columns(conn, table))
+        col_sql = ', '.join(f'"{c}"' for c in columns if c in existing)
+    query = f'SELECT {col_sql} FROM "{table}"'
+    if where:
+        query += f" WHERE {where}"
+    if order_by:
+        query += f" ORDER BY {order_by}"
+    return read_sql(conn, query, params)
+
+def temp_table(conn, name, df):
+    """
+    Copies df into a TEMP table of conn (replacing it), e.g. to join in-memory results against
+    the event table in SQL. Works on read-only connections. Missing values become NULL.
+    """
+    cols = ', '.join(f'"{c}"' for c in df.columns)
+    conn.execute(f'DROP TABLE IF EXISTS temp."{name}"')
+    conn.execute(f'CREATE TEMP TABLE "{name}" ({cols})')
+    rows = df.astype(object).where(df.notna(), None).itertuples(index=False, name=None)
+    conn.executemany(f'INSERT INTO temp."{name}" VALUES ({", ".join("?" * len(df.columns))})', rows)
 
 def load_events(conn):
     """
@@ -28,30 +231,198 @@ def load_events(conn):
     FROM event
     WHERE hr = 1 AND rbi = 4
     """
-    return pd.read_sql_query(query, conn)
+    return read_sql(conn, query)
+
+def load_trigger_events(conn, predicate, columns=EVENT_COLUMNS, where=None, params=()):
+    """
+    Load events matching a predicates.Predicate, compiled to SQL and pushed down into SQLite.
+    An extra where clause (e.g. restricting game_id) is AND-ed on.
+    """
+    pred_where, pred_params = predicate.to_sql()
+    if where:
+        pred_where = f"({pred_where}) AND ({where})"
+    return compact_dtypes(select(conn, 'event', columns, pred_where, tuple(pred_params) + tuple(params), order_by=TABLE_ORDER))
+
+def load_grandslam_events(conn, columns=EVENT_COLUMNS, where=None, params=()):
+    """
+    Load grand slam candidates with every filter pushed down into SQLite:
+    hr=1, rbi=4, bases loaded and inning_no <= 9.
+    An extra where clause (e.g. restricting game_id) is AND-ed on.
+    """
+    gs = predicates.GRANDSLAM & predicates.InningNo('<=', 9)
+    return load_trigger_events(conn, gs, columns, where, params)
+
+def chunk_rows_for_memory(conn, max_memory_mb, table='event', columns=None, sample_rows=1000):
+    """
+    Rows per chunk that keep one DataFrame chunk under roughly max_memory_mb,
+    estimated from the in-memory size of a small sample.
+    """
+    col_sql = '*' if columns is None else ', '.join(f'"{c}"' for c in columns)
+    sample = pd.read_sql_query(f'SELECT {col_sql} FROM "{table}" LIMIT {int(sample_rows)}', conn)
+    if sample.empty:
+        return sample_rows
+    row_bytes = sample.memory_usage(index=True, deep=True).sum() / len(sample)
+    return max(1000, int(max_memory_mb * 1024 * 1024 / row_bytes))
+
+def iter_query_by_game(conn, query, params=(), chunk_rows=200_000, ordered=True):
+    """
+    Streams the rows of a query ordered by game_id first as DataFrames, never splitting a game
+    across chunks: the trailing game of each fetch is held back and prepended to the next one.
+    ordered=False takes rows in any order that keeps each game's rows together (e.g. table order,
+    which needs no sort in SQLite): every chunk is grouped by game in order of first appearance, and
+    a game that shows up again after its chunk was yielded raises ValueError.
+    STREAM_PRAGMAS apply to conn while streaming.
+    """
+    previous = {name: conn.execute(f"PRAGMA {name}").fetchone()[0] for name in STREAM_PRAGMAS}
+    for name, value in STREAM_PRAGMAS.items():
+        conn.execute(f"PRAGMA {name} = {value}")
+    try:
+        yield from _iter_chunks_by_game(conn, query, params, chunk_rows, ordered)
+    finally:
+        for name, value in previous.items():
+            conn.execute(f"PRAGMA {name} = {value}")
+
+def _iter_chunks_by_game(conn, query, params, chunk_rows, ordered):
+    cursor = conn.execute(query, params)
+    names = [d[0] for d in cursor.description]
+    carry = None
+    done = set()
+    while True:
+        rows = cursor.fetchmany(chunk_rows)
+        if not rows:
+            break
+        chunk = pd.DataFrame.from_records(rows, columns=names, coerce_float=True)
+        if carry is not None:
+            chunk = pd.concat([carry, chunk], ignore_index=True)
+        if not ordered:
+            codes = pd.factorize(chunk['game_id'])[0]
+            chunk = chunk.iloc[np.argsort(codes, kind='stable')].reset_index(drop=True)
+
+        # Rows of the last game may continue in the next fetch
+        game_ids = chunk['game_id'].to_numpy()
+        split = int(np.searchsorted(game_ids == game_ids[-1], True))
+        carry = chunk.iloc[split:].reset_index(drop=True)
+        if split > 0:
+            head = chunk.iloc[:split].reset_index(drop=True)
+            if not ordered:
+                _check_new_games(head['game_id'].unique(), done)
+            yield head
+    cursor.close()
+    if carry is not None and not carry.empty:
+        if not ordered:
+            _check_new_games(carry['game_id'].unique(), done)
+        yield carry
+
+def _check_new_games(game_ids, done):
+    repeated = done.intersection(game_ids)
+    if repeated:
+        raise ValueError(
+            f"Event rows of game {min(repeated)} are not stored together; create the game_id index "
+            f"(python -m src.prepare_db) to stream the event table by game")
+    done.update(game_ids)
+
+def has_game_index(conn, table='event'):
+    """
+    True if an index of table starts with game_id (e.g. prepare_db's idx_event_game).
+    """
+    for row in conn.execute(f'PRAGMA index_list("{table}")').fetchall():
+        first = conn.execute(f'PRAGMA index_info("{row[1]}")').fetchone()
+        if first is not None and first[2] == 'game_id':
+            return True
+    return False
+
+def games_stored_together(conn, where=None, params=(), chunk_rows=200_000):
+    """
+    True if the event rows of every game (matching where) are contiguous in rowid order.
+    Reads only game_id in table order: one pass, no sort.
+    """
+    query = 'SELECT game_id FROM event' + (f" WHERE {where}" if where else '') + ' ORDER BY rowid'
+    cursor = conn.execute(query, params)
+    seen = set()
+    last = None
+    try:
+        while True:
+            rows = cursor.fetchmany(chunk_rows)
+            if not rows:
+                return True
+            game_ids = pd.Series([r[0] for r in rows], dtype=object)
+            # First row of every run of equal game_ids (a run continuing the previous fetch is skipped)
+            starts = game_ids[game_ids.ne(game_ids.shift(1, fill_value=last))]
+            if starts.duplicated().any() or not seen.isdisjoint(starts):
+                return False
+            seen.update(starts)
+            last = game_ids.iat[-1]
+    finally:
+        cursor.close()
+
+def iter_events(conn, columns=None, where=None, params=(), chunk_rows=200_000, max_memory_mb=None, with_rowid=False):
+    """
+    Streams the event table as DataFrames of complete games (table order within a game).
+    A game is never split across chunks (see iter_query_by_game).
+    With a game_id index (prepare_db) games come in game_id order, walking the index.
+    Without one, the table is read in rowid order, so SQLite never sorts the whole table before
+    the first chunk, provided each game's rows are stored together (checked up front with
+    games_stored_together). Otherwise it falls back to ORDER BY game_id, which makes SQLite
+    sort the table first (prepare_db's index avoids that).
+    Pass max_memory_mb to size chunks from a memory budget; with_rowid adds an 'event_rowid' column.
+    """
+    if max_memory_mb is not None:
+        chunk_rows = chunk_rows_for_memory(conn, max_memory_mb, 'event', columns)
+
+    col_sql = '*' if columns is None else ', '.join(f'"{c}"' for c in columns)
+    if with_rowid:
+        col_sql = f"rowid AS event_rowid, {col_sql}"
+    query = f'SELECT {col_sql} FROM event'
+    if where:
+        query += f" WHERE {where}"
+    # Index order sorts only within a game; without the index ORDER BY game_id sorts the whole table
+    ordered = has_game_index(conn) or not games_stored_together(conn, where, params, chunk_rows)
+    query += " ORDER BY game_id, rowid" if ordered else " ORDER BY rowid"
+    yield from iter_query_by_game(conn, query, params, chunk_rows, ordered=ordered)
 
-def load_games(conn):
+def load_games(conn, columns=None, where=None, params=()):
     """
     Load game score data.
+    Pass columns=GAME_COLUMNS to fetch only what logic.py needs.
     """
-    query = """
-    SELECT * FROM games
+    return compact_dtypes(select(conn, 'games', columns, where, params, order_by=TABLE_ORDER))
+
+def season_expr(conn):
+    """
+    SQL expression for a game's season: the season column, or the year of date on older snapshots.
+    """
+    return 'season' if 'season' in table_columns(conn, 'games') else 'substr(date, 1, 4)'
+
+def load_seasons(conn, where=None, params=()):
+    """
+    Distinct seasons in the games table (optionally filtered), in ascending order.
+    Games without a season come back as None (sorted last).
+    """
+    query = f"SELECT DISTINCT {season_expr(conn)} AS season FROM games"
+    if where:
+        query += f" WHERE {where}"
+    seasons = [row[0] for row in conn.execute(query, params)]
+    return sorted(s for s in seasons if s is not None) + [None] * (None in seasons)
+
+def season_filter(season, expr='season'):
+    """
+    SQL predicate (and params) over the games table selecting one season.
     """
-    # Reading all might be heavy if db is huge, but usually manageable for this scope.
-    # If optimization needed, select specific columns.
-    return pd.read_sql_query(query, conn)
+    if season is None:
+        return f"{expr} IS NULL", ()
+    return f"{expr} = ?", (season,)
 
 def load_all_innings_scores(conn):
     """
     Load innings scores for 4+ runs analysis.
     We need efficient loading here.
     """
-    # Simply reusing load_games as it contains all inning scores
-    return load_games(conn)
+    # Only ids, date, ballpark and innings 1-9 are used downstream
+    return load_games(conn, columns=GAME_COLUMNS)
 
 def load_teams(conn):
     """
     Load team names mapping.
     """
     query = "SELECT team_id, team_name FROM teams"
-    return pd.read_sql_query(query, conn)
+    return read_sql(conn, query)
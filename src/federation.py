@@ -0,0 +1,132 @@
+import os
+import glob
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import pandas as pd
+
+from src import data, pipeline, run_expectancy, leaderboards
+
+# Several yakyuu.db snapshots (e.g. one per league/era) analysed as one dataset.
+# Each DB is loaded and processed by its own thread (sqlite3 releases the GIL while a query
+# runs), rows are tagged with the DB's dataset name, and game_ids found in more than one DB
+# are prefixed with '<dataset>:' so games never merge across snapshots.
+DATASET_COLUMN = 'dataset'
+GAME_ID_SEP = ':'
+
+def expand_db_paths(patterns):
+    """
+    DB paths from paths and glob patterns, in the given order (matches of a glob sorted),
+    without duplicates. Raises FileNotFoundError for a path or pattern that matches nothing.
+    """
+    paths, seen = [], set()
+    for pattern in patterns:
+        matches = sorted(glob.glob(pattern)) if glob.has_magic(pattern) else [pattern]
+        if not matches or not all(os.path.exists(m) for m in matches):
+            raise FileNotFoundError(f"No database matches: {pattern}")
+        for m in matches:
+            key = os.path.abspath(m)
+            if key not in seen:
+                seen.add(key)
+                paths.append(m)
+    return paths
+
+def sources(db_paths):
+    """
+    [{'dataset': name, 'db': path}] with unique dataset names: the file stem, or the parent
+    directory name when stems repeat (e.g. 2018-2020/yakyuu.db), numbered if still ambiguous.
+    """
+    names = [Path(p).stem for p in db_paths]
+    if len(set(names)) < len(names):
+        names = [Path(p).resolve().parent.name or Path(p).stem for p in db_paths]
+    counts = Counter(names)
+    if any(c > 1 for c in counts.values()):
+        names = [f"{n}-{i}" for i, n in enumerate(names, 1)]
+    return [{'dataset': n, 'db': p} for n, p in zip(names, db_paths)]
+
+def _map_threads(func, items, max_workers=None):
+    with ThreadPoolExecutor(max_workers=max_workers or len(items)) as executor:
+        return list(executor.map(func, items))
+
+def _run_source(source, triggers):
+    conn = data.get_db_connection(source['db'])
+    try:
+        teams_df = data.load_teams(conn)
+    finally:
+        conn.close()
+    team_map = dict(zip(teams_df['team_id'], teams_df['team_name']))
+    return pipeline.run_partition(source['db'], team_map, triggers=triggers), team_map
+
+def tag_frames(parts, srcs):
+    """
+    Concatenates per-DB pipeline results (dicts of frames) key by key, with a leading dataset
+    column and colliding game_ids prefixed. Returns (combined dict, set of colliding game_ids).
+    """
+    seen = Counter(g for p in parts for g in set(p['games']['game_id']))
+    colliding = {g for g, n in seen.items() if n > 1}
+    combined = {}
+    for key in parts[0]:
+        frames = []
+        for part, src in zip(parts, srcs):
+            df = part[key]
+            df.insert(0, DATASET_COLUMN, src['dataset'])
+            if colliding and 'game_id' in df.columns:
+                game_id = df['game_id'].astype(object)
+                hit = game_id.isin(colliding)
+                df['game_id'] = game_id.mask(hit, src['dataset'] + GAME_ID_SEP + game_id.astype(str))
+            frames.append(df)
+        combined[key] = pd.concat(frames, ignore_index=True)
+    return combined, colliding
+
+def run_federated(srcs, triggers=(), max_workers=None):
+    """
+    pipeline.run_partition over every source concurrently (threads), combined with tag_frames.
+    Returns the run_partition dict of frames plus 'collisions' (game_ids prefixed) and
+    'team_map' (team names of every DB; a later DB wins for a team_id named differently).
+    """
+    runs = _map_threads(lambda s: _run_source(s, triggers), srcs, max_workers)
+    result, colliding = tag_frames([part for part, _ in runs], srcs)
+    result['collisions'] = colliding
+    result['team_map'] = {k: v for _, team_map in runs for k, v in team_map.items()}
+    return result
+
+def source_game_ids(df, dataset):
+    """
+    Original game_ids of the rows of one dataset (colliding ids lose their prefix).
+    """
+    rows = df[df[DATASET_COLUMN] == dataset]
+    return rows, rows['game_id'].astype(str).str.removeprefix(dataset + GAME_ID_SEP)
+
+def load_run_expectancy(srcs, max_workers=None):
+    """
+    RE24 over every source: each DB is scanned in its own thread, state totals are summed.
+    """
+    def load(source):
+        conn = data.get_db_connection(source['db'])
+        try:
+            return run_expectancy.load_run_expectancy(conn)
+        finally:
+            conn.close()
+    return run_expectancy.combine_run_expectancy(_map_threads(load, srcs, max_workers))
+
+def federated_leaderboards(srcs, gs_df, innings_df, max_workers=None):
+    """
+    leaderboards.leaderboards over every source: batter appearances are joined against each
+    DB's event table in its own thread, then aggregated together (batter ids are shared).
+    """
+    innings_df = innings_df.reset_index(drop=True)
+
+    def appearances(source):
+        rows, game_ids = source_game_ids(innings_df, source['dataset'])
+        conn = data.get_db_connection(source['db'])
+        try:
+            found = leaderboards.appearances(conn, rows.assign(game_id=game_ids))
+        finally:
+            conn.close()
+        # Back to row positions of the combined innings table
+        found['inning_row'] = rows.index.to_numpy()[found['inning_row'].to_numpy()]
+        return found
+
+    found = pd.concat(_map_threads(appearances, srcs, max_workers), ignore_index=True)
+    return leaderboards.aggregate(gs_df, innings_df, found)
@@ -0,0 +1,111 @@
+import json
+import os
+import shutil
+import pandas as pd
+from pandas.api.types import is_bool_dtype, is_numeric_dtype
+from pathlib import Path
+
+from src import viz, outputs
+
+WATERMARK_FILE = 'watermark.json'
+SUMMARY_STATE_FILE = 'summary_state.csv'
+
+def load_watermark(out_dir, db_path):
+    """
+    Returns the stored watermark for out_dir, or None if an incremental run isn't possible
+    (no previous run, outputs missing, or outputs built from a different DB).
+    """
+    out_dir = Path(out_dir)
+    path = out_dir / WATERMARK_FILE
+    if not path.exists():
+        return None
+    with open(path, encoding='utf-8') as f:
+        watermark = json.load(f)
+    if watermark.get('db') != os.path.abspath(db_path):
+        return None
+    required = ['grandslam_events.csv', 'fourplus_inning_events.csv', SUMMARY_STATE_FILE]
+    if not all((out_dir / name).exists() for name in required):
+        return None
+    return watermark
+
+def save_watermark(out_dir, games_df, db_path, previous=None):
+    """
+    Stores the last processed (date, game_id) so the next run only picks up newer games.
+    """
+    games_total = len(games_df) + (previous['games_processed'] if previous else 0)
+    if games_df.empty:
+        watermark = dict(previous)
+    else:
+        last = games_df.sort_values(['date', 'game_id']).iloc[-1]
+        watermark = {'date': str(last['date']), 'game_id': str(last['game_id'])}
+    watermark.update(db=os.path.abspath(db_path), games_processed=int(games_total))
+    raw = json.dumps(watermark, ensure_ascii=False, indent=2)
+    outputs.atomic_write(Path(out_dir) / WATERMARK_FILE, lambda tmp: tmp.write_text(raw, encoding='utf-8'))
+    return watermark
+
+def clear_watermark(out_dir):
+    """
+    Removes the watermark so the next --incremental run of out_dir starts with a full build.
+    """
+    (Path(out_dir) / WATERMARK_FILE).unlink(missing_ok=True)
+
+def new_games_filter(watermark):
+    """
+    SQL predicate (and params) over the games table selecting games after the watermark.
+    Assumes new games are appended in (date, game_id) order.
+    """
+    where = "(date > ? OR (date = ? AND game_id > ?))"
+    return where, (watermark['date'], watermark['date'], watermark['game_id'])
+
+def append_csv(df, path):
+    """
+    Appends rows to an existing output CSV, aligned to its header, and returns the rows appended.
+    Rows of games already in the file (left by a run that stopped before saving its watermark)
+    are skipped and the file is replaced atomically, so re-running after a crash is safe.
+    The file already starts with a BOM, so the appended part is plain utf-8.
+    """
+    path = Path(path)
+    header = pd.read_csv(path, nrows=0, encoding='utf-8-sig').columns
+    done = set(pd.read_csv(path, usecols=['game_id'], dtype=str, encoding='utf-8-sig')['game_id'])
+    df = df[~df['game_id'].astype(str).isin(done)]
+
+    def write(tmp):
+        shutil.copyfile(path, tmp)
+        df.reindex(columns=header).to_csv(tmp, mode='a', header=False, index=False, encoding='utf-8')
+    outputs.atomic_write(path, write)
+    return df
+
+def read_events_csv(path, like):
+    """
+    Reads an appended events CSV back with the dtypes of like (the rows of this run), as a full
+    run holds them: ids such as game_id stay strings, categories are rebuilt from every row.
+    """
+    categorical = [c for c, t in like.dtypes.items() if isinstance(t, pd.CategoricalDtype)]
+    text = [c for c, t in like.dtypes.items() if c in categorical or not (is_numeric_dtype(t) or is_bool_dtype(t))]
+    df = pd.read_csv(path, encoding='utf-8-sig', dtype={c: str for c in text}, float_precision='round_trip')
+    dtypes = {c: t for c, t in like.dtypes.items() if c in df.columns and c not in text}
+    dtypes.update({c: 'category' for c in categorical if c in df.columns})
+    return df.astype(dtypes)
+
+def load_summary_state(out_dir):
+    # round_trip keeps the float values (run rates) bit-identical to what was written
+    return pd.read_csv(Path(out_dir) / SUMMARY_STATE_FILE, float_precision='round_trip')
+
+def save_summary_state(state, out_dir):
+    outputs.atomic_write(Path(out_dir) / SUMMARY_STATE_FILE, lambda tmp: state.to_csv(tmp, index=False))
+
+def state_rows(state):
+    """
+    Number of event rows a summary state covers (scored_any is counted for every row).
+    """
+    return int(state.loc[state['metric'] == 'scored_any', 'count'].sum())
+
+def update_summary_state(out_dir, events_df):
+    """
+    Merges the partial aggregates of the rows of events_df (the appended events CSV, in file
+    order) that the stored state doesn't cover yet, so an interrupted run isn't counted twice.
+    """
+    state = load_summary_state(out_dir)
+    state = viz.merge_summary_state(state, viz.summary_state(events_df.iloc[state_rows(state):].copy()))
+    save_summary_state(state, out_dir)
+    return state
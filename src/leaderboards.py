@@ -0,0 +1,178 @@
+import json
+import sqlite3
+import numpy as np
+import pandas as pd
+
+from src import data
+
+# Per-batter and per-team grand slam leaderboards.
+# The in-memory GS events and big innings are copied into TEMP tables and aggregated in SQL
+# (GROUP BY + window ranks). Batters are matched to big innings by joining the event table
+# (appearances), separately, so the appearances of several DBs can be aggregated together.
+# Rates are ranked rounded, so ties don't depend on summation order.
+GS_TABLE = 'lb_grandslams'
+INNINGS_TABLE = 'lb_big_innings'
+APPEARANCES_TABLE = 'lb_appearances'
+
+# Each batter once per non-GS big inning he batted in (inning_row: row of the innings table)
+APPEARANCES_SQL = f"""
+SELECT DISTINCT e.batter_player_id AS batter, b.inning_row
+FROM temp.{INNINGS_TABLE} b
+JOIN event e ON e.game_id = b.game_id AND e.team = b.team_id AND e.inning = b.inning
+WHERE b.is_grandslam = 0
+"""
+
+BATTER_SQL = f"""
+WITH appearances AS (
+    SELECT a.batter, b.post_run_rate, b.post_inning_runs_1to9
+    FROM temp.{APPEARANCES_TABLE} a
+    JOIN temp.{INNINGS_TABLE} b ON b.inning_row = a.inning_row
+),
+gs AS (
+    SELECT batter, COUNT(*) AS grandslams, AVG(post_run_rate) AS gs_post_run_rate,
+           AVG(post_inning_runs_1to9) AS gs_post_runs, GROUP_CONCAT(DISTINCT team) AS teams
+    FROM temp.{GS_TABLE}
+    GROUP BY batter
+),
+non_gs AS (
+    SELECT batter, COUNT(*) AS non_gs_innings, AVG(post_run_rate) AS non_gs_post_run_rate,
+           AVG(post_inning_runs_1to9) AS non_gs_post_runs
+    FROM appearances
+    GROUP BY batter
+),
+batters AS (
+    SELECT batter FROM gs UNION SELECT batter FROM non_gs
+)
+SELECT
+    b.batter AS batter_player_id,
+    gs.teams,
+    COALESCE(gs.grandslams, 0) AS grandslams,
+    gs.gs_post_run_rate,
+    gs.gs_post_runs,
+    COALESCE(non_gs.non_gs_innings, 0) AS non_gs_innings,
+    non_gs.non_gs_post_run_rate,
+    non_gs.non_gs_post_runs,
+    gs.gs_post_run_rate - non_gs.non_gs_post_run_rate AS run_rate_diff,
+    RANK() OVER (ORDER BY COALESCE(gs.grandslams, 0) DESC) AS gs_rank,
+    CASE WHEN gs.gs_post_run_rate IS NOT NULL
+         THEN RANK() OVER (PARTITION BY gs.gs_post_run_rate IS NOT NULL ORDER BY ROUND(gs.gs_post_run_rate, 9) DESC) END AS run_rate_rank
+FROM batters b
+LEFT JOIN gs ON gs.batter = b.batter
+LEFT JOIN non_gs ON non_gs.batter = b.batter
+ORDER BY gs_rank, run_rate_rank, batter_player_id
+"""
+
+TEAM_SQL = f"""
+WITH gs AS (
+    SELECT team, COUNT(*) AS grandslams, COUNT(DISTINCT batter) AS gs_batters,
+           AVG(post_run_rate) AS gs_post_run_rate, AVG(post_inning_runs_1to9) AS gs_post_runs
+    FROM temp.{GS_TABLE}
+    GROUP BY team
+),
+non_gs AS (
+    SELECT team, COUNT(*) AS non_gs_innings, AVG(post_run_rate) AS non_gs_post_run_rate,
+           AVG(post_inning_runs_1to9) AS non_gs_post_runs
+    FROM temp.{INNINGS_TABLE}
+    WHERE is_grandslam = 0
+    GROUP BY team
+),
+teams AS (
+    SELECT team FROM gs UNION SELECT team FROM non_gs
+)
+SELECT
+    t.team,
+    COALESCE(gs.grandslams, 0) AS grandslams,
+    COALESCE(gs.gs_batters, 0) AS gs_batters,
+    gs.gs_post_run_rate,
+    gs.gs_post_runs,
+    COALESCE(non_gs.non_gs_innings, 0) AS non_gs_innings,
+    non_gs.non_gs_post_run_rate,
+    non_gs.non_gs_post_runs,
+    gs.gs_post_run_rate - non_gs.non_gs_post_run_rate AS run_rate_diff,
+    RANK() OVER (ORDER BY COALESCE(gs.grandslams, 0) DESC) AS gs_rank,
+    CASE WHEN gs.gs_post_run_rate IS NOT NULL
+         THEN RANK() OVER (PARTITION BY gs.gs_post_run_rate IS NOT NULL ORDER BY ROUND(gs.gs_post_run_rate, 9) DESC) END AS run_rate_rank
+FROM teams t
+LEFT JOIN gs ON gs.team = t.team
+LEFT JOIN non_gs ON non_gs.team = t.team
+ORDER BY gs_rank, run_rate_rank, t.team
+"""
+
+def _gs_table(gs_df):
+    return pd.DataFrame({
+        'batter': gs_df['batter_player_id'].astype(object),
+        'team': gs_df['team'].astype(object),
+        'post_run_rate': gs_df['post_run_rate'].astype(float),
+        'post_inning_runs_1to9': gs_df['post_inning_runs_1to9'].astype(float),
+    })
+
+def _innings_table(innings_df):
+    """
+    Big innings keyed like the event table: batting team id and inning as '7T' / '7B'.
+    """
+    home = (innings_df['side'] == 'home').to_numpy()
+    inning_no = innings_df['inning_no'].astype(int).astype(str).to_numpy(dtype=object)
+    return pd.DataFrame({
+        'inning_row': np.arange(len(innings_df)),
+        # TEXT like event.game_id, or the join matches nothing
+        'game_id': innings_df['game_id'].astype(str),
+        'team_id': np.where(home, innings_df['home_team_id'].astype(object), innings_df['away_team_id'].astype(object)),
+        'inning': inning_no + np.where(home, 'B', 'T').astype(object),
+        'team': innings_df['team'].astype(object),
+        'is_grandslam': innings_df['is_grandslam'].astype(bool).astype(int),
+        'post_run_rate': innings_df['post_run_rate'].astype(float),
+        'post_inning_runs_1to9': innings_df['post_inning_runs_1to9'].astype(float),
+    })
+
+def appearances(conn, innings_df):
+    """
+    (batter, inning_row) pairs: batters of the event table in conn who batted in a non-GS
+    big inning of innings_df (inning_row = position in innings_df).
+    """
+    data.temp_table(conn, INNINGS_TABLE, _innings_table(innings_df))
+    try:
+        return pd.read_sql_query(APPEARANCES_SQL, conn)
+    finally:
+        conn.execute(f'DROP TABLE IF EXISTS temp.{INNINGS_TABLE}')
+
+def aggregate(gs_df, innings_df, appearances_df):
+    """
+    Leaderboards from the GS events, big innings and their batter appearances (see leaderboards).
+    Runs on an in-memory SQLite database: no event table is needed at this point.
+    """
+    conn = sqlite3.connect(':memory:')
+    try:
+        data.temp_table(conn, GS_TABLE, _gs_table(gs_df))
+        data.temp_table(conn, INNINGS_TABLE, _innings_table(innings_df))
+        data.temp_table(conn, APPEARANCES_TABLE, appearances_df[['batter', 'inning_row']])
+        batters = pd.read_sql_query(BATTER_SQL, conn)
+        teams = pd.read_sql_query(TEAM_SQL, conn)
+    finally:
+        conn.close()
+    for df in (batters, teams):
+        df['run_rate_rank'] = df['run_rate_rank'].astype('Int64')
+    return batters, teams
+
+def leaderboards(conn, gs_df, innings_df):
+    """
+    Returns (batters, teams) leaderboards:
+    - grandslams: valid GS hit (gs_df, e.g. logic.process_grandslams output), gs_rank by that count
+    - gs_post_run_rate / gs_post_runs: the hitting team's post-GS stats, averaged
+    - non_gs_innings / non_gs_post_*: non-GS big innings of innings_df (logic.merge_and_tag output)
+      in which the batter batted (for teams: the team's non-GS big innings)
+    - run_rate_diff: gs_post_run_rate - non_gs_post_run_rate; run_rate_rank ranks gs_post_run_rate
+    Every batter with a GS or a non-GS big-inning appearance is listed.
+    """
+    return aggregate(gs_df, innings_df, appearances(conn, innings_df))
+
+def export_leaderboards(batters, teams, output_path):
+    """
+    Dashboard JSON: {'metadata', 'batters': [...], 'teams': [...]} (NaN -> null).
+    """
+    board = {
+        "metadata": {"description": "Grand slam leaderboards: post-GS run rate vs non-GS big innings"},
+        "batters": json.loads(batters.to_json(orient='records')),
+        "teams": json.loads(teams.to_json(orient='records')),
+    }
+    with open(output_path, 'w', encoding='utf-8') as f:
+        json.dump(board, f, ensure_ascii=False, separators=(',', ':'))
@@ -0,0 +1,136 @@
+import sys
+import os
+import json
+import time
+import random
+import argparse
+import datetime
+import threading
+import urllib.error
+import urllib.request
+from urllib.parse import urlencode
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import numpy as np
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src import bench, server, federation
+
+# Local load generator for src/server.py: sends a mix of /api/events and /api/summary queries
+# from a fixed pool of distinct queries (so repeats exercise the LRU cache) and reports
+# throughput and latency percentiles. Uses only localhost; no external service is involved.
+PERCENTILES = [50, 90, 95, 99]
+
+def query_pool(meta, distinct, seed=0):
+    """
+    `distinct` random query paths built from the filter values of /api/meta.
+    """
+    rng = random.Random(seed)
+    filters = meta['filters']
+    thresholds = [t for t in meta['thresholds'] if t >= 1] or [server.DEFAULT_THRESHOLD]
+    pool = []
+    for _ in range(distinct):
+        params = {'threshold': rng.choice(thresholds)}
+        for key in ('stage', 'team', 'season'):
+            if filters.get(key) and rng.random() < 0.3:
+                params[key] = rng.choice(filters[key])
+        if rng.random() < 0.5:
+            params['group_by'] = ','.join(rng.sample(server.GROUP_KEYS, rng.randint(1, 2)))
+            path = '/api/summary'
+        else:
+            params['page'] = rng.randint(1, 3)
+            path = '/api/events'
+        pool.append(f"{path}?{urlencode(params)}")
+    return pool
+
+def _get(url, timeout):
+    start = time.perf_counter()
+    try:
+        with urllib.request.urlopen(url, timeout=timeout) as resp:
+            resp.read()
+            return time.perf_counter() - start, resp.status, resp.headers.get('X-Cache') == 'HIT'
+    except urllib.error.HTTPError as e:
+        return time.perf_counter() - start, e.code, False
+
+def run_load(base_url, pool, requests, concurrency, seed=0, timeout=30):
+    """
+    Sends `requests` GETs drawn from pool with `concurrency` threads.
+    Returns a dict of throughput, cache hit rate, errors and latency percentiles (ms).
+    """
+    rng = random.Random(seed)
+    urls = [base_url + rng.choice(pool) for _ in range(requests)]
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        results = list(executor.map(lambda u: _get(u, timeout), urls))
+    elapsed = time.perf_counter() - start
+
+    latency_ms = np.array([r[0] for r in results]) * 1000
+    return {
+        'requests': requests,
+        'concurrency': concurrency,
+        'distinct_queries': len(set(pool)),
+        'elapsed_s': round(elapsed, 3),
+        'requests_per_s': round(requests / elapsed, 1) if elapsed else None,
+        'errors': sum(r[1] != 200 for r in results),
+        'cache_hit_rate': round(sum(r[2] for r in results) / requests, 3) if requests else None,
+        'latency_ms': {f'p{p}': round(float(np.percentile(latency_ms, p)), 3) for p in PERCENTILES} if requests else {},
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Load generator for the local query API (src/server.py)")
+    parser.add_argument('--url', type=str, default=None, help='Base URL of a running server (e.g. http://127.0.0.1:8000)')
+    parser.add_argument('--db', type=str, nargs='+', default=['yakyuu.db'], help='Without --url: start a server on these DB(s) in-process')
+    parser.add_argument('--requests', type=int, default=2000, help='Total requests sent')
+    parser.add_argument('--concurrency', type=int, default=8, help='Concurrent client threads')
+    parser.add_argument('--distinct', type=int, default=50, help='Distinct queries in the pool (fewer = more cache hits)')
+    parser.add_argument('--cache-size', type=int, default=256, help='LRU size of the in-process server')
+    parser.add_argument('--seed', type=int, default=0, help='Seed of the query pool and request order')
+    parser.add_argument('--out', type=str, default=None, help='Also write the results as JSON')
+    args = parser.parse_args()
+
+    httpd = None
+    base_url = args.url.rstrip('/') if args.url else None
+    if base_url is None:
+        try:
+            db_paths = federation.expand_db_paths(args.db)
+        except FileNotFoundError as e:
+            parser.error(str(e))
+        print(f"Loading {', '.join(db_paths)}...")
+        start = time.perf_counter()
+        service = server.QueryService.from_db(db_paths, cache_size=args.cache_size)
+        print(f"  Startup: {time.perf_counter() - start:.2f}s")
+        httpd = server.make_server(service, port=0)
+        threading.Thread(target=httpd.serve_forever, daemon=True).start()
+        base_url = f"http://127.0.0.1:{httpd.server_address[1]}"
+
+    try:
+        with urllib.request.urlopen(base_url + '/api/meta') as resp:
+            meta = json.load(resp)
+        pool = query_pool(meta, args.distinct, args.seed)
+        print(f"Sending {args.requests} requests ({args.concurrency} threads, {len(set(pool))} distinct queries) to {base_url}")
+        results = run_load(base_url, pool, args.requests, args.concurrency, args.seed)
+    finally:
+        if httpd is not None:
+            httpd.shutdown()
+            httpd.server_close()
+
+    print(f"  {results['requests_per_s']} req/s, {results['errors']} errors, cache hit rate {results['cache_hit_rate']}")
+    print("  Latency (ms): " + ', '.join(f"{k} {v}" for k, v in results['latency_ms'].items()))
+
+    if args.out:
+        results = {
+            'created': datetime.datetime.now().isoformat(timespec='seconds'),
+            'environment': bench.environment(),
+            'url': base_url if args.url else None,
+            'results': results,
+        }
+        out_path = Path(args.out)
+        out_path.parent.mkdir(parents=True, exist_ok=True)
+        with open(out_path, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2)
+        print(f"Wrote {out_path}")
+
+if __name__ == "__main__":
+    main()
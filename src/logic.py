@@ -6,6 +6,7 @@ def parse_inning(inning_str):
     """
     Parses inning string like '7T', '1B'.
     Returns (inning_no, half) or (None, None) if format invalid.
+    The number must be ASCII digits: ' 7T', '+7T', '1_0T' or '７T' (full-width) are invalid.
     """
     try:
         if not inning_str or len(inning_str) < 2:
@@ -14,6 +15,9 @@ def parse_inning(inning_str):
         # usually number + T/B
         number_part = inning_str[:-1]
         half_part = inning_str[-1]
+        # ASCII digits only: no sign, padding or other numerals (predicates compile this rule to SQL)
+        if not (number_part.isascii() and number_part.isdigit()):
+            return None, None
         
         return int(number_part), half_part
     except ValueError:
@@ -28,87 +32,110 @@ def is_grandslam_onbase(on_base_str):
         return False
     return ('1' in on_base_str) and ('2' in on_base_str) and ('3' in on_base_str)
 
-def process_grandslams(events_df, games_df):
+def map_unique(series, func):
     """
-    Enriches event data with game context and calculates post-inning run rates.
+    Applies a scalar function once per unique value of series and broadcasts the results back.
+    Missing values (NaN/None) are passed to func as None.
+    Categorical series reuse their categories as the lookup table (no factorize pass).
     """
-    # 1. Strict Grand Slam Filters
-    # Already filtered by hr=1, rbi=4 in data loading, but check on_base here.
-    gs_df = events_df[events_df['on_base'].apply(is_grandslam_onbase)].copy()
+    if isinstance(series.dtype, pd.CategoricalDtype):
+        codes, uniques = series.cat.codes.to_numpy(), series.cat.categories
+    else:
+        codes, uniques = pd.factorize(series)
+    # Object array so tuple results stay scalars; code -1 (missing) picks the trailing slot
+    lookup = np.empty(len(uniques) + 1, dtype=object)
+    for i, u in enumerate(uniques):
+        lookup[i] = func(u)
+    if (codes < 0).any():
+        lookup[-1] = func(None)
+    return pd.Series(lookup[codes], index=series.index)
+
+POST_STAT_COLS = ['post_inning_runs_1to9', 'remaining_off_innings_1to9', 'team_total_runs_1to9', 'opponent_total_runs_1to9']
+
+def inning_matrices(df):
+    """
+    Converts the visitor_inn1..9 / home_inn1..9 columns into two (n_rows, 9) float matrices.
+    NaN means the inning was not played (e.g. no 9th-inning bottom half).
+    """
+    visitor = df[[f'visitor_inn{i}' for i in range(1, 10)]].to_numpy(dtype=float, na_value=np.nan)
+    home = df[[f'home_inn{i}' for i in range(1, 10)]].to_numpy(dtype=float, na_value=np.nan)
+    return visitor, home
+
+def _post_stats(visitor, home, is_home, inning_no, index):
+    """
+    Core of calc_post_stats over row-aligned (n_rows, 9) inning matrices.
+    """
+    is_home = np.asarray(is_home, dtype=bool)[:, None]
+    team = np.where(is_home, home, visitor)
+    opponent = np.where(is_home, visitor, home)
+
+    # Masked cumulative sums with a leading zero column: cum[:, k] = sum of innings 1..k
+    played = ~np.isnan(team)
+    zero = np.zeros((len(team), 1))
+    team_cum = np.hstack([zero, np.cumsum(np.where(played, team, 0.0), axis=1)])
+    played_cum = np.hstack([zero, np.cumsum(played, axis=1, dtype=float)])
+
+    # Innings after inning_no (inning_no+1 .. 9)
+    start = np.clip(np.asarray(inning_no, dtype=float), 0, 9).astype(int)
+    rows = np.arange(len(team))
+
+    return pd.DataFrame({
+        'post_inning_runs_1to9': team_cum[:, 9] - team_cum[rows, start],
+        'remaining_off_innings_1to9': played_cum[:, 9] - played_cum[rows, start],
+        'team_total_runs_1to9': team_cum[:, 9],
+        'opponent_total_runs_1to9': np.nansum(opponent, axis=1),
+    }, index=index)
+
+def calc_post_stats(df):
+    """
+    Vectorized post-inning stats for every row of df at once.
+    df needs 'side', 'inning_no' and the 18 inning score columns (one row per event/inning).
+    Returns a DataFrame with POST_STAT_COLS aligned to df.index.
+    """
+    visitor, home = inning_matrices(df)
+    return _post_stats(visitor, home, (df['side'] == 'home').to_numpy(), df['inning_no'].to_numpy(dtype=float), df.index)
+
+def process_trigger_events(events_df, games_df, flag='is_trigger'):
+    """
+    Enriches trigger events (e.g. rows picked by a predicates.Predicate) with game context
+    and post-inning run rates. events_df needs game_id, team, inning and batter_player_id.
+    Every matched row is flagged True in column `flag`.
+    """
+    events_df = events_df.copy()
     
-    # 2. Parse Inning
-    inning_parsed = gs_df['inning'].apply(parse_inning)
-    gs_df['inning_no'] = [x[0] for x in inning_parsed]
-    gs_df['half'] = [x[1] for x in inning_parsed]
+    # 1. Parse Inning (once per unique inning string)
+    inning_parsed = map_unique(events_df['inning'], lambda s: parse_inning(s) if isinstance(s, str) else (None, None))
+    events_df['inning_no'] = [x[0] for x in inning_parsed]
+    events_df['half'] = [x[1] for x in inning_parsed]
     
     # Filter 9th inning or earlier (ignore extras for now as per PRD)
-    gs_df = gs_df[gs_df['inning_no'] <= 9].copy()
+    events_df = events_df[events_df['inning_no'] <= 9].copy()
     
-    # 3. Join with Games
+    # 2. Join with Games
     # We need home_team_id and away_team_id to determine side
-    merged = pd.merge(gs_df, games_df, on='game_id', how='left')
+    merged = pd.merge(events_df, games_df, on='game_id', how='left')
     
-    # 4. Determine Side (Home/Visitor)
-    def determine_side(row):
-        if row['team'] == row['home_team_id']:
-            return 'home'
-        elif row['team'] == row['away_team_id']:
-            return 'visitor'
-        else:
-            return None # Data mismatch
-
-    merged['side'] = merged.apply(determine_side, axis=1)
-    merged = merged.dropna(subset=['side']) # Drop mismatches
+    # 3. Determine Side (Home/Visitor); neither team -> data mismatch, dropped
+    team = merged['team'].to_numpy()
+    merged['side'] = np.where(team == merged['home_team_id'].to_numpy(), 'home',
+                              np.where(team == merged['away_team_id'].to_numpy(), 'visitor', None))
+    merged = merged.dropna(subset=['side'])
     
-    # 5. Calculate Post-Inning Runs and Remaining Innings
-    def calc_post_stats(row):
-        inning_no = row['inning_no']
-        side = row['side']
-        
-        runs_total = 0
-        innings_count = 0
-        
-        runs_total = 0
-        innings_count = 0
-        
-        # Sum runs from (current inning + 1) to 9
-        for i in range(inning_no + 1, 10):
-            col_name = f"{side}_inn{i}"
-            if col_name in row and pd.notnull(row[col_name]):
-                runs_total += row[col_name]
-                innings_count += 1
-        
-        # Team Total 1-9
-        team_total = 0
-        for i in range(1, 10):
-            col_name = f"{side}_inn{i}"
-            if col_name in row and pd.notnull(row[col_name]):
-                team_total += row[col_name]
-                
-        opponent_side = 'visitor' if side == 'home' else 'home'
-        opponent_total = 0
-        for i in range(1, 10):
-            col_name = f"{opponent_side}_inn{i}"
-            if col_name in row and pd.notnull(row[col_name]):
-                opponent_total += row[col_name]
-
-        return pd.Series([runs_total, innings_count, team_total, opponent_total], 
-                         index=['post_inning_runs_1to9', 'remaining_off_innings_1to9', 'team_total_runs_1to9', 'opponent_total_runs_1to9'])
-
-    stats = merged.apply(calc_post_stats, axis=1)
+    # 4. Calculate Post-Inning Runs and Remaining Innings
+    stats = calc_post_stats(merged)
     merged = pd.concat([merged, stats], axis=1)
     
     # Calculate Rate
     merged['post_run_rate'] = merged['post_inning_runs_1to9'] / merged['remaining_off_innings_1to9']
     
     # Flag for visualization/comparison
-    merged['is_grandslam'] = True
+    merged[flag] = True
     
     # Select relevant columns for clean output
     cols = [
         'game_id', 'date', 'team', 'side', 'inning', 'inning_no', 'batter_player_id',
         'home_team_id', 'away_team_id',
-        'post_inning_runs_1to9', 'remaining_off_innings_1to9', 'team_total_runs_1to9', 'opponent_total_runs_1to9', 'post_run_rate', 'is_grandslam'
+        'post_inning_runs_1to9', 'remaining_off_innings_1to9', 'team_total_runs_1to9', 'opponent_total_runs_1to9', 'post_run_rate', flag
     ]
     # Add ballpark if available in games_df
     if 'ballpark' in merged.columns:
@@ -121,115 +148,81 @@ def process_grandslams(events_df, games_df):
         
     return merged[cols]
 
-def extract_high_scoring_innings(games_df, threshold=4):
+def process_grandslams(events_df, games_df):
+    """
+    Enriches event data with game context and calculates post-inning run rates.
+    """
+    # Strict Grand Slam Filters
+    # Already filtered by hr=1, rbi=4 in data loading, but check on_base here.
+    onbase_ok = map_unique(events_df['on_base'], is_grandslam_onbase).to_numpy(dtype=bool)
+    return process_trigger_events(events_df[onbase_ok], games_df, flag='is_grandslam')
+
+def build_innings_table(games_df):
     """
-    Extracts all innings with run count >= threshold.
+    Long table of every played half-inning (innings 1-9) with its post-inning stats.
+    Built once, then split by threshold with select_high_scoring_innings.
     """
     # 1. Melt to long format: game_id, side, inning_no, runs
-    id_vars = ['game_id', 'date', 'home_team_id', 'away_team_id']
-    if 'ballpark' in games_df.columns:
-        id_vars.append('ballpark')
-        
-    # We need to melt both visitor_innX and home_innX
-    # Strategy: Melt all, then parse variable name
-    
-    value_vars = [c for c in games_df.columns if '_inn' in c and '10' not in c and '11' not in c and '12' not in c] # 1-9 only roughly
-    # Better: explicitly construct list 1-9
+    id_vars = ['game_id', 'home_team_id', 'away_team_id', 'game_pos']
     visitor_cols = [f'visitor_inn{i}' for i in range(1, 10)]
     home_cols = [f'home_inn{i}' for i in range(1, 10)]
     
-    long_df = games_df.melt(id_vars=id_vars, value_vars=visitor_cols + home_cols, 
-                            var_name='inn_col', value_name='runs_in_inning')
+    games = games_df[['game_id', 'home_team_id', 'away_team_id'] + visitor_cols + home_cols].copy()
+    games['game_pos'] = np.arange(len(games))
+    long_df = games.melt(id_vars=id_vars, value_vars=visitor_cols + home_cols, 
+                         var_name='inn_col', value_name='runs_in_inning')
     
     long_df = long_df.dropna(subset=['runs_in_inning'])
     
-    # 2. Parse side and inning number
+    # 2. Parse side and inning number (once per column name)
     def parse_col(s):
         parts = s.split('_')
         side = parts[0] # home or visitor
         inn_num = int(parts[1].replace('inn', ''))
         return side, inn_num
         
-    parsed = long_df['inn_col'].apply(parse_col)
+    parsed = map_unique(long_df['inn_col'], parse_col)
     long_df['side'] = [x[0] for x in parsed]
     long_df['inning_no'] = [x[1] for x in parsed]
     
-    # 3. Filter Threshold (Exactly 4 runs as requested)
-    high_df = long_df[long_df['runs_in_inning'] == threshold].copy()
-    
-    # 4. Map 'team' column for consistency with grandslam df
-    high_df['team'] = np.where(high_df['side'] == 'home', high_df['home_team_id'], high_df['away_team_id'])
+    # 3. Map 'team' column for consistency with grandslam df
+    long_df['team'] = np.where(long_df['side'] == 'home', long_df['home_team_id'], long_df['away_team_id'])
 
-    # Construct display inning string (e.g., "7回表", "7回裏")
-    def make_inning_str(row):
-        inn = row['inning_no']
-        # side is who is OFFENSE (scoring runs).
-        # visitor scoring -> Top (表), home scoring -> Bottom (裏)
-        # Note: logic.py extract_high_scoring_innings melts visitor_innX and home_innX.
-        # side='visitor' means visitor scored.
-        suffix = '表' if row['side'] == 'visitor' else '裏'
-        return f"{inn}回{suffix}"
-    
-    high_df['inning'] = high_df.apply(make_inning_str, axis=1)
+    # Display inning string (e.g., "7回表", "7回裏")
+    # side is who is OFFENSE (scoring runs): visitor scoring -> Top (表), home scoring -> Bottom (裏)
+    suffix = np.where(long_df['side'] == 'visitor', '表', '裏')
+    long_df['inning'] = long_df['inning_no'].astype(str) + '回' + suffix
     
-    # 5. Calculate Post Stats (Need to rejoin with full games_df or calculate from melted?)
-    # Re-using games_df is safer/easier logic similar to process_grandslams
+    # 4. Post stats for every half-inning, straight from the games' inning matrices
+    visitor, home = inning_matrices(games)
+    pos = long_df['game_pos'].to_numpy()
+    stats = _post_stats(visitor[pos], home[pos], (long_df['side'] == 'home').to_numpy(),
+                        long_df['inning_no'].to_numpy(dtype=float), long_df.index)
+    long_df = pd.concat([long_df, stats], axis=1)
     
-    # It's inefficient to apply row-by-row on the whole high_df if it's huge, 
-    # but for NPB history it should be fine (< 100k rows likely).
-    
-    # Let's merge games_df back to high_df to get all inning scores for calculation
-    # (The melted df only has single inning score)
-    high_df_merged = pd.merge(high_df, games_df, on='game_id', how='left')
-    
-    # Reuse calculation logic... or refactor.
-    # Refactoring calc_post_stats to be standalone would be better but for speed:
-    def calc_post_stats_simple(row):
-        inning_no = row['inning_no']
-        side = row['side'] # 'home' or 'visitor'
-        
-        runs_total = 0
-        innings_count = 0
-        
-        for i in range(inning_no + 1, 10):
-            col_name = f"{side}_inn{i}"
-            if col_name in row and pd.notnull(row[col_name]):
-                runs_total += row[col_name]
-                innings_count += 1
-        
-        team_total = 0
-        for i in range(1, 10):
-            col_name = f"{side}_inn{i}"
-            if col_name in row and pd.notnull(row[col_name]):
-                team_total += row[col_name]
-                
-        opponent_side = 'visitor' if side == 'home' else 'home'
-        opponent_total = 0
-        for i in range(1, 10):
-            col_name = f"{opponent_side}_inn{i}"
-            if col_name in row and pd.notnull(row[col_name]):
-                opponent_total += row[col_name]
+    return long_df[['game_id', 'side', 'inning_no', 'runs_in_inning', 'team', 'inning'] + POST_STAT_COLS]
 
-        return pd.Series([runs_total, innings_count, team_total, opponent_total], 
-                         index=['post_inning_runs_1to9', 'remaining_off_innings_1to9', 'team_total_runs_1to9', 'opponent_total_runs_1to9'])
-
-    # Need to suffix handling if merge happens.
-    # high_df has: game_id, date, home_team_id...
-    # games_df has: game_id, date, home_team_id... home_inn1...
-    
-    # Let's clean high_df before merge
-    high_df_clean = high_df[['game_id', 'side', 'inning_no', 'runs_in_inning', 'team', 'inning']]
-    merged_high = pd.merge(high_df_clean, games_df, on='game_id', how='left')
+def select_high_scoring_innings(innings_df, games_df, threshold=4, mode='eq'):
+    """
+    Picks big innings out of build_innings_table output.
+    mode='eq': runs_in_inning == threshold, mode='ge': runs_in_inning >= threshold.
+    """
+    if mode == 'eq':
+        mask = innings_df['runs_in_inning'] == threshold
+    elif mode == 'ge':
+        mask = innings_df['runs_in_inning'] >= threshold
+    else:
+        raise ValueError(f"Unknown threshold mode: {mode}")
+    high_df = innings_df[mask]
     
-    stats = merged_high.apply(calc_post_stats_simple, axis=1)
-    final_high = pd.concat([merged_high, stats], axis=1)
+    # Rejoin with games_df for date, ballpark and the inning scores (tooltip)
+    final_high = pd.merge(high_df, games_df, on='game_id', how='left')
     
     final_high['post_run_rate'] = final_high['post_inning_runs_1to9'] / final_high['remaining_off_innings_1to9']
     
     # Default is_grandslam to False (will be overwritten if matched later)
     final_high['is_grandslam'] = False
     
-    # Select relevant columns for clean output
     # Select relevant columns for clean output
     cols = [
         'game_id', 'date', 'team', 'side', 'inning', 'inning_no', 'runs_in_inning',
@@ -250,6 +243,20 @@ def extract_high_scoring_innings(games_df, threshold=4):
 
     return final_high[cols]
 
+def extract_high_scoring_innings(games_df, threshold=4, mode='eq'):
+    """
+    Extracts all innings with run count == threshold (or >= threshold with mode='ge').
+    """
+    return select_high_scoring_innings(build_innings_table(games_df), games_df, threshold, mode)
+
+def sweep_high_scoring_innings(games_df, thresholds, mode='eq'):
+    """
+    Big innings for several thresholds at once: the innings table and post stats are built once
+    and split per threshold. Returns {threshold: DataFrame} in the order given.
+    """
+    innings_df = build_innings_table(games_df)
+    return {t: select_high_scoring_innings(innings_df, games_df, t, mode) for t in thresholds}
+
 def merge_and_tag(grandslam_df, high_scoring_df):
     """
     Integrate Logic:
@@ -0,0 +1,82 @@
+import os
+import uuid
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import pandas as pd
+
+# Background threads writing output artifacts
+OUTPUT_THREADS = 4
+
+def atomic_write(path, write):
+    """
+    Calls write(tmp_path) on a temporary file next to path, then renames it over path.
+    Readers (e.g. the web app) see either the previous file or the complete new one.
+    """
+    path = Path(path)
+    tmp = path.with_name(f".{path.name}.{threading.get_ident()}.{uuid.uuid4().hex[:8]}.tmp")
+    try:
+        write(tmp)
+        os.replace(tmp, path)
+    except BaseException:
+        tmp.unlink(missing_ok=True)
+        raise
+    return path
+
+def _parquet_frame(df, index):
+    # Parquet needs flat string column names (summaries have MultiIndex columns)
+    df = df.reset_index() if index else df
+    if isinstance(df.columns, pd.MultiIndex):
+        df = df.set_axis(['_'.join(str(p) for p in col if str(p)) for col in df.columns], axis=1)
+    return df.set_axis([str(c) for c in df.columns], axis=1)
+
+class OutputWriter:
+    """
+    Queues output files and writes them in a thread pool while the caller keeps computing.
+    Every file goes through atomic_write. Frames are copied when queued, so later in-place
+    changes (e.g. summary columns added to the events) don't leak into the file.
+    parquet=True also writes <name>.parquet next to every CSV (needs pyarrow).
+    close() waits for every write and re-raises the first error.
+    """
+    def __init__(self, max_workers=OUTPUT_THREADS, parquet=False):
+        self.parquet = parquet
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='output')
+        self._futures = []
+
+    def submit(self, path, write):
+        """
+        Queues write(tmp_path) for path (see atomic_write).
+        """
+        self._futures.append(self._executor.submit(atomic_write, path, write))
+
+    def csv(self, df, path, index=False):
+        """
+        Queues df as a utf-8-sig CSV (plus Parquet when enabled).
+        """
+        df = df.copy()
+        self.submit(path, lambda tmp: df.to_csv(tmp, index=index, encoding='utf-8-sig'))
+        if self.parquet:
+            self.submit(Path(path).with_suffix('.parquet'), lambda tmp: _parquet_frame(df, index).to_parquet(tmp, index=False))
+
+    def close(self):
+        """
+        Waits for the queued writes. Returns the paths written.
+        """
+        try:
+            errors = [f.exception() for f in self._futures]
+        finally:
+            self._executor.shutdown()
+        for e in errors:
+            if e is not None:
+                raise e
+        return [f.result() for f in self._futures]
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        else:
+            self._executor.shutdown()
@@ -0,0 +1,144 @@
+import os
+import numpy as np
+import pandas as pd
+from concurrent.futures import ProcessPoolExecutor
+
+from src import data, logic, predicates, profiling
+
+def map_team_names(df, team_map):
+    """
+    Replaces team ids with team names (unknown ids are kept as-is) and adds home_team/away_team.
+    Each distinct id is looked up once.
+    """
+    def name(team_id):
+        return team_map.get(team_id, team_id)
+
+    df['team'] = logic.map_unique(df['team'], name)
+    df['home_team'] = logic.map_unique(df['home_team_id'], name)
+    df['away_team'] = logic.map_unique(df['away_team_id'], name)
+    return df
+
+def load_triggers(conn, names, games_df, events_where=None, params=()):
+    """
+    Loads each named trigger of predicates.TRIGGERS (SQL pushdown, innings 1-9) and runs it
+    through the same post-inning stats as grand slams. Returns one frame with a 'trigger' column.
+    """
+    frames = []
+    for name in names:
+        pred = predicates.TRIGGERS[name] & predicates.InningNo('<=', 9)
+        events = data.load_trigger_events(conn, pred, where=events_where, params=params)
+        trig = logic.process_trigger_events(events, games_df).drop(columns='is_trigger')
+        trig.insert(0, 'trigger', name)
+        frames.append(trig)
+    if not frames:
+        return pd.DataFrame(columns=['trigger'])
+    return pd.concat(frames, ignore_index=True)
+
+def run_partition(db_path, team_map, games_where=None, params=(), cache=None, triggers=(), profile=None):
+    """
+    load -> process_grandslams -> extract 4 runs innings -> merge_and_tag for one slice of games
+    (games_where restricts the games table; events follow via game_id).
+    Opens its own connection so it can run in a worker process.
+    Returns a dict of frames: events (raw GS candidates), games, gs, innings (innings table), final,
+    and triggers (events of the named predicates.TRIGGERS with post-inning stats).
+    Each step is a profiling stage; pass profile (profiling.settings()) in a worker process
+    to record there and get the records back under 'trace'.
+    """
+    if cache is not None:
+        data.configure_cache(**cache)
+    if profile is not None:
+        profiling.configure(**dict(profile, suffix=f'-{os.getpid()}'))
+
+    conn = data.get_db_connection(db_path)
+    try:
+        with profiling.stage('load') as st:
+            events_where = f"game_id IN (SELECT game_id FROM games WHERE {games_where})" if games_where else None
+            events_raw = data.load_grandslam_events(conn, where=events_where, params=params)
+            games_raw = data.load_games(conn, columns=data.GAME_COLUMNS, where=games_where, params=params)
+            st['rows'] = len(events_raw) + len(games_raw)
+        if triggers:
+            with profiling.stage('triggers') as st:
+                triggers_df = load_triggers(conn, triggers, games_raw, events_where, params)
+                map_team_names(triggers_df, team_map)
+                st['rows'] = len(triggers_df)
+        else:
+            triggers_df = load_triggers(conn, triggers, games_raw)
+    finally:
+        conn.close()
+
+    with profiling.stage('process_gs') as st:
+        gs_df = logic.process_grandslams(events_raw, games_raw)
+        map_team_names(gs_df, team_map)
+        st['rows'] = len(gs_df)
+
+    with profiling.stage('extract_big_innings') as st:
+        # Innings table + post stats are built once and shared with the threshold sweep
+        innings_df = logic.build_innings_table(games_raw)
+        high_df = logic.select_high_scoring_innings(innings_df, games_raw, threshold=4)
+        map_team_names(high_df, team_map)
+        st['rows'] = len(high_df)
+
+    with profiling.stage('merge_tag') as st:
+        final_df = logic.merge_and_tag(gs_df, high_df)
+        st['rows'] = len(final_df)
+
+    result = {'events': events_raw, 'games': games_raw, 'gs': gs_df, 'innings': innings_df, 'final': final_df,
+              'triggers': triggers_df}
+    if profile is not None:
+        result['trace'] = profiling.records()
+    return result
+
+def run_by_season(db_path, team_map, seasons, jobs, games_where=None, params=(), cache=None, season_expr='season',
+                  triggers=()):
+    """
+    Runs run_partition for each season in a process pool, concatenates the results and restores
+    the row order of a single run_partition over the same games (see serial_order), so output
+    is the same for any jobs count.
+    """
+    # Workers record their own stages when profiling is on; records are collected below
+    profile = profiling.settings() if profiling.settings()['enabled'] else None
+    with ProcessPoolExecutor(max_workers=jobs) as executor:
+        futures = []
+        for season in seasons:
+            where, season_params = data.season_filter(season, season_expr)
+            if games_where:
+                where = f"({games_where}) AND {where}"
+            futures.append(executor.submit(run_partition, db_path, team_map, where, tuple(params) + season_params, cache,
+                                          triggers, profile))
+        parts = [f.result() for f in futures]
+    for p in parts:
+        profiling.add_records(p.pop('trace', []))
+
+    if not parts:
+        return run_partition(db_path, team_map, games_where, params, cache, triggers)
+    result = {key: pd.concat([p[key] for p in parts], ignore_index=True) for key in parts[0]}
+
+    conn = data.get_db_connection(db_path)
+    try:
+        game_ids = data.select(conn, 'games', ['game_id'], games_where, params, order_by=data.TABLE_ORDER)['game_id']
+    finally:
+        conn.close()
+    return serial_order(result, game_ids, triggers)
+
+def serial_order(result, game_ids, triggers=()):
+    """
+    Reorders concatenated run_partition frames as one run_partition over all their games returns them:
+    - games, events, gs: by game in games-table order (game_ids), table order within a game
+    - innings, final: visitor then home, by inning, then by game (logic.build_innings_table)
+    - triggers: by trigger (the order of triggers), then by game
+    Events follow the games table order, as loaded when the event table is stored game by game.
+    """
+    position = pd.Series(np.arange(len(game_ids)), index=pd.Index(game_ids).astype(object)).groupby(level=0).first()
+    ordered = {}
+    for key, df in result.items():
+        if df.empty or 'game_id' not in df.columns:
+            ordered[key] = df
+            continue
+        # np.lexsort is stable: the last key is the primary one
+        keys = [df['game_id'].astype(object).map(position).to_numpy()]
+        if key in ('innings', 'final'):
+            keys += [df['inning_no'].to_numpy(), (df['side'] == 'home').to_numpy()]
+        elif key == 'triggers':
+            keys.append(df['trigger'].map({name: i for i, name in enumerate(triggers)}).to_numpy())
+        ordered[key] = df.iloc[np.lexsort(keys)].reset_index(drop=True)
+    return ordered
@@ -0,0 +1,184 @@
+import operator
+import numpy as np
+
+from src import logic
+
+# Declarative conditions over the `event` table.
+# Each predicate compiles to a SQL WHERE fragment (to_sql -> (sql, params)) and to a
+# vectorized boolean mask over a DataFrame of events (mask -> np.ndarray), with the
+# same semantics: rows where a value is NULL/unparseable never match (except under Not).
+
+_OPS = {
+    '=': operator.eq, '!=': operator.ne,
+    '<': operator.lt, '<=': operator.le,
+    '>': operator.gt, '>=': operator.ge,
+}
+
+def _quote(column):
+    return f'"{column}"'
+
+# inning like '7T': text whose number part is ASCII digits only (exactly logic.parse_inning's rule)
+_INNING_VALID_SQL = (
+    "typeof(inning) = 'text' AND length(inning) >= 2 "
+    "AND substr(inning, 1, length(inning) - 1) NOT GLOB '*[^0-9]*'"
+)
+_INNING_NO_SQL = "CAST(substr(inning, 1, length(inning) - 1) AS INTEGER)"
+
+def _parsed_inning(df):
+    """
+    (inning_no, half) per row, parsed once per unique inning string.
+    """
+    return logic.map_unique(df['inning'], lambda s: logic.parse_inning(s) if isinstance(s, str) else (None, None))
+
+class Predicate:
+    """
+    Base class; combine with &, | and ~.
+    """
+    def to_sql(self):
+        raise NotImplementedError
+
+    def mask(self, df):
+        raise NotImplementedError
+
+    def __and__(self, other):
+        return And(self, other)
+
+    def __or__(self, other):
+        return Or(self, other)
+
+    def __invert__(self):
+        return Not(self)
+
+class Compare(Predicate):
+    """
+    column <op> value, e.g. Compare('rbi', '>', 0).
+    """
+    def __init__(self, column, op, value):
+        if op not in _OPS:
+            raise ValueError(f"Unknown operator: {op}")
+        self.column, self.op, self.value = column, op, value
+
+    def to_sql(self):
+        return f"{_quote(self.column)} {self.op} ?", [self.value]
+
+    def mask(self, df):
+        col = df[self.column]
+        return (_OPS[self.op](col, self.value) & col.notna()).to_numpy(dtype=bool)
+
+class Contains(Predicate):
+    """
+    Text column contains every given substring (non-text values never match).
+    """
+    def __init__(self, column, *parts):
+        self.column, self.parts = column, parts
+
+    def to_sql(self):
+        col = _quote(self.column)
+        sql = " AND ".join([f"typeof({col}) = 'text'"] + [f"instr({col}, ?) > 0" for _ in self.parts])
+        return sql, list(self.parts)
+
+    def mask(self, df):
+        parts = self.parts
+        hit = logic.map_unique(df[self.column], lambda v: isinstance(v, str) and all(p in v for p in parts))
+        return hit.to_numpy(dtype=bool)
+
+def BasesLoaded():
+    """
+    on_base has runners on 1st, 2nd and 3rd (same rule as logic.is_grandslam_onbase).
+    """
+    return Contains('on_base', '1', '2', '3')
+
+class InningNo(Predicate):
+    """
+    Parsed inning number <op> value, e.g. InningNo('<=', 9).
+    """
+    def __init__(self, op, value):
+        if op not in _OPS:
+            raise ValueError(f"Unknown operator: {op}")
+        self.op, self.value = op, value
+
+    def to_sql(self):
+        return f"{_INNING_VALID_SQL} AND {_INNING_NO_SQL} {self.op} ?", [self.value]
+
+    def mask(self, df):
+        inning_no = np.array([p[0] for p in _parsed_inning(df)], dtype=float)
+        with np.errstate(invalid='ignore'):
+            return _OPS[self.op](inning_no, self.value) & ~np.isnan(inning_no)
+
+class Half(Predicate):
+    """
+    Half inning: 'T' (top, visitor batting) or 'B' (bottom, home batting).
+    """
+    def __init__(self, half):
+        self.half = half
+
+    def to_sql(self):
+        return f"{_INNING_VALID_SQL} AND substr(inning, -1) = ?", [self.half]
+
+    def mask(self, df):
+        return np.array([p[1] == self.half for p in _parsed_inning(df)], dtype=bool)
+
+class LastInGame(Predicate):
+    """
+    The last event of its game in table order (the play order proxy, see sequence.py).
+    mask() expects complete games in table order.
+    """
+    def to_sql(self):
+        # Uncorrelated: the per-game maximum is computed once, not per candidate row
+        return "rowid IN (SELECT MAX(rowid) FROM event GROUP BY game_id)", []
+
+    def mask(self, df):
+        return (~df.duplicated(subset='game_id', keep='last')).to_numpy(dtype=bool)
+
+class And(Predicate):
+    def __init__(self, *preds):
+        self.preds = preds
+
+    def to_sql(self):
+        parts = [p.to_sql() for p in self.preds]
+        return " AND ".join(f"({sql})" for sql, _ in parts), [v for _, params in parts for v in params]
+
+    def mask(self, df):
+        result = np.ones(len(df), dtype=bool)
+        for p in self.preds:
+            result &= p.mask(df)
+        return result
+
+class Or(Predicate):
+    def __init__(self, *preds):
+        self.preds = preds
+
+    def to_sql(self):
+        parts = [p.to_sql() for p in self.preds]
+        return " OR ".join(f"({sql})" for sql, _ in parts), [v for _, params in parts for v in params]
+
+    def mask(self, df):
+        result = np.zeros(len(df), dtype=bool)
+        for p in self.preds:
+            result |= p.mask(df)
+        return result
+
+class Not(Predicate):
+    def __init__(self, pred):
+        self.pred = pred
+
+    def to_sql(self):
+        sql, params = self.pred.to_sql()
+        # COALESCE: a NULL (unknown) inner result counts as "not matched", like the mask
+        return f"NOT COALESCE(({sql}), 0)", params
+
+    def mask(self, df):
+        return ~self.pred.mask(df)
+
+# Trigger events compared through the post-inning stats pipeline
+GRANDSLAM = Compare('hr', '=', 1) & Compare('rbi', '=', 4) & BasesLoaded()
+THREE_RUN_HR = Compare('hr', '=', 1) & Compare('rbi', '=', 3)
+BASES_CLEARING_DOUBLE = Compare('2b', '=', 1) & Compare('rbi', '=', 3) & BasesLoaded()
+WALKOFF_HIT = Compare('h', '=', 1) & Compare('rbi', '>', 0) & Half('B') & InningNo('>=', 9) & LastInGame()
+
+TRIGGERS = {
+    'grandslam': GRANDSLAM,
+    'three_run_hr': THREE_RUN_HR,
+    'bases_clearing_double': BASES_CLEARING_DOUBLE,
+    'walkoff_hit': WALKOFF_HIT,
+}
@@ -0,0 +1,44 @@
+import sys
+import os
+import argparse
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src import data, sequence
+
+def main():
+    parser = argparse.ArgumentParser(description="Create the indexes the pipeline's queries use (run once per DB snapshot)")
+    parser.add_argument('--db', type=str, default='yakyuu.db', help='Path to SQLite DB')
+    parser.add_argument('--no-sequence', action='store_true', help='Skip (re)building the play_sequence side table')
+    args = parser.parse_args()
+
+    print(f"Preparing DB: {args.db}")
+    try:
+        timings = data.prepare_db(args.db)
+    except Exception as e:
+        print(f"Error: {e}")
+        return
+
+    for name, seconds in timings.items():
+        table, cols = data.DB_INDEXES[name]
+        if seconds is None:
+            print(f"  {name}: skipped (no {table} columns among {', '.join(cols)})")
+        else:
+            print(f"  {name} on {table}: {seconds:.3f}s")
+    print("Planner statistics refreshed (ANALYZE).")
+
+    if not args.no_sequence:
+        conn = data.get_db_connection(args.db, read_only=False)
+        try:
+            if sequence.play_sequence_ready(conn):
+                print(f"{sequence.PLAY_SEQUENCE_TABLE} is up to date.")
+            else:
+                print(f"Building {sequence.PLAY_SEQUENCE_TABLE}...")
+                rows = sequence.build_play_sequence(conn, max_memory_mb=256)
+                print(f"  {rows} events sequenced.")
+        finally:
+            conn.close()
+    print("Done.")
+
+if __name__ == "__main__":
+    main()
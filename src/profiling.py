@@ -0,0 +1,171 @@
+import os
+import sys
+import json
+import time
+import pstats
+import threading
+import cProfile
+import tracemalloc
+from contextlib import contextmanager
+from pathlib import Path
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+# CLI stages in pipeline order (triggers, sweep and significance only run when requested)
+STAGES = [
+    'load', 'triggers', 'process_gs', 'extract_big_innings', 'merge_tag', 'sweep',
+    'write_events', 'summary', 'significance', 'export', 'expectancy', 'leaderboards', 'plot', 'report', 'write_outputs',
+]
+
+# Recorder state (see configure). Off unless the caller enables it.
+_state = {'enabled': False, 'memory': False, 'cprofile_stage': None, 'cprofile_dir': None, 'suffix': '', 'records': []}
+
+# cProfile dumps written by this process; later runs of the same stage are added to them
+_dumped = set()
+_dump_lock = threading.Lock()
+
+def configure(enabled=True, memory=False, cprofile_stage=None, cprofile_dir=None, suffix=''):
+    """
+    Turns stage recording on/off and clears collected records.
+    memory=True traces Python allocations (tracemalloc) for a per-stage peak; it slows the run down.
+    cprofile_stage: stage name to run under cProfile, dumped to <cprofile_dir>/<stage><suffix>.prof.
+    """
+    _state.update(enabled=enabled, memory=memory, cprofile_stage=cprofile_stage,
+                  cprofile_dir=cprofile_dir, suffix=suffix, records=[])
+    if enabled and memory and not tracemalloc.is_tracing():
+        tracemalloc.start()
+
+def settings():
+    """
+    Current configure() arguments, e.g. to re-apply them in a worker process.
+    """
+    return {k: _state[k] for k in ('enabled', 'memory', 'cprofile_stage', 'cprofile_dir', 'suffix')}
+
+def _max_rss_mb():
+    if resource is None:
+        return None
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports KiB, macOS bytes
+    return round(rss / (2 ** 20 if sys.platform == 'darwin' else 2 ** 10), 1)
+
+def _dump_profile(profiler, path):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    # Timed jobs of one stage can finish together on the writer threads
+    with _dump_lock:
+        if path in _dumped:
+            stats = pstats.Stats(str(path))
+            stats.add(profiler)
+            stats.dump_stats(path)
+        else:
+            profiler.dump_stats(path)
+            _dumped.add(path)
+
+@contextmanager
+def stage(name):
+    """
+    Records wall time, CPU time, memory and row count of the enclosed block.
+    Yields a dict; set info['rows'] to the number of rows the stage produced.
+    Stages should not be nested (the tracemalloc peak is reset on entry).
+    Outside the main thread (see timed) the CPU time is the thread's own and no memory peak is taken.
+    """
+    info = {'rows': None}
+    if not _state['enabled']:
+        yield info
+        return
+
+    main = threading.current_thread() is threading.main_thread()
+    clock = time.process_time if main else time.thread_time
+    profiler = cProfile.Profile() if name == _state['cprofile_stage'] else None
+    if main and tracemalloc.is_tracing():
+        tracemalloc.reset_peak()
+    start_epoch = time.time()
+    wall = time.perf_counter()
+    cpu = clock()
+    if profiler:
+        profiler.enable()
+    try:
+        yield info
+    finally:
+        if profiler:
+            profiler.disable()
+            _dump_profile(profiler, Path(_state['cprofile_dir'] or '.') / f"{name}{_state['suffix']}.prof")
+        _state['records'].append({
+            'stage': name,
+            'start': start_epoch,
+            'wall_s': round(time.perf_counter() - wall, 6),
+            'cpu_s': round(clock() - cpu, 6),
+            'peak_mb': round(tracemalloc.get_traced_memory()[1] / 2 ** 20, 1) if main and tracemalloc.is_tracing() else None,
+            'max_rss_mb': _max_rss_mb(),
+            'rows': info['rows'],
+            'pid': os.getpid(),
+            'tid': 0 if main else threading.get_native_id(),
+        })
+
+def timed(func, name):
+    """
+    func wrapped so that every call is recorded as stage `name`, e.g. work queued on the
+    output writer threads, which would otherwise only show up as queueing time.
+    """
+    def run(*args, **kwargs):
+        with stage(name):
+            return func(*args, **kwargs)
+    return run
+
+def records():
+    return list(_state['records'])
+
+def add_records(recs):
+    """
+    Adds stage records collected elsewhere (e.g. in worker processes).
+    """
+    _state['records'].extend(recs)
+
+def stage_totals(recs):
+    """
+    Per stage name: summed wall/CPU time and rows, max memory, number of runs (STAGES order first).
+    """
+    totals = {}
+    for r in recs:
+        t = totals.setdefault(r['stage'], {'runs': 0, 'wall_s': 0.0, 'cpu_s': 0.0, 'rows': None, 'peak_mb': None, 'max_rss_mb': None})
+        t['runs'] += 1
+        t['wall_s'] = round(t['wall_s'] + r['wall_s'], 6)
+        t['cpu_s'] = round(t['cpu_s'] + r['cpu_s'], 6)
+        if r['rows'] is not None:
+            t['rows'] = (t['rows'] or 0) + r['rows']
+        for key in ('peak_mb', 'max_rss_mb'):
+            if r[key] is not None:
+                t[key] = max(t[key] or 0, r[key])
+    order = {name: i for i, name in enumerate(STAGES)}
+    return dict(sorted(totals.items(), key=lambda kv: order.get(kv[0], len(order))))
+
+def write_trace(path, recs, metadata=None):
+    """
+    JSON trace: metadata, every stage record (start relative to the first record) and per-stage totals.
+    """
+    t0 = min((r['start'] for r in recs), default=0)
+    trace = {
+        'metadata': metadata or {},
+        'stages': [dict(r, start=round(r['start'] - t0, 6)) for r in recs],
+        'totals': stage_totals(recs),
+    }
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(trace, f, ensure_ascii=False, indent=2)
+
+def write_chrome_trace(path, recs):
+    """
+    Chrome trace event format (chrome://tracing, Perfetto): one complete event per stage record.
+    """
+    events = [{
+        'name': r['stage'],
+        'ph': 'X',
+        'ts': int(r['start'] * 1e6),
+        'dur': int(r['wall_s'] * 1e6),
+        'pid': r['pid'],
+        'tid': r.get('tid', 0),
+        'args': {k: r[k] for k in ('cpu_s', 'peak_mb', 'max_rss_mb', 'rows')},
+    } for r in recs]
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump({'traceEvents': events, 'displayTimeUnit': 'ms'}, f)
@@ -1,9 +1,7 @@
-
-import pandas as pd
-
-def generate_markdown_report(overall_summary, stage_summary, output_path):
+def generate_markdown_report(overall_summary, stage_summary, output_path, expectancy=None):
     """
     Generates a blog-draft style Markdown report.
+    expectancy: run_expectancy.summary_above_expectancy output; adds the runs-above-expectancy section.
     """
     
     # ----------------------------------------------------
@@ -71,7 +69,7 @@ def generate_markdown_report(overall_summary, stage_summary, output_path):
 | HR以外の得点追加後 | {non_gs_runs:.2f} 点 | {non_gs_rate:.3f} |
 
 「打って終わり」ではなく、そこからさらに約2点を追加できています。
-
+{expectancy_section(expectancy)}
 ## イニング別の面白い傾向
 
 さらに詳しく見ると、「いつ打ったか」で大きく運命が分かれています。
@@ -101,3 +99,22 @@ def generate_markdown_report(overall_summary, stage_summary, output_path):
     
     with open(output_path, 'w', encoding='utf-8') as f:
         f.write(content)
+
+def expectancy_section(expectancy):
+    """
+    Markdown for the runs-above-expectancy comparison ('' without data).
+    """
+    try:
+        gs = expectancy.loc[('Overall', True)]
+        non_gs = expectancy.loc[('Overall', False)]
+    except (AttributeError, KeyError, TypeError):
+        return ""
+    return f"""
+### 3. 期待得点との比較
+得点は「その後のイニング数」にも左右されるため、同じシーズンの「無死走者なしから1イニングで入る平均得点」（得点期待値, RE24）× 残りイニング数 を基準にして、それを何点上回ったかも計算しました。
+
+| 条件 | 平均追加点 | 期待得点 | 期待値との差 |
+|:---|---:|---:|---:|
+| 満塁ホームラン後 | {gs[('post_inning_runs_1to9', 'mean')]:.2f} 点 | {gs[('expected_post_runs', 'mean')]:.2f} 点 | **{gs[('post_runs_above_exp', 'mean')]:+.2f}** 点 |
+| HR以外の得点追加後 | {non_gs[('post_inning_runs_1to9', 'mean')]:.2f} 点 | {non_gs[('expected_post_runs', 'mean')]:.2f} 点 | {non_gs[('post_runs_above_exp', 'mean')]:+.2f} 点 |
+"""
@@ -0,0 +1,174 @@
+import numpy as np
+import pandas as pd
+
+from src import data, logic, sequence
+
+# Run expectancy (RE24): average runs scored from a plate appearance to the end of its
+# half-inning, for each of the 24 base/out states, per season.
+# Base states as a bitmask (1st = 1, 2nd = 2, 3rd = 4), labelled by occupied bases
+BASE_STATES = ['___', '1__', '_2_', '12_', '__3', '1_3', '_23', '123']
+
+# Columns the engine reads from the event table
+RE_EVENT_COLUMNS = ['game_id', 'inning', 'out', 'on_base', 'rbi']
+
+# Half-innings used: innings 1-8 and the top of the 9th. Later bottom halves are often
+# cut short by a walk-off or not played, which would bias the averages down.
+MAX_FULL_INNING = 8
+
+# Label of the rows pooled over every season
+ALL_SEASONS = 'all'
+
+def base_state(on_base):
+    """
+    on_base strings ('', '1', '13', '123', ...) as base-state bitmasks 0-7 (missing = bases empty).
+    """
+    def bits(s):
+        if not isinstance(s, str):
+            return 0
+        return ('1' in s) * 1 + ('2' in s) * 2 + ('3' in s) * 4
+    return logic.map_unique(on_base, bits).to_numpy(dtype=np.int8)
+
+def plate_appearances(events_df, games_df):
+    """
+    One row per usable plate appearance: game_id, season, outs, bases (bitmask) and runs_to_end.
+    events_df must hold complete games in table order (the play order proxy, see sequence.py).
+
+    The event table only records runs as RBIs, so runs_to_end is the reverse cumulative sum of
+    rbi within the half-inning, plus the half-inning's runs in the games table that no RBI
+    explains (errors, wild pitches...). Those are counted as still to come for every PA of the half.
+    """
+    order = sequence.inning_sort_order(events_df['inning']).to_numpy()
+    # Half-innings in play order: stable sort keeps table order within each half
+    pos = np.lexsort((order, pd.factorize(events_df['game_id'])[0]))
+    order = order[pos]
+    game = events_df['game_id'].to_numpy()[pos]
+    rbi = pd.to_numeric(events_df['rbi'], errors='coerce').fillna(0).to_numpy(dtype=float)[pos]
+    outs = pd.to_numeric(events_df['out'], errors='coerce').to_numpy(dtype=float)[pos]
+    bases = base_state(events_df['on_base'])[pos]
+
+    n = len(order)
+    new_half = np.ones(n, dtype=bool)
+    new_half[1:] = (game[1:] != game[:-1]) | (order[1:] != order[:-1])
+    starts = np.flatnonzero(new_half)
+    code = np.cumsum(new_half) - 1
+
+    # Grouped reverse cumulative sum: half-inning total minus the RBIs before this PA
+    half_rbi = np.add.reduceat(rbi, starts) if n else np.zeros(0)
+    rbi_before = np.cumsum(rbi) - rbi - np.concatenate([[0.0], np.cumsum(half_rbi)[:-1]])[code]
+    runs_to_end = half_rbi[code] - rbi_before
+
+    inning_no, bottom = order // 10, order % 10 == 1
+    games = games_df.drop_duplicates(subset='game_id').reset_index(drop=True)
+    g_idx = pd.Index(games['game_id']).get_indexer(game)
+    found = g_idx >= 0
+
+    # Runs of the half-inning per the games table (innings 1-9)
+    visitor, home = logic.inning_matrices(games)
+    col = np.clip(inning_no, 1, 9) - 1
+    half_runs = np.where(bottom, home[g_idx, col], visitor[g_idx, col])
+    half_runs[~found] = np.nan
+    unexplained = np.clip(np.nan_to_num(half_runs[starts] - half_rbi, nan=0.0), 0, None)
+    runs_to_end += unexplained[code]
+
+    season = games['date'].astype(str).str[:4].to_numpy()[g_idx]
+    keep = (found & (order >= 0) & ((inning_no <= MAX_FULL_INNING) | ((inning_no == MAX_FULL_INNING + 1) & ~bottom))
+            & np.isin(outs, [0, 1, 2]))
+    return pd.DataFrame({
+        'game_id': game[keep],
+        'season': season[keep],
+        'outs': outs[keep].astype(np.int8),
+        'bases': bases[keep],
+        'runs_to_end': runs_to_end[keep],
+    })
+
+def _state_totals(pa_df):
+    """
+    Sum of runs_to_end and number of PAs per (season, outs, bases).
+    """
+    return pa_df.groupby(['season', 'outs', 'bases'])['runs_to_end'].agg(runs='sum', pa='count')
+
+def _expectancy_frame(totals):
+    """
+    Long RE24 frame from summed state totals, with the ALL_SEASONS rows appended.
+    """
+    pooled = totals.groupby(['outs', 'bases']).sum()
+    pooled = pd.concat({ALL_SEASONS: pooled}, names=['season'])
+    df = pd.concat([totals, pooled]).reset_index()
+    df['re'] = df['runs'] / df['pa']
+    df['bases'] = pd.Categorical.from_codes(df['bases'], BASE_STATES)
+    return df[['season', 'outs', 'bases', 'pa', 'runs', 're']]
+
+def run_expectancy(events_df, games_df):
+    """
+    RE24 over an in-memory event table: one row per (season, outs, bases) with pa, runs and re
+    (mean runs to the end of the half-inning), plus rows pooled over all seasons (season 'all').
+    """
+    return _expectancy_frame(_state_totals(plate_appearances(events_df, games_df)))
+
+def load_run_expectancy(conn, games_df=None, where=None, params=(), chunk_rows=200_000, max_memory_mb=None):
+    """
+    RE24 streamed from the event table in game-aligned chunks (see data.iter_events).
+    State totals are summed per chunk, so memory stays bounded by the chunk size.
+    games_df defaults to every game (date and inning scores are needed).
+    """
+    if games_df is None:
+        games_df = data.load_games(conn, columns=data.GAME_COLUMNS)
+    parts = [
+        _state_totals(plate_appearances(chunk, games_df))
+        for chunk in data.iter_events(conn, columns=RE_EVENT_COLUMNS, where=where, params=params,
+                                      chunk_rows=chunk_rows, max_memory_mb=max_memory_mb)
+    ]
+    if not parts:
+        return _expectancy_frame(_state_totals(pd.DataFrame(columns=['season', 'outs', 'bases', 'runs_to_end'])))
+    totals = pd.concat(parts).groupby(level=['season', 'outs', 'bases']).sum()
+    return _expectancy_frame(totals)
+
+def combine_run_expectancy(frames):
+    """
+    One RE24 frame from several (e.g. one per database): PAs and runs of the same
+    (season, outs, bases) are summed and the pooled rows recomputed.
+    """
+    df = pd.concat([f[f['season'] != ALL_SEASONS] for f in frames], ignore_index=True)
+    df['bases'] = pd.Categorical(df['bases'], BASE_STATES).codes.astype(np.int8)
+    totals = df.groupby(['season', 'outs', 'bases'])[['runs', 'pa']].sum()
+    return _expectancy_frame(totals)
+
+def re24_matrix(re_df, season=ALL_SEASONS):
+    """
+    The 8 x 3 matrix (base states x outs) of one season from a run_expectancy frame.
+    """
+    df = re_df[re_df['season'] == season]
+    return df.pivot(index='bases', columns='outs', values='re').reindex(BASE_STATES)
+
+def add_runs_above_expectancy(df, re_df):
+    """
+    Adds the expected and above-expectancy post-inning stats (in place):
+    - expected_post_runs: remaining_off_innings_1to9 x RE of a fresh inning (0 out, bases empty)
+      in the event's season (the pooled value when the season is missing)
+    - post_runs_above_exp: post_inning_runs_1to9 - expected_post_runs
+    - post_rate_above_exp: post_run_rate - RE of a fresh inning
+    """
+    fresh = re_df[(re_df['outs'] == 0) & (re_df['bases'] == BASE_STATES[0])].set_index('season')['re']
+    season = df['date'].astype(str).str[:4]
+    base_re = season.map(fresh).fillna(fresh.get(ALL_SEASONS, np.nan)).astype(float)
+    df['expected_post_runs'] = df['remaining_off_innings_1to9'] * base_re
+    df['post_runs_above_exp'] = df['post_inning_runs_1to9'] - df['expected_post_runs']
+    df['post_rate_above_exp'] = df['post_run_rate'] - base_re
+    return df
+
+def summary_above_expectancy(df):
+    """
+    GS vs non-GS means of the above-expectancy stats, overall and per stage
+    (df needs add_runs_above_expectancy and viz.add_summary_columns applied).
+    """
+    agg = {
+        'post_inning_runs_1to9': 'mean',
+        'expected_post_runs': 'mean',
+        'post_runs_above_exp': ['mean', 'count'],
+        'post_rate_above_exp': 'mean',
+    }
+    overall = df.groupby('is_grandslam').agg(agg)
+    stage = df.groupby(['stage', 'is_grandslam']).agg(agg)
+    overall.index = pd.MultiIndex.from_product([['Overall'], overall.index], names=['scope', 'is_grandslam'])
+    stage.index = stage.index.set_names(['scope', 'is_grandslam'])
+    return pd.concat([overall, stage])
@@ -0,0 +1,274 @@
+import numpy as np
+import pandas as pd
+
+from src import data, logic, predicates
+
+# Spacing between (game_id, team) groups in the seek key; larger than any inning sort order
+ORDER_STRIDE = 1000
+
+# Persisted play order (see build_play_sequence), one row per event
+PLAY_SEQUENCE_TABLE = 'play_sequence'
+PLAY_SEQUENCE_META = 'play_sequence_meta'
+
+def inning_sort_order(innings):
+    """
+    Converts inning strings to a sortable half-inning number: '7T' -> 70, '7B' -> 71.
+    Parsed once per unique value. Unparseable innings get -1 (sorted first, never "after").
+    """
+    def sort_key(inning_str):
+        ino, half = logic.parse_inning(inning_str) if isinstance(inning_str, str) else (None, None)
+        if ino is None:
+            return -1
+        h_val = 0 if half == 'T' else 1
+        return ino * 10 + h_val
+
+    return logic.map_unique(innings, sort_key).astype(int)
+
+def _group_bounds(new_group):
+    """
+    For contiguous groups flagged by new_group (True on each group's first row),
+    returns per-row (start, end) offsets.
+    """
+    n = len(new_group)
+    starts = np.flatnonzero(new_group)
+    ends = np.append(starts[1:], n)
+    code = np.cumsum(new_group) - 1
+    return code, starts[code], ends[code]
+
+def build_event_index(events_df, presorted=False):
+    """
+    Sorts the event table once by (game_id, team, half-inning, table order) and attaches offsets:
+    - team_start / team_end: rows of the same team in the same game
+    - half_start / half_end: rows of the same half-inning
+    - seek_key: monotonic key for searchsorted lookups
+    Table order ('event_pos') is used as play order within a half-inning.
+    presorted=True skips the sort: events_df must already be in that order and carry
+    'sort_order' and 'event_pos' (e.g. chunks of iter_event_index from the play_sequence table).
+    """
+    index = events_df.copy()
+    if not presorted:
+        index['event_pos'] = np.arange(len(index))
+        index['sort_order'] = inning_sort_order(index['inning']).to_numpy()
+        index = index.sort_values(['game_id', 'team', 'sort_order', 'event_pos'], kind='stable').reset_index(drop=True)
+
+    n = len(index)
+    game = index['game_id'].to_numpy()
+    team = index['team'].to_numpy()
+    order = index['sort_order'].to_numpy()
+
+    new_team = np.ones(n, dtype=bool)
+    new_team[1:] = (game[1:] != game[:-1]) | (team[1:] != team[:-1])
+    new_half = new_team.copy()
+    new_half[1:] |= order[1:] != order[:-1]
+
+    team_code, index['team_start'], index['team_end'] = _group_bounds(new_team)
+    _, index['half_start'], index['half_end'] = _group_bounds(new_half)
+    index['seek_key'] = team_code * ORDER_STRIDE + (order + 1)
+    return index
+
+def _score_before_half(index, games_df):
+    """
+    Runs by the batting team and by its opponent before each event's half-inning, from the games table.
+    Side follows grandslam_post_runs: home if team == home_team_id, otherwise visitor.
+    """
+    games = games_df.drop_duplicates(subset='game_id')
+    visitor_cols = [c for c in games.columns if c.startswith('visitor_inn')]
+    home_cols = [c for c in games.columns if c.startswith('home_inn')]
+    n_inn = min(len(visitor_cols), len(home_cols))
+    visitor_cols = [f'visitor_inn{i}' for i in range(1, n_inn + 1)]
+    home_cols = [f'home_inn{i}' for i in range(1, n_inn + 1)]
+    # Cumulative runs with a leading zero column: cum[:, k] = runs in innings 1..k
+    zero = np.zeros((len(games), 1))
+    visitor_cum = np.hstack([zero, np.nancumsum(games[visitor_cols].to_numpy(dtype=float, na_value=np.nan), axis=1)])
+    home_cum = np.hstack([zero, np.nancumsum(games[home_cols].to_numpy(dtype=float, na_value=np.nan), axis=1)])
+
+    row = pd.Index(games['game_id']).get_indexer(index['game_id'])
+    found = row >= 0
+    row = np.where(found, row, 0)
+    is_home = found & (index['team'].to_numpy() == games['home_team_id'].to_numpy()[row])
+    ino = np.clip(index['sort_order'].to_numpy() // 10, 0, n_inn + 1)
+    before = np.clip(ino - 1, 0, n_inn)
+    # The visitor bats first: the home team's opponent has also finished this inning
+    opp_done = np.clip(np.where(is_home, ino, ino - 1), 0, n_inn)
+
+    team_score = np.where(is_home, home_cum[row, before], visitor_cum[row, before])
+    opp_score = np.where(is_home, visitor_cum[row, opp_done], home_cum[row, opp_done])
+    valid = found & (index['sort_order'].to_numpy() >= 0)
+    return np.where(valid, team_score, np.nan), np.where(valid, opp_score, np.nan)
+
+def play_sequence_frame(events_df, games_df, offset=0):
+    """
+    Rows of the play_sequence table for complete games (e.g. one data.iter_events chunk with_rowid):
+    - event_rowid: rowid in event; event_pos: offset + position in (game_id, rowid) order
+    - (game_id, team, inning_no, half, seq): stable play key, seq = 1-based order within the half-inning
+    - sort_order: half-inning order ('7T' -> 70, '7B' -> 71, unparseable -> -1); team_seq: order within (game, team)
+    - half_start / half_end: team_seq of the half-inning's first and last event
+    - team_score / opp_score: runs before the half-inning (games table); rbi_before: RBIs earlier in the half
+    """
+    index = build_event_index(events_df)
+    pos = np.arange(len(index))
+    team_start = index['team_start'].to_numpy()
+    half_start = index['half_start'].to_numpy()
+    rbi = index['rbi'].fillna(0).to_numpy(dtype=np.int64) if 'rbi' in index.columns else np.zeros(len(index), dtype=np.int64)
+    rbi_cum = np.concatenate([[0], np.cumsum(rbi)])
+    parsed = logic.map_unique(index['inning'], lambda s: logic.parse_inning(s) if isinstance(s, str) else (None, None))
+    team_score, opp_score = _score_before_half(index, games_df)
+
+    return pd.DataFrame({
+        'event_rowid': index['event_rowid'].to_numpy(),
+        'event_pos': offset + index['event_pos'].to_numpy(),
+        'game_id': index['game_id'].to_numpy(),
+        'team': index['team'].to_numpy(),
+        'inning_no': pd.array([p[0] for p in parsed], dtype='Int64'),
+        'half': [p[1] for p in parsed],
+        'sort_order': index['sort_order'].to_numpy(),
+        'seq': pos - half_start + 1,
+        'team_seq': pos - team_start + 1,
+        'half_start': half_start - team_start + 1,
+        'half_end': index['half_end'].to_numpy() - team_start,
+        'rbi': rbi,
+        'rbi_before': rbi_cum[pos] - rbi_cum[half_start],
+        'team_score': pd.array(team_score, dtype='Int64'),
+        'opp_score': pd.array(opp_score, dtype='Int64'),
+    })
+
+def _event_stats(conn):
+    return conn.execute("SELECT COUNT(*), MAX(rowid) FROM event").fetchone()
+
+def build_play_sequence(conn, chunk_rows=200_000, max_memory_mb=None):
+    """
+    (Re)builds the play_sequence side table in the DB (conn must be writable) plus an index on
+    (game_id, team, sort_order, seq): iter_event_index reads it in play order without sorting,
+    and seek_next_event_after / seek_first_event_in_half answer single lookups such as
+    "first RBI event of this team after half-inning X" with an index seek.
+    Returns the number of rows written.
+    """
+    conn.execute(f"DROP TABLE IF EXISTS {PLAY_SEQUENCE_TABLE}")
+    conn.execute(f"DROP TABLE IF EXISTS {PLAY_SEQUENCE_META}")
+    games = pd.read_sql_query("SELECT * FROM games", conn)
+    rows = 0
+    for chunk in data.iter_events(conn, chunk_rows=chunk_rows, max_memory_mb=max_memory_mb, with_rowid=True):
+        frame = play_sequence_frame(chunk, games, offset=rows)
+        frame.to_sql(PLAY_SEQUENCE_TABLE, conn, if_exists='append', index=False)
+        rows += len(frame)
+    if rows:
+        conn.execute(f"CREATE INDEX idx_{PLAY_SEQUENCE_TABLE}_key ON {PLAY_SEQUENCE_TABLE} (game_id, team, sort_order, seq)")
+        conn.execute(f"ANALYZE {PLAY_SEQUENCE_TABLE}")
+    event_rows, max_rowid = _event_stats(conn)
+    conn.execute(f"CREATE TABLE {PLAY_SEQUENCE_META} (event_rows INTEGER, event_max_rowid INTEGER)")
+    conn.execute(f"INSERT INTO {PLAY_SEQUENCE_META} VALUES (?, ?)", (event_rows, max_rowid))
+    conn.commit()
+    return rows
+
+def play_sequence_ready(conn):
+    """
+    True if the play_sequence table exists and was built from the current event table.
+    """
+    tables = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+    if PLAY_SEQUENCE_TABLE not in tables or PLAY_SEQUENCE_META not in tables:
+        return False
+    meta = conn.execute(f"SELECT event_rows, event_max_rowid FROM {PLAY_SEQUENCE_META}").fetchone()
+    return meta is not None and tuple(meta) == tuple(_event_stats(conn))
+
+def iter_event_index(conn, max_memory_mb=None, chunk_rows=200_000):
+    """
+    Streams build_event_index results for complete games.
+    Uses the play_sequence table when it is up to date: rows arrive already in index order
+    (an index scan, no per-chunk sort). Otherwise indexes data.iter_events chunks in memory.
+    """
+    if not play_sequence_ready(conn):
+        for chunk in data.iter_events(conn, chunk_rows=chunk_rows, max_memory_mb=max_memory_mb):
+            yield build_event_index(chunk)
+        return
+
+    if max_memory_mb is not None:
+        chunk_rows = data.chunk_rows_for_memory(conn, max_memory_mb, 'event')
+    query = (
+        f"SELECT e.*, s.sort_order, s.event_pos FROM {PLAY_SEQUENCE_TABLE} AS s "
+        "JOIN event AS e ON e.rowid = s.event_rowid "
+        "ORDER BY s.game_id, s.team, s.sort_order, s.seq"
+    )
+    for chunk in data.iter_query_by_game(conn, query, chunk_rows=chunk_rows):
+        yield build_event_index(chunk, presorted=True)
+
+def _seek(conn, where, params, predicate):
+    """
+    First play_sequence row (in play order) matching where and predicate (over the event row), as a dict.
+    """
+    cond, cond_params = predicate.to_sql() if predicate is not None else ('1', [])
+    # The correlated subquery resolves the predicate's columns against event only; the index on
+    # (game_id, team, sort_order, seq) serves both the WHERE and the ORDER BY, so LIMIT 1 stops early
+    query = (
+        f"SELECT * FROM {PLAY_SEQUENCE_TABLE} AS s WHERE {where} "
+        f"AND EXISTS (SELECT 1 FROM event WHERE event.rowid = s.event_rowid AND ({cond})) "
+        "ORDER BY s.sort_order, s.seq LIMIT 1"
+    )
+    cur = conn.execute(query, list(params) + list(cond_params))
+    row = cur.fetchone()
+    return None if row is None else dict(zip([d[0] for d in cur.description], row))
+
+def seek_next_event_after(conn, game_id, team, sort_order, predicate=None):
+    """
+    play_sequence row (dict) of the first event of team in game_id in a half-inning after
+    sort_order that satisfies predicate (a predicates.Predicate over event), or None.
+    Needs an up-to-date play_sequence table (see play_sequence_ready).
+    """
+    return _seek(conn, "s.game_id = ? AND s.team = ? AND s.sort_order > ?", (game_id, team, sort_order), predicate)
+
+def seek_first_event_in_half(conn, game_id, team, sort_order, predicate=None):
+    """
+    play_sequence row (dict) of the first event of the half-inning (game_id, team, sort_order)
+    that satisfies predicate, or None. Needs an up-to-date play_sequence table.
+    """
+    return _seek(conn, "s.game_id = ? AND s.team = ? AND s.sort_order = ?", (game_id, team, sort_order), predicate)
+
+def _next_true(mask):
+    """
+    next_true[i] = first position j >= i with mask[j], or len(mask) if none.
+    Has one extra trailing slot so it can be indexed with len(mask).
+    """
+    n = len(mask)
+    pos = np.where(np.asarray(mask, dtype=bool), np.arange(n), n)
+    pos = np.append(pos, n)
+    return np.minimum.accumulate(pos[::-1])[::-1]
+
+def next_event_after(index, positions, mask):
+    """
+    For each row position, the first event of the same team in the same game,
+    in a later half-inning, that satisfies mask. Returns index positions (-1 if none).
+    Vectorized over one chunk (a binary search on seek_key); see seek_next_event_after for a DB lookup.
+    """
+    positions = np.asarray(positions, dtype=int)
+    keys = index['seek_key'].to_numpy()
+    start = np.searchsorted(keys, keys[positions], side='right')
+    hit = _next_true(mask)[start]
+    return np.where(hit < index['team_end'].to_numpy()[positions], hit, -1)
+
+def first_event_in_half(index, positions, mask):
+    """
+    For each row position, the first event of its half-inning (in play order)
+    that satisfies mask. Returns index positions (-1 if none).
+    """
+    positions = np.asarray(positions, dtype=int)
+    hit = _next_true(mask)[index['half_start'].to_numpy()[positions]]
+    return np.where(hit < index['half_end'].to_numpy()[positions], hit, -1)
+
+def grandslam_post_runs(index, games_df):
+    """
+    Locates grand slams in the index and computes the hitting team's runs in innings after the GS (1-9).
+    Side follows the scripts' convention: home if team == home_team_id, otherwise visitor.
+    Returns a DataFrame with 'position' (into index), game_id, team, inning, inning_no, post_inning_runs_1to9.
+    """
+    positions = np.flatnonzero(predicates.GRANDSLAM.mask(index))
+    gs = index.loc[positions, ['game_id', 'team', 'inning']].copy()
+    gs['position'] = positions
+    gs['inning_no'] = logic.map_unique(gs['inning'], lambda s: logic.parse_inning(s)[0] if isinstance(s, str) else None)
+    gs = gs.dropna(subset=['inning_no'])
+    # Keep table order so results line up with the original per-row scripts
+    gs = gs.iloc[np.argsort(index['event_pos'].to_numpy()[gs['position'].to_numpy()], kind='stable')]
+
+    games = games_df.drop_duplicates(subset='game_id')
+    merged = pd.merge(gs, games, on='game_id', how='inner')
+    merged['side'] = np.where(merged['home_team_id'] == merged['team'], 'home', 'visitor')
+    merged['post_inning_runs_1to9'] = logic.calc_post_stats(merged)['post_inning_runs_1to9']
+    return merged[['position', 'game_id', 'team', 'inning', 'inning_no', 'post_inning_runs_1to9']]
@@ -0,0 +1,240 @@
+import sys
+import os
+import json
+import argparse
+import functools
+import traceback
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlsplit, parse_qs
+
+import pandas as pd
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src import data, logic, viz, pipeline, federation
+
+# Local read-only query API over the processed frames (stdlib only, works offline):
+#   GET /api/meta     available filter values
+#   GET /api/events   filtered big-inning events, paginated
+#   GET /api/summary  GS vs non-GS summaries grouped by threshold / stage / team / season, paginated
+# Frames are built once at startup; each threshold's events and each response are LRU-cached.
+ENDPOINTS = ['/api/meta', '/api/events', '/api/summary']
+GROUP_KEYS = ['threshold', 'stage', 'team', 'season']
+FILTER_KEYS = ['stage', 'team', 'season', 'side', 'is_grandslam']
+DEFAULT_THRESHOLD = 4
+TRUE_VALUES = ('1', 'true')
+FALSE_VALUES = ('0', 'false')
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 1000
+
+class QueryError(ValueError):
+    """
+    Invalid query parameters (answered with HTTP 400).
+    """
+
+class NotFound(LookupError):
+    """
+    Unknown endpoint (answered with HTTP 404).
+    """
+
+def _ints(values, name):
+    try:
+        return [int(v) for v in values]
+    except ValueError:
+        raise QueryError(f"{name} must be integers: {','.join(values)}")
+
+def _last_int(params, name, default):
+    # A repeated parameter (?page=1&page=2) takes its last value
+    return _ints(params.get(name, [str(default)])[-1:], name)[0]
+
+def _bools(values, name):
+    lowered = [v.lower() for v in values]
+    bad = [v for v, low in zip(values, lowered) if low not in TRUE_VALUES + FALSE_VALUES]
+    if bad:
+        raise QueryError(f"{name} must be one of {', '.join(TRUE_VALUES + FALSE_VALUES)}: {', '.join(bad)}")
+    return [low in TRUE_VALUES for low in lowered]
+
+def _split(params, name):
+    # ?team=a,b and ?team=a&team=b are both accepted
+    return [v for raw in params.get(name, []) for v in raw.split(',') if v != '']
+
+class QueryService:
+    """
+    Holds the pipeline frames of one run and answers queries as JSON bytes.
+    """
+    def __init__(self, result, cache_size=256, threshold_cache_size=16):
+        self.games = result['games']
+        self.gs = result['gs']
+        self.innings = result['innings']
+        self.team_map = result.get('team_map', {})
+        self.events_for = functools.lru_cache(maxsize=threshold_cache_size)(self._events_for)
+        self.query = functools.lru_cache(maxsize=cache_size)(self._query)
+
+    @classmethod
+    def from_db(cls, db_paths, **kwargs):
+        """
+        Runs the load/process stages over one DB, or several (see federation), once.
+        """
+        if len(db_paths) > 1:
+            result = federation.run_federated(federation.sources(db_paths))
+        else:
+            conn = data.get_db_connection(db_paths[0])
+            try:
+                teams_df = data.load_teams(conn)
+            finally:
+                conn.close()
+            team_map = dict(zip(teams_df['team_id'], teams_df['team_name']))
+            result = pipeline.run_partition(db_paths[0], team_map)
+            result['team_map'] = team_map
+        return cls(result, **kwargs)
+
+    def _events_for(self, threshold, mode):
+        """
+        Tagged big-inning events of one threshold with the summary columns and 'season'.
+        """
+        high = logic.select_high_scoring_innings(self.innings, self.games, threshold=threshold, mode=mode)
+        pipeline.map_team_names(high, self.team_map)
+        df = logic.merge_and_tag(self.gs, high)
+        viz.add_summary_columns(df)
+        df.insert(0, 'threshold', threshold)
+        df['season'] = df['date'].astype(str).str[:4]
+        return df
+
+    def frame(self, params):
+        """
+        Events of the requested thresholds (default 4) and mode, filtered.
+        """
+        thresholds = _ints(_split(params, 'threshold'), 'threshold') or [DEFAULT_THRESHOLD]
+        mode = (params.get('mode') or ['eq'])[0]
+        if mode not in ('eq', 'ge'):
+            raise QueryError(f"mode must be eq or ge: {mode}")
+        df = pd.concat([self.events_for(t, mode) for t in sorted(set(thresholds))], ignore_index=True)
+        mask = pd.Series(True, index=df.index)
+        for key in FILTER_KEYS:
+            values = _split(params, key)
+            if not values:
+                continue
+            if key == 'is_grandslam':
+                values = _bools(values, key)
+            mask &= df[key].astype(object).isin(values)
+        return df[mask]
+
+    def _query(self, path, key):
+        """
+        JSON bytes for one endpoint and canonical query (a sorted tuple of (name, values) pairs).
+        """
+        params = {name: list(values) for name, values in key}
+        if path == '/api/meta':
+            df = self.events_for(DEFAULT_THRESHOLD, 'eq')
+            body = {
+                'group_keys': GROUP_KEYS,
+                'filters': {k: sorted(df[k].dropna().astype(str).unique().tolist()) for k in ['stage', 'team', 'season', 'side']},
+                'thresholds': sorted(self.innings['runs_in_inning'].dropna().astype(int).unique().tolist()),
+            }
+            return json.dumps(body, ensure_ascii=False).encode('utf-8')
+
+        df = self.frame(params)
+        if path == '/api/events':
+            rows = df
+        elif path == '/api/summary':
+            group_by = _split(params, 'group_by')
+            unknown = [g for g in group_by if g not in GROUP_KEYS]
+            if unknown:
+                raise QueryError(f"group_by must be among {', '.join(GROUP_KEYS)}: {', '.join(unknown)}")
+            rows = df.groupby(group_by + ['is_grandslam'], observed=True).agg(
+                count=('post_run_rate', 'size'),
+                post_run_rate_mean=('post_run_rate', 'mean'),
+                post_inning_runs_mean=('post_inning_runs_1to9', 'mean'),
+                scored_any_rate=('scored_any', 'mean'),
+            ).reset_index()
+        else:
+            raise NotFound(path)
+
+        page, page_size = _last_int(params, 'page', 1), _last_int(params, 'page_size', DEFAULT_PAGE_SIZE)
+        if page < 1 or not 1 <= page_size <= MAX_PAGE_SIZE:
+            raise QueryError(f"page must be >= 1 and page_size 1-{MAX_PAGE_SIZE}")
+        chunk = rows.iloc[(page - 1) * page_size:page * page_size]
+        body = (
+            f'{{"total":{len(rows)},"page":{page},"page_size":{page_size},'
+            f'"pages":{-(-len(rows) // page_size)},"rows":{chunk.to_json(orient="records", force_ascii=False)}}}'
+        )
+        return body.encode('utf-8')
+
+    def handle(self, path, query_string):
+        """
+        (status, body bytes, cache hit) for a GET request. Unexpected errors are logged and answered with 500.
+        """
+        params = parse_qs(query_string)
+        key = tuple(sorted((name, tuple(values)) for name, values in params.items()))
+        hits = self.query.cache_info().hits
+        try:
+            if path not in ENDPOINTS:
+                raise NotFound(path)
+            body = self.query(path, key)
+        except NotFound:
+            return 404, json.dumps({'error': f'Unknown path: {path}'}, ensure_ascii=False).encode('utf-8'), False
+        except QueryError as e:
+            return 400, json.dumps({'error': str(e)}, ensure_ascii=False).encode('utf-8'), False
+        except Exception as e:
+            traceback.print_exc()
+            return 500, json.dumps({'error': f'Internal error: {type(e).__name__}'}).encode('utf-8'), False
+        # Approximate under concurrency; only used for the X-Cache header
+        return 200, body, self.query.cache_info().hits > hits
+
+def make_handler(service, verbose=False):
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            url = urlsplit(self.path)
+            status, body, hit = service.handle(url.path, url.query)
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json; charset=utf-8')
+            self.send_header('Content-Length', str(len(body)))
+            # The Next.js dev server runs on another port
+            self.send_header('Access-Control-Allow-Origin', '*')
+            self.send_header('X-Cache', 'HIT' if hit else 'MISS')
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            if verbose:
+                super().log_message(format, *args)
+
+    return Handler
+
+def make_server(service, host='127.0.0.1', port=8000, verbose=False):
+    """
+    Threaded HTTP server for service (port 0 picks a free port: see server.server_address).
+    """
+    server = ThreadingHTTPServer((host, port), make_handler(service, verbose))
+    server.daemon_threads = True
+    return server
+
+def main():
+    parser = argparse.ArgumentParser(description="Local query API over the grand slam analysis")
+    parser.add_argument('--db', type=str, nargs='+', default=['yakyuu.db'], help='Path(s) or glob(s) of SQLite DBs')
+    parser.add_argument('--host', type=str, default='127.0.0.1', help='Interface to listen on')
+    parser.add_argument('--port', type=int, default=8000, help='Port to listen on')
+    parser.add_argument('--cache-size', type=int, default=256, help='Responses kept in the LRU cache')
+    parser.add_argument('--no-cache', action='store_true', help='Always read from SQLite, bypassing the query cache')
+    parser.add_argument('--verbose', action='store_true', help='Log every request')
+    args = parser.parse_args()
+
+    try:
+        db_paths = federation.expand_db_paths(args.db)
+    except FileNotFoundError as e:
+        parser.error(str(e))
+    data.configure_cache(enabled=not args.no_cache)
+
+    print(f"Loading {', '.join(db_paths)}...")
+    service = QueryService.from_db(db_paths, cache_size=args.cache_size)
+    server = make_server(service, args.host, args.port, args.verbose)
+    print(f"Serving on http://{args.host}:{server.server_address[1]}/api/ (Ctrl+C to stop)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+import numpy as np
+import pandas as pd
+from concurrent.futures import ProcessPoolExecutor
+
+from src import viz
+
+# Metrics compared between GS and non-GS big innings
+TEST_METRICS = ['post_run_rate', 'scored_any']
+
+# Upper bound on elements in one resampling index matrix (batch x sample size)
+MAX_BATCH_ELEMENTS = 2_000_000
+
+def _rng(seed, test_no, kind, batch_no):
+    # Independent, reproducible stream per (test, kind, batch), regardless of worker count
+    return np.random.default_rng(np.random.SeedSequence(seed, spawn_key=(test_no, kind, batch_no)))
+
+def _bootstrap_batch(gs, non_gs, size, seed, test_no, batch_no):
+    """
+    Bootstrap replicates of mean(gs) - mean(non_gs), resampling each group with replacement.
+    """
+    rng = _rng(seed, test_no, 0, batch_no)
+    gs_idx = rng.integers(0, len(gs), size=(size, len(gs)))
+    non_idx = rng.integers(0, len(non_gs), size=(size, len(non_gs)))
+    return gs[gs_idx].mean(axis=1) - non_gs[non_idx].mean(axis=1)
+
+def _permutation_batch(pooled, n_gs, size, seed, test_no, batch_no):
+    """
+    Permutation replicates of the mean difference: a random n_gs-subset of pooled is relabelled as GS.
+    """
+    rng = _rng(seed, test_no, 1, batch_no)
+    # argpartition on random keys = random subset without replacement, O(n) per replicate
+    gs_idx = rng.random((size, len(pooled))).argpartition(n_gs - 1, axis=1)[:, :n_gs]
+    gs_sum = pooled[gs_idx].sum(axis=1)
+    return gs_sum / n_gs - (pooled.sum() - gs_sum) / (len(pooled) - n_gs)
+
+def _batches(n_resamples, sample_size):
+    batch = max(1, min(n_resamples, MAX_BATCH_ELEMENTS // max(sample_size, 1)))
+    sizes = [batch] * (n_resamples // batch)
+    if n_resamples % batch:
+        sizes.append(n_resamples % batch)
+    return sizes
+
+def _test_samples(df):
+    """
+    (scope, metric, gs values, non-GS values) for overall and each stage.
+    Values are sorted, so the resampling draws don't depend on row order (e.g. season partitions with --jobs).
+    """
+    scopes = [('Overall', df)] + [(stage, g) for stage, g in df.groupby('stage')]
+    samples = []
+    for scope, g in scopes:
+        for metric in TEST_METRICS:
+            valid = g.dropna(subset=[metric])
+            is_gs = valid['is_grandslam'].astype(bool).to_numpy()
+            values = valid[metric].to_numpy(dtype=float)
+            samples.append((scope, metric, np.sort(values[is_gs]), np.sort(values[~is_gs])))
+    return samples
+
+def resampling_tests(df, n_resamples=10000, seed=42, jobs=1, ci=0.95):
+    """
+    Bootstrap CIs and permutation p-values for the GS vs non-GS difference in means of
+    post_run_rate and scored_any, overall and per stage.
+    Replicates are drawn as batched index matrices; batches run in a process pool when jobs > 1.
+    Results are identical for a given seed whatever the number of jobs.
+    """
+    viz.add_summary_columns(df)
+    samples = _test_samples(df)
+
+    executor = ProcessPoolExecutor(max_workers=jobs) if jobs > 1 else None
+    futures = []
+    for test_no, (scope, metric, gs, non_gs) in enumerate(samples):
+        boot, perm = [], []
+        if len(gs) and len(non_gs):
+            pooled = np.concatenate([gs, non_gs])
+            for batch_no, size in enumerate(_batches(n_resamples, len(pooled))):
+                args_boot = (_bootstrap_batch, gs, non_gs, size, seed, test_no, batch_no)
+                args_perm = (_permutation_batch, pooled, len(gs), size, seed, test_no, batch_no)
+                for args, sink in ((args_boot, boot), (args_perm, perm)):
+                    sink.append(executor.submit(*args) if executor else args[0](*args[1:]))
+        futures.append((boot, perm))
+
+    alpha = (1 - ci) / 2
+    rows = []
+    for (scope, metric, gs, non_gs), (boot, perm) in zip(samples, futures):
+        row = {
+            'scope': scope,
+            'metric': metric,
+            'gs_mean': gs.mean() if len(gs) else np.nan,
+            'non_gs_mean': non_gs.mean() if len(non_gs) else np.nan,
+            'gs_count': len(gs),
+            'non_gs_count': len(non_gs),
+        }
+        row['diff'] = row['gs_mean'] - row['non_gs_mean']
+        if boot:
+            boot = np.concatenate([f.result() if executor else f for f in boot])
+            perm = np.concatenate([f.result() if executor else f for f in perm])
+            row['ci_low'], row['ci_high'] = np.quantile(boot, [alpha, 1 - alpha])
+            # Two-sided, with the +1 correction so p is never exactly 0
+            extreme = np.abs(perm) >= np.abs(row['diff']) - 1e-12
+            row['p_value'] = (extreme.sum() + 1) / (len(perm) + 1)
+        else:
+            row['ci_low'] = row['ci_high'] = row['p_value'] = np.nan
+        rows.append(row)
+
+    if executor:
+        executor.shutdown()
+
+    result = pd.DataFrame(rows).set_index(['scope', 'metric'])
+    result['n_resamples'] = n_resamples
+    result['seed'] = seed
+    return result.round(4)
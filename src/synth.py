@@ -0,0 +1,259 @@
+import sqlite3
+import argparse
+import datetime
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+# Synthetic, schema-compatible yakyuu.db (event / games / teams) for tests and benchmarks.
+# Every half-inning is simulated plate appearance by plate appearance on a base/out state
+# machine, so event rows and the games table agree (bases-loaded HRs, walk-offs,
+# skipped 9th-inning bottoms, extra innings up to the 12th, tie games).
+
+TEAMS = [f'T{i:02d}' for i in range(12)]
+GAMES_PER_SEASON = 858  # 12 teams x 143 games / 2
+MAX_INNINGS = 12
+FIRST_SEASON = 2000
+
+# Plate appearance outcomes and probabilities (tuned to roughly 3.5-4 runs per team per game)
+OUTCOMES = ['k', 'gb', 'fb', '1b', '2b', '3b', 'hr', 'bb', 'hbp', 'roe']
+OUTCOME_P = np.array([0.19, 0.25, 0.23, 0.155, 0.04, 0.004, 0.022, 0.075, 0.009, 0.012])
+OUTCOME_P = OUTCOME_P / OUTCOME_P.sum()
+K, GB, FB, SINGLE, DOUBLE, TRIPLE, HR, BB, HBP, ROE = range(len(OUTCOMES))
+
+EVENT_SCHEMA = [
+    ('game_id', 'TEXT'), ('batter_player_id', 'TEXT'), ('pitcher_player_id', 'TEXT'), ('inning', 'TEXT'),
+    ('team', 'TEXT'), ('out', 'INTEGER'), ('on_base', 'TEXT'), ('count', 'TEXT'), ('h', 'INTEGER'),
+    ('rbi', 'INTEGER'), ('1b', 'INTEGER'), ('2b', 'INTEGER'), ('3b', 'INTEGER'), ('hr', 'INTEGER'),
+    ('gb', 'INTEGER'), ('fb', 'INTEGER'), ('k', 'INTEGER'), ('roe', 'INTEGER'), ('bb', 'INTEGER'),
+    ('hbp', 'INTEGER'), ('gdp', 'INTEGER'), ('sac', 'INTEGER'),
+]
+GAMES_SCHEMA = (
+    [('game_id', 'TEXT'), ('season', 'INTEGER'), ('date', 'TEXT'), ('ballpark', 'TEXT'),
+     ('home_team_id', 'TEXT'), ('away_team_id', 'TEXT')]
+    + [(f'visitor_inn{i}', 'INTEGER') for i in range(1, MAX_INNINGS + 1)]
+    + [(f'home_inn{i}', 'INTEGER') for i in range(1, MAX_INNINGS + 1)]
+    + [('home_runs', 'INTEGER'), ('visitor_runs', 'INTEGER')]
+)
+
+# on_base string per base bitmask (bit 0 = 1st, bit 1 = 2nd, bit 2 = 3rd); empty bases -> ''
+ON_BASE_LABELS = np.array(['', '1', '2', '12', '3', '13', '23', '123'], dtype=object)
+
+def simulate_half_innings(n_halves, rng, max_pa=40):
+    """
+    Plays n_halves independent half-innings to three outs, vectorized across halves.
+    Returns a DataFrame of plate appearances ordered by (half, seq) with
+    outcome, bases/outs before the PA, runs scored and rbi.
+    """
+    bases = np.zeros(n_halves, dtype=np.int8)
+    outs = np.zeros(n_halves, dtype=np.int8)
+    active = np.arange(n_halves)
+    steps = []
+    for seq in range(max_pa):
+        if len(active) == 0:
+            break
+        b, o = bases[active], outs[active]
+        outcome = rng.choice(len(OUTCOMES), size=len(active), p=OUTCOME_P)
+        roll = rng.random(len(active))
+        b1, b2, b3 = b & 1, (b >> 1) & 1, (b >> 2) & 1
+
+        runs = np.zeros(len(active), dtype=np.int8)
+        new_b = b.copy()
+        new_o = o.copy()
+        gdp = (outcome == GB) & (b1 == 1) & (o < 2) & (roll < 0.4)
+        sf = (outcome == FB) & (b3 == 1) & (o < 2) & (roll < 0.5)
+
+        out_play = np.isin(outcome, [K, GB, FB])
+        new_o = np.where(out_play, o + 1 + gdp, o)
+        new_b = np.where(gdp, b & ~1, new_b)
+        runs = np.where(sf, 1, runs)
+        new_b = np.where(sf, b & ~4, new_b)
+
+        single = (outcome == SINGLE) | (outcome == ROE)
+        runs = np.where(single, b3 + b2, runs)
+        new_b = np.where(single, 1 | (b1 << 1), new_b)
+        # Runner on 1st scores on a double 40% of the time, otherwise stops at 3rd
+        from_first = b1 & (roll < 0.4)
+        runs = np.where(outcome == DOUBLE, b3 + b2 + from_first, runs)
+        new_b = np.where(outcome == DOUBLE, 2 | ((b1 & ~from_first) << 2), new_b)
+        runs = np.where(outcome == TRIPLE, b1 + b2 + b3, runs)
+        new_b = np.where(outcome == TRIPLE, 4, new_b)
+        runs = np.where(outcome == HR, b1 + b2 + b3 + 1, runs)
+        new_b = np.where(outcome == HR, 0, new_b)
+        walk = (outcome == BB) | (outcome == HBP)
+        runs = np.where(walk, b1 & b2 & b3, runs)
+        new_b = np.where(walk, 1 | ((b2 | b1) << 1) | ((b3 | (b1 & b2)) << 2), new_b)
+
+        steps.append(pd.DataFrame({
+            'half': active, 'seq': seq, 'outcome': outcome, 'bases': b, 'outs': o,
+            'runs': runs, 'rbi': np.where((outcome == ROE) | gdp, 0, runs), 'gdp': gdp, 'sf': sf,
+        }))
+        bases[active], outs[active] = new_b, new_o
+        active = active[new_o < 3]
+
+    pa = pd.concat(steps, ignore_index=True)
+    return pa.sort_values(['half', 'seq'], kind='stable').reset_index(drop=True)
+
+def _play_games(pa, n_games):
+    """
+    Applies game flow to simulated half-innings (half index = game * 24 + (inning - 1) * 2 + is_bottom):
+    no 9th-inning bottom when the home team leads, walk-off truncation, extras through the 12th.
+    Returns (kept PA rows, per-half runs matrix with NaN for unplayed halves).
+    """
+    n_halves = n_games * MAX_INNINGS * 2
+    runs = np.bincount(pa['half'], weights=pa['runs'], minlength=n_halves).reshape(n_games, MAX_INNINGS, 2)
+
+    played = np.zeros((n_games, MAX_INNINGS, 2), dtype=bool)
+    played[:, :8, :] = True
+    need = np.full((n_games, MAX_INNINGS), np.inf)  # runs that end the game in each bottom half
+    visitor = runs[:, :8, 0].sum(axis=1)
+    home = runs[:, :8, 1].sum(axis=1)
+    alive = np.ones(n_games, dtype=bool)
+    for i in range(8, MAX_INNINGS):
+        played[:, i, 0] = alive
+        visitor = visitor + np.where(alive, runs[:, i, 0], 0)
+        bottom = alive & (home <= visitor)
+        played[:, i, 1] = bottom
+        need[:, i] = np.where(bottom, visitor - home + 1, np.inf)
+        home = home + np.where(bottom, np.minimum(runs[:, i, 1], need[:, i]), 0)
+        alive = bottom & (home == visitor)
+
+    half = pa['half'].to_numpy()
+    game, rest = np.divmod(half, MAX_INNINGS * 2)
+    inning, is_bottom = np.divmod(rest, 2)
+    pa_runs = pa['runs'].astype(int)
+    cum_before = pa_runs.groupby(pa['half']).cumsum().to_numpy() - pa_runs.to_numpy()
+    half_need = np.where(is_bottom == 1, need[game, inning], np.inf)
+    keep = played[game, inning, is_bottom] & (cum_before < half_need)
+    kept = pa[keep].reset_index(drop=True)
+
+    final = np.bincount(kept['half'], weights=kept['runs'], minlength=n_halves).reshape(n_games, MAX_INNINGS, 2)
+    return kept, np.where(played, final, np.nan)
+
+def _schedule(n_games, seasons, rng):
+    """
+    Random two-league schedule: mostly intra-league pairs, dates spread over each season.
+    """
+    season = FIRST_SEASON + np.arange(n_games) // GAMES_PER_SEASON
+    league = rng.integers(0, 2, n_games)
+    inter = rng.random(n_games) < 0.13
+    home = league * 6 + rng.integers(0, 6, n_games)
+    away_pick = rng.integers(0, 5, n_games)
+    away_league = np.where(inter, 1 - league, league) * 6
+    away = np.where(inter, away_league + rng.integers(0, 6, n_games),
+                    league * 6 + (home % 6 + 1 + away_pick) % 6)
+    day = (np.arange(n_games) % GAMES_PER_SEASON) * 180 // GAMES_PER_SEASON
+    start = [datetime.date(int(s), 3, 29) for s in range(FIRST_SEASON, FIRST_SEASON + seasons)]
+    dates = [(start[s - FIRST_SEASON] + datetime.timedelta(days=int(d))).isoformat() for s, d in zip(season, day)]
+    teams = np.array(TEAMS, dtype=object)
+    return pd.DataFrame({
+        'game_id': [f'{s}{n:04d}' for s, n in zip(season, np.arange(n_games) % GAMES_PER_SEASON)],
+        'season': season,
+        'date': dates,
+        'ballpark': [f'{t}-park' for t in teams[home]],
+        'home_team_id': teams[home],
+        'away_team_id': teams[away],
+    })
+
+def _event_frame(pa, games, rng):
+    """
+    Builds event table rows (EVENT_SCHEMA columns) from the kept plate appearances.
+    """
+    half = pa['half'].to_numpy()
+    game, rest = np.divmod(half, MAX_INNINGS * 2)
+    inning, is_bottom = np.divmod(rest, 2)
+    outcome = pa['outcome'].to_numpy()
+
+    team = np.where(is_bottom == 1, games['home_team_id'].to_numpy()[game], games['away_team_id'].to_numpy()[game])
+    opponent = np.where(is_bottom == 1, games['away_team_id'].to_numpy()[game], games['home_team_id'].to_numpy()[game])
+    season = games['season'].to_numpy()[game]
+
+    # Lineup slot: batting order position of the PA within (game, team), with occasional bench players
+    slot = pd.Series(is_bottom).groupby([game, is_bottom]).cumcount().to_numpy() % 9
+    slot = np.where(rng.random(len(pa)) < 0.08, 9 + rng.integers(0, 5, len(pa)), slot)
+    batter = pd.Series(team).str.cat([pd.Series(season).astype(str), pd.Series(slot).map('{:02d}'.format)], sep='-')
+    pitcher = pd.Series(opponent).str.cat([pd.Series(season).astype(str), pd.Series(rng.integers(0, 12, len(pa))).map('P{:02d}'.format)], sep='-')
+    balls, strikes = rng.integers(0, 4, len(pa)), rng.integers(0, 3, len(pa))
+
+    def flag(*codes):
+        return np.isin(outcome, codes).astype(np.int8)
+
+    return pd.DataFrame({
+        'game_id': games['game_id'].to_numpy()[game],
+        'batter_player_id': batter.to_numpy(),
+        'pitcher_player_id': pitcher.to_numpy(),
+        'inning': [f'{i}{h}' for i, h in zip(inning + 1, np.where(is_bottom == 1, 'B', 'T'))],
+        'team': team,
+        'out': pa['outs'].to_numpy(),
+        'on_base': ON_BASE_LABELS[pa['bases'].to_numpy()],
+        'count': [f'{b}-{s}' for b, s in zip(balls, strikes)],
+        'h': flag(SINGLE, DOUBLE, TRIPLE, HR),
+        'rbi': pa['rbi'].to_numpy(),
+        '1b': flag(SINGLE), '2b': flag(DOUBLE), '3b': flag(TRIPLE), 'hr': flag(HR),
+        'gb': flag(GB), 'fb': flag(FB), 'k': flag(K), 'roe': flag(ROE), 'bb': flag(BB), 'hbp': flag(HBP),
+        'gdp': pa['gdp'].to_numpy().astype(np.int8),
+        'sac': pa['sf'].to_numpy().astype(np.int8),
+    })
+
+def _create_tables(conn):
+    for table, schema in (('event', EVENT_SCHEMA), ('games', GAMES_SCHEMA), ('teams', [('team_id', 'TEXT'), ('team_name', 'TEXT')])):
+        cols = ', '.join(f'"{name}" {sql_type}' for name, sql_type in schema)
+        conn.execute(f'CREATE TABLE "{table}" ({cols})')
+
+def _insert(conn, table, df):
+    placeholders = ', '.join('?' * len(df.columns))
+    # NaN -> NULL; numpy scalars -> Python values
+    rows = df.astype(object).where(df.notna(), None).itertuples(index=False, name=None)
+    conn.executemany(f'INSERT INTO "{table}" VALUES ({placeholders})', rows)
+
+def generate_db(path, seasons=1, seed=0, games_per_chunk=5000):
+    """
+    Writes a synthetic yakyuu.db with `seasons` NPB-sized seasons (858 games each) to path
+    (overwritten if it exists). Deterministic for a given seed and chunk size.
+    Returns {'games': ..., 'events': ...} row counts.
+    """
+    path = Path(path)
+    path.unlink(missing_ok=True)
+    rng = np.random.default_rng(seed)
+    n_games = seasons * GAMES_PER_SEASON
+    schedule = _schedule(n_games, seasons, rng)
+
+    conn = sqlite3.connect(path)
+    counts = {'games': 0, 'events': 0}
+    try:
+        _create_tables(conn)
+        _insert(conn, 'teams', pd.DataFrame({'team_id': TEAMS, 'team_name': [f'Team {t[1:]}' for t in TEAMS]}))
+        # Games are simulated in chunks to bound memory at large scales
+        for start in range(0, n_games, games_per_chunk):
+            games = schedule.iloc[start:start + games_per_chunk].reset_index(drop=True)
+            pa = simulate_half_innings(len(games) * MAX_INNINGS * 2, rng)
+            pa, half_runs = _play_games(pa, len(games))
+
+            for side, col in ((0, 'visitor'), (1, 'home')):
+                for i in range(MAX_INNINGS):
+                    games[f'{col}_inn{i + 1}'] = pd.array(half_runs[:, i, side], dtype='Int64')
+            games['home_runs'] = np.nansum(half_runs[:, :, 1], axis=1).astype(int)
+            games['visitor_runs'] = np.nansum(half_runs[:, :, 0], axis=1).astype(int)
+
+            _insert(conn, 'games', games[[name for name, _ in GAMES_SCHEMA]])
+            _insert(conn, 'event', _event_frame(pa, games, rng))
+            counts['games'] += len(games)
+            counts['events'] += len(pa)
+        conn.commit()
+    finally:
+        conn.close()
+    return counts
+
+def main():
+    parser = argparse.ArgumentParser(description="Synthetic yakyuu.db generator")
+    parser.add_argument('--out', type=str, default='yakyuu.db', help='Path of the SQLite DB to write (overwritten)')
+    parser.add_argument('--seasons', type=int, default=1, help=f'Number of seasons ({GAMES_PER_SEASON} games each)')
+    parser.add_argument('--seed', type=int, default=0, help='Random seed')
+    args = parser.parse_args()
+
+    counts = generate_db(args.out, seasons=args.seasons, seed=args.seed)
+    print(f"Wrote {counts['games']} games / {counts['events']} events to {args.out}")
+
+if __name__ == "__main__":
+    main()
@@ -1,12 +1,22 @@
 
 import pandas as pd
-import matplotlib.pyplot as plt
+import numpy as np
 import json
-import os
+import gzip
+import hashlib
+import itertools
+from pathlib import Path
 
-def generate_summary(df):
+from src import outputs
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+def add_summary_columns(df):
     """
-    Generates summary statistics grouping by is_grandslam.
+    Adds the 'stage' and 'scored_any' columns used by the summaries (in place).
     """
     # Define groups
     def get_stage(inning):
@@ -18,6 +28,13 @@ def generate_summary(df):
     
     # Calculate if at least one run was scored after
     df['scored_any'] = (df['post_inning_runs_1to9'] > 0).astype(int)
+    return df
+
+def generate_summary(df):
+    """
+    Generates summary statistics grouping by is_grandslam.
+    """
+    add_summary_columns(df)
     
     # 1. Overall Comparison
     overall = df.groupby('is_grandslam').agg({
@@ -37,36 +54,278 @@ def generate_summary(df):
     
     return overall, stage
 
-def plot_comparison(df, output_path):
+def trigger_summary(df):
+    """
+    Same overall metrics as generate_summary, grouped by trigger event (pipeline.load_triggers output).
+    """
+    add_summary_columns(df)
+    return df.groupby('trigger').agg({
+        'post_run_rate': ['mean', 'median', 'count', 'std'],
+        'post_inning_runs_1to9': 'mean',
+        'remaining_off_innings_1to9': 'mean',
+        'scored_any': 'mean'
+    }).round(3)
+
+SUMMARY_METRICS = ['post_run_rate', 'post_inning_runs_1to9', 'remaining_off_innings_1to9', 'scored_any']
+
+def summary_state(df):
+    """
+    Partial aggregates behind generate_summary, mergeable across incremental runs.
+    One row per (stage, is_grandslam, metric, value) with the number of rows holding that value.
+    Every metric takes few distinct values (run rates are small fractions), so the state stays
+    small while still giving exact counts, sums, std and medians.
+    """
+    add_summary_columns(df)
+    parts = []
+    for metric in SUMMARY_METRICS:
+        part = (df.dropna(subset=[metric])
+                  .groupby(['stage', 'is_grandslam', metric]).size()
+                  .reset_index(name='count')
+                  .rename(columns={metric: 'value'}))
+        part.insert(2, 'metric', metric)
+        parts.append(part)
+    return pd.concat(parts, ignore_index=True)
+
+def merge_summary_state(*states):
+    """
+    Combines summary states (e.g. stored state + state of newly processed games).
+    """
+    combined = pd.concat(states, ignore_index=True)
+    return combined.groupby(['stage', 'is_grandslam', 'metric', 'value'], as_index=False)['count'].sum()
+
+def _hist_agg(values, counts, func):
+    """
+    mean/median/count/std of a sample given as (value, count) pairs; matches pandas semantics.
+    """
+    order = np.argsort(values, kind='stable')
+    values = np.asarray(values, dtype=float)[order]
+    counts = np.asarray(counts, dtype=np.int64)[order]
+    n = counts.sum()
+    if func == 'count':
+        return n
+    if n == 0 or (func == 'std' and n < 2):
+        return np.nan
+    mean = (values * counts).sum() / n
+    if func == 'mean':
+        return mean
+    if func == 'std':
+        return np.sqrt((counts * (values - mean) ** 2).sum() / (n - 1))
+    # median: middle value (or average of the two middle values)
+    cum = np.cumsum(counts)
+    lo = values[np.searchsorted(cum, (n - 1) // 2, side='right')]
+    hi = values[np.searchsorted(cum, n // 2, side='right')]
+    return (lo + hi) / 2
+
+def _summary_from_state(state, keys, spec):
+    groups = state[keys].drop_duplicates().sort_values(keys)
+    index = pd.MultiIndex.from_frame(groups) if len(keys) > 1 else pd.Index(groups[keys[0]], name=keys[0])
+    columns = pd.MultiIndex.from_tuples([(m, f) for m, funcs in spec.items() for f in funcs])
+    result = pd.DataFrame(index=index, columns=columns, dtype=float)
+
+    hist = state.groupby(keys + ['metric', 'value'])['count'].sum().reset_index()
+    for key, g in hist.groupby(keys + ['metric']):
+        group_key, metric = (key[0] if len(keys) == 1 else key[:-1]), key[-1]
+        for func in spec.get(metric, []):
+            result.loc[group_key, (metric, func)] = _hist_agg(g['value'], g['count'], func)
+
+    for metric, funcs in spec.items():
+        if 'count' in funcs:
+            result[(metric, 'count')] = result[(metric, 'count')].fillna(0).astype(np.int64)
+    return result.round(3)
+
+def summary_from_state(state):
+    """
+    Rebuilds the (overall, stage) summaries of generate_summary from a summary state,
+    without touching the event rows.
+    """
+    overall = _summary_from_state(state, ['is_grandslam'], {
+        'post_run_rate': ['mean', 'median', 'count', 'std'],
+        'post_inning_runs_1to9': ['mean'],
+        'remaining_off_innings_1to9': ['mean'],
+        'scored_any': ['mean'],
+    })
+    stage = _summary_from_state(state, ['stage', 'is_grandslam'], {
+        'post_run_rate': ['mean', 'median', 'count'],
+        'scored_any': ['mean'],
+    })
+    return overall, stage
+
+def _pyplot():
+    """
+    matplotlib.pyplot, imported on first use with the non-interactive Agg backend
+    (importing it costs more than the rest of the CLI's imports together).
+    """
+    import matplotlib
+    matplotlib.use('Agg')
+    import matplotlib.pyplot as plt
+    return plt
+
+def plot_comparison(df, output_path, title=None):
     """
     Creates visual comparison of post_run_rate.
     """
     # Filter out cases with 0 remaining innings (though logic should have handled it/NaN)
     valid = df.dropna(subset=['post_run_rate'])
     
-    plt.figure(figsize=(10, 6))
-    
-    # Boxplot
     # Prepare data
     gs_data = valid[valid['is_grandslam'] == True]['post_run_rate']
     non_gs_data = valid[valid['is_grandslam'] == False]['post_run_rate']
+    plot_boxplot(gs_data, non_gs_data, output_path, title=title)
+
+def _no_data(plt, x):
+    # Marks an empty group at x (data coordinates) instead of drawing NaN statistics
+    plt.text(x, 0.5, 'no data', transform=plt.gca().get_xaxis_transform(), ha='center', va='center', color='gray')
+
+def plot_boxplot(gs_data, non_gs_data, output_path, title=None):
+    """
+    Boxplot of post_run_rate, non-GS vs GS big innings. An empty group is labelled 'no data'.
+    """
+    plt = _pyplot()
+    
+    plt.figure(figsize=(10, 6))
     
-    plt.boxplot([non_gs_data, gs_data], labels=['Non-GS 4+ Runs', 'Grand Slam (4 Runs)'], patch_artist=True)
+    # Boxplot
+    groups = [np.asarray(non_gs_data, dtype=float), np.asarray(gs_data, dtype=float)]
+    groups = [g[~np.isnan(g)] for g in groups]
+    present = [i for i, g in enumerate(groups) if len(g)]
+    if present:
+        plt.boxplot([groups[i] for i in present], positions=[i + 1 for i in present], patch_artist=True)
+    for i in set(range(len(groups))) - set(present):
+        _no_data(plt, i + 1)
+    plt.xticks([1, 2], ['Non-GS 4+ Runs', 'Grand Slam (4 Runs)'])
+    plt.xlim(0.5, 2.5)
     
-    plt.title('Post-Inning Run Rate Comparison\n(Runs Scored After Big Inning / Remaining Innings)')
+    plt.title(title or 'Post-Inning Run Rate Comparison\n(Runs Scored After Big Inning / Remaining Innings)')
     plt.ylabel('Run Rate')
     plt.grid(True, linestyle='--', alpha=0.6)
     
     plt.savefig(output_path)
     plt.close()
 
-def export_json(events_df, summary_df_list, output_path):
+def plot_distribution(gs_data, non_gs_data, output_path, title, xlabel):
     """
-    Exports data for the web dashboard.
+    Share of innings per integer value (e.g. runs after the big inning), non-GS vs GS side by side.
+    An empty group is left out and marked '(no data)' in the legend.
     """
-    # Convert timestamps to string if any
-    events = events_df.where(pd.notnull(events_df), None).to_dict(orient='records')
+    plt = _pyplot()
     
+    series = [('Non-GS', np.asarray(non_gs_data, dtype=float), 'C0'), ('Grand Slam', np.asarray(gs_data, dtype=float), 'C1')]
+    series = [(label, values[~np.isnan(values)], color) for label, values, color in series]
+    present = [s for s in series if len(s[1])]
+    top = int(max(s[1].max() for s in present)) if present else 0
+    bins = np.arange(top + 2) - 0.5
+    
+    plt.figure(figsize=(10, 6))
+    if present:
+        plt.hist([s[1] for s in present], bins=bins, density=True, label=[s[0] for s in present], color=[s[2] for s in present])
+    else:
+        _no_data(plt, 0)
+    for label, _, color in series:
+        if not any(s[0] == label for s in present):
+            plt.hist([], bins=bins, color=color, label=f'{label} (no data)')
+    plt.title(title)
+    plt.xlabel(xlabel)
+    plt.ylabel('Share of innings')
+    plt.legend()
+    plt.grid(True, linestyle='--', alpha=0.6)
+    
+    plt.savefig(output_path)
+    plt.close()
+
+CUBE_DIMS = ['season', 'team', 'ballpark', 'stage', 'is_grandslam']
+CUBE_METRICS = ['post_run_rate', 'post_inning_runs_1to9', 'scored_any']
+CUBE_ALL = '(all)'
+
+def aggregation_cube(df):
+    """
+    Rollup of count / sum / sum of squares for CUBE_METRICS over every combination of
+    season x team x ballpark x stage x is_grandslam (CUBE_ALL marks a rolled-up dimension).
+    The finest grouping is computed in one grouped pass; coarser ones are summed from it.
+    Mean and std of any slice follow from the three columns.
+    df is not modified (it may be shared with other export threads).
+    """
+    df = add_summary_columns(df.copy())
+    frame = pd.DataFrame({'season': df['date'].astype(str).str[:4].where(df['date'].notna())}, index=df.index)
+    for dim in CUBE_DIMS[1:]:
+        if dim in df.columns:
+            frame[dim] = df[dim]
+    dims = [d for d in CUBE_DIMS if d in frame.columns]
+
+    aggs = {}
+    for m in CUBE_METRICS:
+        frame[m] = df[m]
+        frame[f'{m}_sq'] = df[m] ** 2
+        aggs[f'{m}_count'] = (m, 'count')
+        aggs[f'{m}_sum'] = (m, 'sum')
+        aggs[f'{m}_sumsq'] = (f'{m}_sq', 'sum')
+    value_cols = list(aggs)
+
+    base = frame.groupby(dims, dropna=False).agg(**aggs).reset_index()
+
+    parts = []
+    for r in range(len(dims), -1, -1):
+        for subset in itertools.combinations(dims, r):
+            if r == len(dims):
+                part = base
+            elif r == 0:
+                part = base[value_cols].sum().to_frame().T
+            else:
+                part = base.groupby(list(subset), dropna=False)[value_cols].sum().reset_index()
+            part = part.astype({d: object for d in subset})
+            for d in dims:
+                if d not in subset:
+                    part[d] = CUBE_ALL
+            parts.append(part[dims + value_cols])
+
+    cube = pd.concat(parts, ignore_index=True)
+    for m in CUBE_METRICS:
+        cube[f'{m}_count'] = cube[f'{m}_count'].astype(np.int64)
+    return cube
+
+def cube_to_json(cube):
+    """
+    Compact columnar encoding of aggregation_cube for the dashboard:
+    each dimension is dictionary-encoded (code -1 = all), metrics are parallel arrays.
+    """
+    dims = [d for d in CUBE_DIMS if d in cube.columns]
+    labels, keys = {}, {}
+    for d in dims:
+        col = cube[d]
+        is_all = (col.astype(object) == CUBE_ALL).to_numpy()
+        codes, uniques = pd.factorize(col[~is_all], use_na_sentinel=False)
+        full = np.full(len(cube), -1, dtype=np.int64)
+        full[~is_all] = codes
+        keys[d] = full.tolist()
+        labels[d] = json.loads(pd.Series(uniques, dtype=object).to_json(orient='values'))
+
+    metrics = {}
+    for m in CUBE_METRICS:
+        metrics[m] = {
+            'count': cube[f'{m}_count'].tolist(),
+            'sum': cube[f'{m}_sum'].round(6).tolist(),
+            'sumsq': cube[f'{m}_sumsq'].round(6).tolist(),
+        }
+    return {'dims': dims, 'all': -1, 'labels': labels, 'keys': keys, 'metrics': metrics}
+
+def export_cube(events_df, output_path):
+    """
+    Writes the aggregation cube as minified JSON.
+    """
+    cube_json = cube_to_json(aggregation_cube(events_df))
+    with open(output_path, 'w', encoding='utf-8') as f:
+        json.dump(cube_json, f, ensure_ascii=False, separators=(',', ':'))
+    return cube_json
+
+DASHBOARD_METADATA = {
+    "description": "Analysis of Grand Slam vs Non-GS 4+ Run Innings",
+    "source": "yakyuu.db"
+}
+
+def dashboard_stats(summary_df_list, significance=None):
+    """
+    The "stats" block of the dashboard data: flattened overall / by_stage summaries,
+    plus the resampling test results when given.
+    """
     # summary_df_list is tuple (overall, stage)
     # Pandas multi-index columns need flattening for JSON
     
@@ -79,34 +338,150 @@ def export_json(events_df, summary_df_list, output_path):
     overall_stats = flatten_stats(summary_df_list[0])
     stage_stats = flatten_stats(summary_df_list[1])
 
-    # Replace NaN/Infinity with None for valid standard JSON
-    def clean_for_json(obj):
-        if isinstance(obj, float):
-            if pd.isna(obj) or np.isinf(obj):
-                return None
-        if isinstance(obj, dict):
-            return {k: clean_for_json(v) for k, v in obj.items()}
-        if isinstance(obj, list):
-            return [clean_for_json(v) for v in obj]
-        return obj
-
-    # Clean the entire data structure
-    # Note: data['events'] is a list of dicts from pandas.
-    # Pandas to_dict might have left NaNs if we didn't handle them.
-    # The stats dictionaries also need cleaning.
-    
-    # Re-construct data cleanly
+    # Round-trip through pandas JSON so NaN/Infinity become null
+    stats = {
+        "overall": json.loads(pd.DataFrame(overall_stats).to_json(orient='records')),
+        "by_stage": json.loads(pd.DataFrame(stage_stats).to_json(orient='records'))
+    }
+    if significance is not None:
+        stats["significance"] = json.loads(significance.reset_index().to_json(orient='records'))
+    return stats
+
+def dashboard_events(events_df):
+    """
+    Event rows as JSON-ready records (NaN -> None).
+    """
+    # Convert timestamps to string if any
+    events = events_df.where(pd.notnull(events_df), None).to_dict(orient='records')
+    return json.loads(pd.DataFrame(events).to_json(orient='records'))
+
+def export_json(events_df, summary_df_list, output_path, significance=None):
+    """
+    Exports data for the web dashboard.
+    """
     data = {
-        "metadata": {
-            "description": "Analysis of Grand Slam vs Non-GS 4+ Run Innings",
-            "source": "yakyuu.db"
-        },
-        "stats": {
-            "overall": json.loads(pd.DataFrame(overall_stats).to_json(orient='records')),
-            "by_stage": json.loads(pd.DataFrame(stage_stats).to_json(orient='records'))
-        },
-        "events": json.loads(pd.DataFrame(events).to_json(orient='records'))
+        "metadata": DASHBOARD_METADATA,
+        "stats": dashboard_stats(summary_df_list, significance),
+        "events": dashboard_events(events_df)
     }
     
     with open(output_path, 'w', encoding='utf-8') as f:
         json.dump(data, f, ensure_ascii=False, indent=2)
+
+# Game-level columns stored once per game in the normalized export (line scores go to 'visitor'/'home')
+GAME_FIELDS = ['game_id', 'date', 'ballpark', 'home_team_id', 'away_team_id', 'home_team', 'away_team']
+LINE_SCORE_INNINGS = 9
+
+def _json_rows(df):
+    # Row arrays; pandas JSON turns NaN/NA into null
+    return json.loads(df.to_json(orient='values'))
+
+def normalize_events(events_df):
+    """
+    Splits event rows into a games table and an events table, both as {'columns': [...], 'rows': [[...]]}.
+    Each game appears once, with its line score as two integer arrays (innings 1-9, null = not played).
+    Events keep their own columns and refer to their game by row index ('game').
+    """
+    line_cols = {side: [f'{side}_inn{i}' for i in range(1, LINE_SCORE_INNINGS + 1)] for side in ('visitor', 'home')}
+    inning_cols = line_cols['visitor'] + line_cols['home']
+    game_cols = [c for c in GAME_FIELDS if c in events_df.columns]
+
+    games = events_df.drop_duplicates(subset='game_id')
+    game_index = pd.Index(games['game_id']).get_indexer(events_df['game_id'])
+
+    game_rows = _json_rows(games[game_cols])
+    lines = {}
+    for side, cols in line_cols.items():
+        present = [c for c in cols if c in games.columns]
+        scores = pd.DataFrame(games[present].to_numpy(dtype=float, na_value=np.nan)).round().astype('Int64')
+        lines[side] = _json_rows(scores)
+    for row, visitor, home in zip(game_rows, lines['visitor'], lines['home']):
+        row.extend([visitor, home])
+
+    event_cols = [c for c in events_df.columns if c not in game_cols and c not in inning_cols]
+    events = events_df[event_cols].assign(game=game_index)
+    return (
+        {'columns': game_cols + ['visitor', 'home'], 'rows': game_rows},
+        {'columns': event_cols + ['game'], 'rows': _json_rows(events)},
+    )
+
+def export_json_normalized(events_df, summary_df_list, output_path, significance=None):
+    """
+    Minified dashboard data with games stored once (see normalize_events) instead of
+    copying the line score, teams, date and ballpark onto every event.
+    """
+    games, events = normalize_events(events_df)
+    data = {
+        "metadata": dict(DASHBOARD_METADATA, layout="normalized"),
+        "stats": dashboard_stats(summary_df_list, significance),
+        "games": games,
+        "events": events,
+    }
+    with open(output_path, 'w', encoding='utf-8') as f:
+        json.dump(data, f, ensure_ascii=False, separators=(',', ':'))
+    return data
+
+def _write_json_blob(out_dir, stem, obj):
+    """
+    Writes obj as minified JSON under a content-hashed name, plus .gz (and .br when the
+    brotli package is installed) companions. Returns the manifest entry.
+    """
+    raw = json.dumps(obj, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+    digest = hashlib.sha256(raw).hexdigest()
+    name = f"{stem}.{digest[:12]}.json"
+    files = {'json': name}
+
+    outputs.atomic_write(out_dir / name, lambda tmp: tmp.write_bytes(raw))
+    # mtime=0 keeps the .gz bytes reproducible for identical content
+    gz = gzip.compress(raw, compresslevel=9, mtime=0)
+    outputs.atomic_write(out_dir / f"{name}.gz", lambda tmp: tmp.write_bytes(gz))
+    files['gz'] = f"{name}.gz"
+    if brotli is not None:
+        br = brotli.compress(raw, quality=11)
+        outputs.atomic_write(out_dir / f"{name}.br", lambda tmp: tmp.write_bytes(br))
+        files['br'] = f"{name}.br"
+
+    return {'files': files, 'bytes': len(raw), 'sha256': digest}
+
+def export_json_shards(events_df, summary_df_list, output_dir, significance=None):
+    """
+    Exports the dashboard data split for lazy loading:
+    - stats.<hash>.json: the headline summaries (tiny, fetched first)
+    - events-<season>.<hash>.json: event rows per season (season = year of 'date')
+    - cube.<hash>.json: the aggregation cube for filter lookups
+    - manifest.json: points to the current files (the only unhashed name)
+    All JSON is minified and precompressed. Every file is written atomically and the
+    manifest last, so a reader never sees a manifest pointing at missing shards; files
+    from older exports are removed only after the new manifest is in place.
+    """
+    output_dir = Path(output_dir)
+    output_dir.mkdir(parents=True, exist_ok=True)
+
+    stats_entry = _write_json_blob(output_dir, 'stats', dashboard_stats(summary_df_list, significance))
+
+    records = dashboard_events(events_df)
+    seasons = events_df['date'].astype(str).str[:4].where(events_df['date'].notna(), 'unknown').to_numpy()
+    event_entries = []
+    for season in sorted(set(seasons)):
+        shard = [records[i] for i in np.flatnonzero(seasons == season)]
+        entry = _write_json_blob(output_dir, f'events-{season}', shard)
+        entry.update(season=season, count=len(shard))
+        event_entries.append(entry)
+
+    cube_entry = _write_json_blob(output_dir, 'cube', cube_to_json(aggregation_cube(events_df)))
+
+    manifest = {
+        'metadata': DASHBOARD_METADATA,
+        'stats': stats_entry,
+        'cube': cube_entry,
+        'events': event_entries,
+    }
+    raw = json.dumps(manifest, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+    outputs.atomic_write(output_dir / 'manifest.json', lambda tmp: tmp.write_bytes(raw))
+
+    # Drop shards from previous exports (nothing points at them any more)
+    current = {name for entry in [stats_entry, cube_entry] + event_entries for name in entry['files'].values()}
+    for path in output_dir.iterdir():
+        if path.name != 'manifest.json' and path.name not in current and path.name.split('.')[0].startswith(('stats', 'cube', 'events-')):
+            path.unlink()
+    return manifest
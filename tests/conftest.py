@@ -0,0 +1,39 @@
+import os
+import sys
+import sqlite3
+
+import pytest
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src import synth
+
+@pytest.fixture(scope='session')
+def synth_db(tmp_path_factory):
+    """
+    One synthetic season (numeric-looking game_ids such as '20000001').
+    """
+    path = tmp_path_factory.mktemp('db') / 'yakyuu.db'
+    synth.generate_db(path, seasons=1, seed=0)
+    return path
+
+@pytest.fixture(scope='session')
+def synth_db_2(tmp_path_factory):
+    """
+    Two synthetic seasons (two partitions for --jobs).
+    """
+    path = tmp_path_factory.mktemp('db2') / 'yakyuu.db'
+    synth.generate_db(path, seasons=2, seed=1)
+    return path
+
+def truncate_games(path, before_date):
+    """
+    Drops the games (and their events) played on or after before_date.
+    """
+    conn = sqlite3.connect(path)
+    try:
+        conn.execute("DELETE FROM event WHERE game_id IN (SELECT game_id FROM games WHERE date >= ?)", (before_date,))
+        conn.execute("DELETE FROM games WHERE date >= ?", (before_date,))
+        conn.commit()
+    finally:
+        conn.close()
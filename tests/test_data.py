@@ -0,0 +1,37 @@
+import sqlite3
+
+import pandas as pd
+import pytest
+
+from src import data
+
+def event_db(path, game_ids, index=False):
+    conn = sqlite3.connect(path)
+    pd.DataFrame({'game_id': game_ids, 'inning': '1T'}).to_sql('event', conn, index=False)
+    if index:
+        conn.execute("CREATE INDEX idx_event_game ON event (game_id)")
+    conn.commit()
+    conn.close()
+    return data.get_db_connection(path)
+
+def test_iter_events_streams_complete_games_in_table_order(tmp_path):
+    conn = event_db(tmp_path / 'a.db', ['g2', 'g2', 'g1', 'g3', 'g3', 'g3', 'g1b'])
+    chunks = list(data.iter_events(conn, chunk_rows=2))
+    games = [list(c['game_id'].unique()) for c in chunks]
+    assert sum(games, []) == ['g2', 'g1', 'g3', 'g1b']
+    assert sum(len(c) for c in chunks) == 7
+
+def test_iter_events_sorts_scattered_games_without_index(tmp_path):
+    game_ids = ['g1', 'g2', 'g2', 'g2', 'g1']
+    conn = event_db(tmp_path / 'a.db', game_ids)
+    assert not data.games_stored_together(conn)
+    assert data.games_stored_together(conn, where="game_id = ?", params=('g2',))
+    for conn in [conn, event_db(tmp_path / 'b.db', game_ids, index=True)]:
+        chunks = list(data.iter_events(conn, chunk_rows=2))
+        assert [list(c['game_id'].unique()) for c in chunks] == [['g1'], ['g2']]
+        assert [len(c) for c in chunks] == [2, 3]
+
+def test_iter_query_by_game_rejects_scattered_games_when_unordered(tmp_path):
+    conn = event_db(tmp_path / 'a.db', ['g1', 'g2', 'g2', 'g2', 'g1'])
+    with pytest.raises(ValueError, match='prepare_db'):
+        list(data.iter_query_by_game(conn, "SELECT * FROM event ORDER BY rowid", chunk_rows=2, ordered=False))
@@ -0,0 +1,45 @@
+import os
+import sys
+import shutil
+import subprocess
+
+import pandas as pd
+
+from conftest import truncate_games
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+STAGES = 'load,process,summary,export,leaderboards'
+
+def run_cli(db, out, *args):
+    subprocess.run([sys.executable, '-m', 'src.cli', '--db', str(db), '--out', str(out), '--stages', STAGES,
+                    '--resamples', '0', '--no-cache', *args],
+                   cwd=ROOT, check=True, stdout=subprocess.DEVNULL)
+
+def test_incremental_matches_full_run(synth_db, tmp_path):
+    run_cli(synth_db, tmp_path / 'full')
+
+    # First half of the season, then the rest as an incremental run on the same DB path
+    db = tmp_path / 'yakyuu.db'
+    shutil.copy(synth_db, db)
+    truncate_games(db, '2000-07-01')
+    run_cli(db, tmp_path / 'inc', '--incremental')
+    watermark = (tmp_path / 'inc' / 'watermark.json').read_bytes()
+    shutil.copy(synth_db, db)
+    run_cli(db, tmp_path / 'inc', '--incremental')
+    # A run that stopped after appending but before saving its watermark is simply repeated
+    (tmp_path / 'inc' / 'watermark.json').write_bytes(watermark)
+    run_cli(db, tmp_path / 'inc', '--incremental')
+
+    # Appended rows keep the order of the runs: compare the event files as sorted rows
+    for name in ['grandslam_events.csv', 'fourplus_inning_events.csv']:
+        full = pd.read_csv(tmp_path / 'full' / name, dtype=str)
+        inc = pd.read_csv(tmp_path / 'inc' / name, dtype=str)
+        assert list(inc.columns) == list(full.columns), name
+        pd.testing.assert_frame_equal(inc.sort_values(list(inc.columns), ignore_index=True),
+                                      full.sort_values(list(full.columns), ignore_index=True), obj=name)
+    for name in ['leaderboard_batters.csv', 'leaderboard_teams.csv', 'summary_overall.csv']:
+        full = pd.read_csv(tmp_path / 'full' / name, dtype=str)
+        inc = pd.read_csv(tmp_path / 'inc' / name, dtype=str)
+        pd.testing.assert_frame_equal(inc, full, obj=name)
+    for name in ['dashboard_data.json', 'dashboard_cube.json']:
+        assert (tmp_path / 'inc' / name).read_bytes() == (tmp_path / 'full' / name).read_bytes(), name
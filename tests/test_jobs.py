@@ -0,0 +1,21 @@
+import os
+import sys
+import subprocess
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def run_cli(db, out, jobs):
+    subprocess.run([sys.executable, '-m', 'src.cli', '--db', str(db), '--out', str(out), '--jobs', str(jobs),
+                    '--resamples', '200', '--skip-plot', '--no-cache', '--export-normalized',
+                    '--triggers', 'grandslam,three_run_hr,walkoff_hit'],
+                   cwd=ROOT, check=True, stdout=subprocess.DEVNULL)
+
+def test_jobs_do_not_change_outputs(synth_db_2, tmp_path):
+    run_cli(synth_db_2, tmp_path / 'serial', 1)
+    run_cli(synth_db_2, tmp_path / 'parallel', 2)
+
+    serial = sorted(p.relative_to(tmp_path / 'serial') for p in (tmp_path / 'serial').rglob('*') if p.is_file())
+    parallel = sorted(p.relative_to(tmp_path / 'parallel') for p in (tmp_path / 'parallel').rglob('*') if p.is_file())
+    assert serial == parallel
+    for name in serial:
+        assert (tmp_path / 'serial' / name).read_bytes() == (tmp_path / 'parallel' / name).read_bytes(), str(name)
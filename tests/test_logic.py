@@ -0,0 +1,92 @@
+import sqlite3
+
+import numpy as np
+import pandas as pd
+
+from src import data, logic
+
+# Row-wise reference: the post-inning stats, side detection and GS tagging as the original
+# per-row implementation computed them (before the vectorized kernel)
+
+def ref_post_stats(row):
+    side, opponent = row['side'], 'visitor' if row['side'] == 'home' else 'home'
+    runs_total = innings_count = team_total = opponent_total = 0
+    for i in range(int(row['inning_no']) + 1, 10):
+        if pd.notnull(row[f'{side}_inn{i}']):
+            runs_total += row[f'{side}_inn{i}']
+            innings_count += 1
+    for i in range(1, 10):
+        if pd.notnull(row[f'{side}_inn{i}']):
+            team_total += row[f'{side}_inn{i}']
+        if pd.notnull(row[f'{opponent}_inn{i}']):
+            opponent_total += row[f'{opponent}_inn{i}']
+    return pd.Series([runs_total, innings_count, team_total, opponent_total], index=logic.POST_STAT_COLS)
+
+def ref_grandslams(events, games):
+    gs = events[events['on_base'].apply(logic.is_grandslam_onbase)].copy()
+    gs['inning_no'] = [int(s[:-1]) for s in gs['inning']]
+    gs = gs[gs['inning_no'] <= 9]
+    merged = pd.merge(gs, games, on='game_id', how='left')
+    merged['side'] = merged.apply(lambda r: 'home' if r['team'] == r['home_team_id']
+                                  else 'visitor' if r['team'] == r['away_team_id'] else None, axis=1)
+    merged = merged.dropna(subset=['side'])
+    merged = pd.concat([merged, merged.apply(ref_post_stats, axis=1)], axis=1)
+    merged['post_run_rate'] = merged['post_inning_runs_1to9'] / merged['remaining_off_innings_1to9']
+    return merged
+
+def ref_high_scoring(games, threshold=4):
+    cols = [f'visitor_inn{i}' for i in range(1, 10)] + [f'home_inn{i}' for i in range(1, 10)]
+    long_df = games.melt(id_vars=['game_id'], value_vars=cols, var_name='inn_col', value_name='runs_in_inning')
+    long_df = long_df.dropna(subset=['runs_in_inning'])
+    long_df['side'] = [c.split('_')[0] for c in long_df['inn_col']]
+    long_df['inning_no'] = [int(c.split('_')[1][3:]) for c in long_df['inn_col']]
+    high = long_df[long_df['runs_in_inning'] == threshold]
+    merged = pd.merge(high[['game_id', 'side', 'inning_no', 'runs_in_inning']], games, on='game_id', how='left')
+    merged['team'] = np.where(merged['side'] == 'home', merged['home_team_id'], merged['away_team_id'])
+    merged = pd.concat([merged, merged.apply(ref_post_stats, axis=1)], axis=1)
+    merged['post_run_rate'] = merged['post_inning_runs_1to9'] / merged['remaining_off_innings_1to9']
+    return merged
+
+def normalized(df, columns):
+    # Values only: numbers as float (Int8/float/bool alike), everything else as Python objects
+    out = df[columns].reset_index(drop=True).copy()
+    for c in columns:
+        if isinstance(out[c].dtype, pd.CategoricalDtype) or not pd.api.types.is_numeric_dtype(out[c].dtype):
+            out[c] = out[c].astype(object).where(out[c].notna(), None)
+        else:
+            out[c] = out[c].astype(float)
+    return out
+
+def test_vectorized_logic_matches_row_wise_reference(synth_db):
+    conn = sqlite3.connect(synth_db)
+    ref_events = pd.read_sql_query("SELECT game_id, inning, team, on_base, hr, rbi, batter_player_id FROM event "
+                                   "WHERE hr = 1 AND rbi = 4", conn)
+    ref_games = pd.read_sql_query("SELECT * FROM games", conn)
+    conn.close()
+    conn = data.get_db_connection(synth_db)
+    events = data.load_grandslam_events(conn)
+    games = data.load_games(conn, columns=data.GAME_COLUMNS)
+    conn.close()
+
+    keys = ['game_id', 'team', 'inning_no']
+    ref_gs = ref_grandslams(ref_events, ref_games)
+    gs = logic.process_grandslams(events, games)
+    columns = keys + ['side'] + logic.POST_STAT_COLS + ['post_run_rate']
+    assert len(ref_gs) > 0
+    pd.testing.assert_frame_equal(normalized(gs.sort_values(keys, kind='stable'), columns),
+                                  normalized(ref_gs.sort_values(keys, kind='stable'), columns))
+
+    for threshold in [4, 6]:
+        ref_high = ref_high_scoring(ref_games, threshold)
+        high = logic.extract_high_scoring_innings(games, threshold=threshold)
+        columns = keys + ['side', 'runs_in_inning'] + logic.POST_STAT_COLS + ['post_run_rate']
+        assert len(ref_high) > 0
+        pd.testing.assert_frame_equal(normalized(high, columns), normalized(ref_high, columns))
+
+    # GS innings are tagged by (game_id, team, inning_no)
+    ref_keys = set(zip(ref_gs['game_id'], ref_gs['team'], ref_gs['inning_no']))
+    ref_high = ref_high_scoring(ref_games)
+    expected = [k in ref_keys for k in zip(ref_high['game_id'], ref_high['team'], ref_high['inning_no'])]
+    tagged = logic.merge_and_tag(gs, logic.extract_high_scoring_innings(games, threshold=4))
+    assert any(expected)
+    assert tagged['is_grandslam'].tolist() == expected
@@ -0,0 +1,47 @@
+import sqlite3
+
+import pandas as pd
+import pytest
+
+from src import logic, predicates
+
+# Well-formed, padded, signed, non-ASCII and malformed inning values
+INNINGS = ['7T', '1B', '10B', '07T', '9B', '12B', ' 7T', '7 T', '\t7T', '+7T', '-1T', '1_0T', '７T', '7',
+           'T', '', 'TT', 'x7T', '7TT', None, 71, 9.5]
+
+PREDICATES = [
+    predicates.InningNo('<=', 9),
+    predicates.InningNo('>=', 9),
+    predicates.Half('T'),
+    predicates.Half('B'),
+    ~predicates.InningNo('<=', 9),
+    predicates.Half('B') & predicates.InningNo('>=', 9),
+]
+
+@pytest.fixture
+def conn():
+    conn = sqlite3.connect(':memory:')
+    conn.execute("CREATE TABLE event (game_id TEXT, inning)")
+    conn.executemany("INSERT INTO event VALUES ('g', ?)", [(v,) for v in INNINGS])
+    yield conn
+    conn.close()
+
+@pytest.mark.parametrize('pred', PREDICATES, ids=lambda p: repr(p.to_sql()))
+def test_sql_and_mask_select_the_same_rows(conn, pred):
+    sql, params = pred.to_sql()
+    pushed = [r[0] for r in conn.execute(f"SELECT rowid FROM event WHERE {sql} ORDER BY rowid", params)]
+    df = pd.read_sql_query("SELECT rowid, inning FROM event ORDER BY rowid", conn)
+    assert df['rowid'][pred.mask(df)].tolist() == pushed
+
+def test_parse_inning_accepts_ascii_digits_only():
+    assert logic.parse_inning('07T') == (7, 'T')
+    for value in [' 7T', '+7T', '-1T', '1_0T', '７T', 'T']:
+        assert logic.parse_inning(value) == (None, None)
+
+def test_sql_filter_and_parse_inning_agree(conn):
+    # The SQL inning rule keeps exactly the rows parse_inning parses, with the same (inning_no, half)
+    query = (f"SELECT rowid, {predicates._INNING_NO_SQL}, substr(inning, -1) FROM event "
+             f"WHERE {predicates._INNING_VALID_SQL} ORDER BY rowid")
+    pushed = [(r[0], (r[1], r[2])) for r in conn.execute(query)]
+    parsed = [(rowid, logic.parse_inning(v)) for rowid, v in enumerate(INNINGS, start=1) if isinstance(v, str)]
+    assert pushed == [(rowid, p) for rowid, p in parsed if p != (None, None)]
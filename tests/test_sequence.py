@@ -0,0 +1,37 @@
+import shutil
+import sqlite3
+
+import numpy as np
+import pandas as pd
+
+from src import data, predicates, sequence
+
+def test_seeks_match_the_in_memory_lookups(synth_db, tmp_path):
+    db = tmp_path / 'yakyuu.db'
+    shutil.copy(synth_db, db)
+    conn = sqlite3.connect(db)
+    sequence.build_play_sequence(conn)
+    conn.close()
+
+    conn = data.get_db_connection(db)
+    rbi = predicates.Compare('rbi', '>', 0)
+    reach = predicates.Compare('h', '>', 0) | predicates.Compare('bb', '>', 0)
+    checked = 0
+    for index in sequence.iter_event_index(conn):
+        positions = np.flatnonzero(predicates.GRANDSLAM.mask(index))
+        after = sequence.next_event_after(index, positions, rbi.mask(index))
+        first = sequence.first_event_in_half(index, positions, reach.mask(index))
+        for pos, a, f in zip(positions, after, first):
+            key = (index['game_id'].iat[pos], index['team'].iat[pos], int(index['sort_order'].iat[pos]))
+            row = sequence.seek_next_event_after(conn, *key, predicate=rbi)
+            assert (row['event_pos'] if row else -1) == (index['event_pos'].iat[a] if a >= 0 else -1)
+            row = sequence.seek_first_event_in_half(conn, *key, predicate=reach)
+            assert (row['event_pos'] if row else -1) == (index['event_pos'].iat[f] if f >= 0 else -1)
+            checked += 1
+    assert checked > 0
+
+    plan = conn.execute(
+        "EXPLAIN QUERY PLAN SELECT * FROM play_sequence AS s WHERE s.game_id = ? AND s.team = ? AND s.sort_order > ? "
+        "ORDER BY s.sort_order, s.seq LIMIT 1", ('g', 't', 0)).fetchall()
+    assert any('idx_play_sequence_key' in row[-1] for row in plan)
+    assert not any('TEMP B-TREE' in row[-1] for row in plan)
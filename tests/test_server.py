@@ -0,0 +1,39 @@
+import json
+
+import pytest
+
+from src import server
+
+@pytest.fixture(scope='module')
+def service(synth_db):
+    return server.QueryService.from_db([str(synth_db)], cache_size=8)
+
+def get(service, path, query=''):
+    status, body, hit = service.handle(path, query)
+    return status, json.loads(body), hit
+
+def test_summary_is_cached(service):
+    status, body, hit = get(service, '/api/summary', 'group_by=stage&threshold=4')
+    assert status == 200 and not hit
+    assert sum(r['count'] for r in body['rows']) == get(service, '/api/events', 'page_size=1')[1]['total']
+    assert get(service, '/api/summary', 'threshold=4&group_by=stage')[2]
+
+def test_error_statuses(service, monkeypatch):
+    assert get(service, '/api/nope', 'threshold=x')[0] == 404
+    assert get(service, '/api/events', 'threshold=x')[0] == 400
+    assert get(service, '/api/summary', 'group_by=ballpark')[0] == 400
+    assert get(service, '/api/events', 'is_grandslam=yes')[0] == 400
+    assert get(service, '/api/events', 'page=1&page=x')[0] == 400
+
+    def broken(params):
+        raise KeyError('post_run_rate')
+    monkeypatch.setattr(service, 'frame', broken)
+    status, body, _ = get(service, '/api/events', 'page=2')
+    assert status == 500 and 'KeyError' in body['error']
+
+def test_repeated_and_boolean_parameters(service):
+    status, body, _ = get(service, '/api/events', 'page=1&page=2&page_size=5')
+    assert status == 200 and body['page'] == 2 and body['page_size'] == 5
+    gs = get(service, '/api/events', 'is_grandslam=TRUE&page_size=1')[1]['total']
+    non_gs = get(service, '/api/events', 'is_grandslam=0&page_size=1')[1]['total']
+    assert gs + non_gs == get(service, '/api/events', 'page_size=1')[1]['total'] and gs > 0
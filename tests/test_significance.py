@@ -0,0 +1,20 @@
+import numpy as np
+import pandas as pd
+
+from src import significance
+
+def events(n=400, seed=0):
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame({
+        'inning_no': rng.integers(1, 10, n),
+        'is_grandslam': rng.random(n) < 0.2,
+        'post_inning_runs_1to9': rng.integers(0, 8, n).astype(float),
+        'post_run_rate': rng.random(n) * 2,
+    })
+
+def test_resampling_tests_ignore_row_order():
+    df = events()
+    shuffled = df.sample(frac=1, random_state=1).reset_index(drop=True)
+    expected = significance.resampling_tests(df, n_resamples=500, seed=7)
+    result = significance.resampling_tests(shuffled, n_resamples=500, seed=7)
+    pd.testing.assert_frame_equal(result, expected)
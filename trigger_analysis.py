@@ -1,115 +1,73 @@
-
-import sqlite3
 import pandas as pd
 import numpy as np
 
-def parse_inning(inning_str):
-    if not inning_str or len(inning_str) < 2:
-        return None, None
-    number_part = inning_str[:-1]
-    half_part = inning_str[-1]
-    return int(number_part), half_part
+from src import data, sequence
 
-def is_grandslam_onbase(on_base_str):
-    if not isinstance(on_base_str, str):
-        return False
-    return ('1' in on_base_str) and ('2' in on_base_str) and ('3' in on_base_str)
+# Memory budget for one chunk of the event table
+MAX_MEMORY_MB = 256
 
-def analyze():
-    conn = sqlite3.connect('yakyuu.db')
-    
-    # 1. Get GS events
-    all_events = pd.read_sql_query("SELECT * FROM event", conn)
-    gs_mask = all_events.apply(lambda r: is_grandslam_onbase(r['on_base']) and r['hr'] == 1 and r['rbi'] == 4, axis=1)
-    gs_events = all_events[gs_mask].copy()
+def classify_trigger(evts):
+    """
+    Labels RBI events by how the run was driven in (vectorized over a DataFrame).
+    """
+    def flag(col):
+        # Mirrors evt.get(col) == 1: missing columns never match
+        if col not in evts.columns:
+            return np.zeros(len(evts), dtype=bool)
+        return (evts[col] == 1).to_numpy()
+
+    conditions = [
+        flag('hr'),
+        flag('base3'),
+        flag('base2'),
+        flag('h'),
+        flag('bb') | flag('hbp'),
+        flag('sf'),
+        flag('sac'),
+    ]
+    choices = [
+        "Home Run",
+        "Triple",
+        "Double",
+        "Single",
+        "Walk/HBP (Pushing run)",
+        "Sacrifice Fly",
+        "Sacrifice Bunt",
+    ]
+    return np.select(conditions, choices, default="Ground out / Error / Fielder Choice")
+
+def find_triggers(index, games):
+    """
+    First RBI event after each re-ignited grand slam (3+ runs after the GS).
+    index is a sequence.build_event_index result for complete games (one chunk of sequence.iter_event_index).
+    """
+    # 1. Grand slams and post-GS runs (innings after the GS, up to the 9th)
+    gs = sequence.grandslam_post_runs(index, games)
+    gs = gs[gs['post_inning_runs_1to9'] >= 3]
     
-    # Pre-parse innings for GS
-    gs_events['inn_no'] = gs_events['inning'].apply(lambda x: parse_inning(x)[0])
-    gs_events['inn_half'] = gs_events['inning'].apply(lambda x: parse_inning(x)[1])
+    # 2. First RBI event by the same team in a later half-inning
+    rbi_mask = (index['rbi'] > 0).to_numpy()
+    hits = sequence.next_event_after(index, gs['position'], rbi_mask)
+    hits = hits[hits >= 0]
     
-    # 2. Get Games with 3+ additional runs
-    # We can use the logic from logic.py or just use the summary data
-    # Actually, let's just use the games table to verify post-GS runs
+    evts = index.iloc[hits]
+    return pd.DataFrame({
+        'game_id': evts['game_id'].to_numpy(),
+        'inning': evts['inning'].to_numpy(),
+        'trigger': classify_trigger(evts),
+        'rbi': evts['rbi'].to_numpy(),
+    })
+
+def analyze():
+    conn = data.get_db_connection('yakyuu.db')
     games = pd.read_sql_query("SELECT * FROM games", conn)
     
-    triggers = []
+    # Stream events game by game, already indexed by game / team / half-inning
+    # (from the play_sequence table when prepare_db has built it); only small per-chunk results are kept
+    chunks = sequence.iter_event_index(conn, max_memory_mb=MAX_MEMORY_MB)
+    results = [find_triggers(chunk, games) for chunk in chunks]
+    df_triggers = pd.concat(results, ignore_index=True) if results else pd.DataFrame()
     
-    for _, gs in gs_events.iterrows():
-        game_id = gs['game_id']
-        team = gs['team']
-        inn_no = gs['inn_no']
-        inn_half = gs['inn_half']
-        
-        # Check team side in games table
-        game_row = games[games['game_id'] == game_id].iloc[0]
-        side = 'home' if game_row['home_team_id'] == team else 'visitor'
-        
-        # Calculate post-GS runs
-        post_runs = 0
-        for i in range(inn_no + 1, 10):
-            val = game_row.get(f'{side}_inn{i}')
-            if pd.notnull(val):
-                post_runs += val
-        
-        if post_runs >= 3:
-            # 3. Find the first RBI event after this GS for this team
-            # Orders of events in the same game? 
-            # Assuming the 'event' table is naturally ordered or has an implicit index.
-            # Let's get all events for this game/team after the GS.
-            
-            # Since 'inning' is 1T, 1B, etc., we need to order them.
-            # Convert all innings to a sortable score.
-            
-            game_events = all_events[all_events['game_id'] == game_id].copy()
-            
-            def sort_key(row):
-                ino, half = parse_inning(row['inning'])
-                h_val = 0 if half == 'T' else 1
-                return ino * 10 + h_val
-            
-            game_events['sort_order'] = game_events.apply(sort_key, axis=1)
-            gs_sort_order = sort_key(gs)
-            
-            # Subsequent events for the same team
-            sub_events = game_events[
-                (game_events['team'] == team) & 
-                (game_events['sort_order'] > gs_sort_order)
-            ].sort_values('sort_order', ascending=True)
-            
-            # Find the first event with RBI > 0
-            first_rbi_event = sub_events[sub_events['rbi'] > 0].head(1)
-            
-            if not first_rbi_event.empty:
-                evt = first_rbi_event.iloc[0]
-                # Try to determine trigger type
-                # Usually there's an event_type or similar. Let's look at col names.
-                # Common columns: 'event_id', 'h', '2b', '3b', 'hr', 'bb', 'hbp', 'error_play'
-                trigger_desc = "Unknown"
-                if evt.get('hr') == 1: 
-                    trigger_desc = "Home Run"
-                elif evt.get('base3') == 1: 
-                    trigger_desc = "Triple"
-                elif evt.get('base2') == 1: 
-                    trigger_desc = "Double"
-                elif evt.get('h') == 1: 
-                    trigger_desc = "Single"
-                elif evt.get('bb') == 1 or evt.get('hbp') == 1: 
-                    trigger_desc = "Walk/HBP (Pushing run)"
-                elif evt.get('sf') == 1: 
-                    trigger_desc = "Sacrifice Fly"
-                elif evt.get('sac') == 1: 
-                    trigger_desc = "Sacrifice Bunt"
-                else: 
-                    trigger_desc = "Ground out / Error / Fielder Choice"
-                
-                triggers.append({
-                    'game_id': game_id,
-                    'inning': evt['inning'],
-                    'trigger': trigger_desc,
-                    'rbi': evt['rbi']
-                })
-
-    df_triggers = pd.DataFrame(triggers)
     if not df_triggers.empty:
         counts = df_triggers['trigger'].value_counts()
         print("RESULT_START")